@@ -0,0 +1,12 @@
+"""Subpackages are imported on first attribute access, e.g. ``taskchain.llm``, to keep cold start cheap."""
+from taskchain.lazy import lazy_exports, preload
+
+__all__ = ["preload"]
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    submodules=[
+        "agents", "chains", "communication", "config", "decompose", "executor", "integrations",
+        "llm", "memory", "parser", "prompts", "schema", "storage", "task", "tools",
+    ],
+)
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from langchain.agents import load_tools, initialize_agent
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from langchain.agents import AgentExecutor, load_tools, initialize_agent
 from langchain.agents.types import AgentType
 from langchain.prompts import HumanMessagePromptTemplate
 from langchain.schema import BaseMemory
@@ -16,16 +21,24 @@ class AgentRegistry:
     """Agent registry class.
 
     This class is used to register agents and to retrieve them by name.
+    With a pool_size greater than 0, built agent executors and their tool instances are kept
+    in a pool keyed by the hash of the agent config and reused by acquire().
     """
 
-    def __init__(self, agents: list[AgentConfig] = None, upsert: bool = True):
+    def __init__(self, agents: list[AgentConfig] = None, upsert: bool = True, pool_size: int = 0):
         """Initialize the registry.
         Args:
             agents: A list of agents to register set or add to register.
             upsert: Whether to update default agents or overwrite with provided agents list.
+            pool_size: Maximum number of idle agent executors kept for reuse,
+                the least recently used executors are evicted first. 0 disables pooling.
 
         """
         self._agents: dict[str, AgentConfig] = {}
+        self.pool_size = pool_size
+        self._pool: OrderedDict[str, list[AgentExecutor]] = OrderedDict()
+        self._in_use: dict[int, str] = {}
+        self._pool_lock = threading.Lock()
 
         if agents is not None:
             agents = {agent.name: agent for agent in agents}
@@ -68,6 +81,92 @@ class AgentRegistry:
         else:
             return self._load_langchain_agent(config, tools, custom_prompts, memory, **kwargs)
 
+    def acquire(self, name: str, **kwargs) -> AgentExecutor:
+        """Get an agent executor by agent name from the pool or load a new one.
+        Executors taken from the pool have their memory cleared. Hand the executor back
+        with release() once the task is done.
+        """
+        if self.pool_size <= 0:
+            return self.load(name, **kwargs)
+
+        key = self.config_hash(self.get(name), **kwargs)
+        with self._pool_lock:
+            idle = self._pool.get(key, None)
+            executor = idle.pop() if idle else None
+            if idle is not None and not idle:
+                del self._pool[key]
+
+        if executor is None:
+            executor = self.load(name, **kwargs)
+        else:
+            self._reset_executor(executor)
+
+        with self._pool_lock:
+            self._in_use[id(executor)] = key
+        return executor
+
+    def release(self, executor: AgentExecutor):
+        """Return an executor acquired with acquire() to the pool."""
+        with self._pool_lock:
+            key = self._in_use.pop(id(executor), None)
+            if key is None:
+                return
+            self._pool.setdefault(key, []).append(executor)
+            self._pool.move_to_end(key)
+            self._evict()
+
+    def warm_up(self, names: list[str] = None, **kwargs):
+        """Build and pool an executor for each agent name, defaults to all registered agents."""
+        names = names if names is not None else list(self._agents.keys())
+        for name in names:
+            self.release(self.acquire(name, **kwargs))
+
+    def clear_pool(self):
+        with self._pool_lock:
+            self._pool = OrderedDict()
+
+    @property
+    def pooled(self) -> int:
+        """The number of idle executors in the pool."""
+        return sum(len(executors) for executors in self._pool.values())
+
+    def _evict(self):
+        while self.pooled > self.pool_size:
+            key, executors = next(iter(self._pool.items()))
+            executors.pop(0)
+            if not executors:
+                del self._pool[key]
+
+    @staticmethod
+    def config_hash(config: AgentConfig, **kwargs) -> str:
+        """Hash of an agent config and load arguments identifying interchangeable executors."""
+        payload = {
+            "config": config.dict(exclude={"tools"}),
+            "tools": [id(tool) for tool in config.tools],
+            "kwargs": {key: value if isinstance(value, (str, int, float, bool)) else id(value)
+                       for key, value in kwargs.items()},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def fingerprint(self, name: str) -> dict:
+        """Description of an agent config that is stable across processes, tools are identified by name."""
+        config = self.get(name)
+        return {
+            "config": config.dict(exclude={"tools"}),
+            "tools": sorted(tool.name for tool in config.tools),
+        }
+
+    @staticmethod
+    def _reset_executor(executor: AgentExecutor):
+        """Clear the per task state of a reused executor."""
+        memories = [
+            getattr(executor, "memory", None),
+            getattr(getattr(executor.agent, "llm_chain", None), "memory", None),
+        ]
+        for memory in memories:
+            if memory is not None:
+                memory.clear()
+
     def _load_custom_agent(
             self,
             config: AgentConfig,
@@ -118,6 +217,14 @@ class AgentRegistry:
             raise ValueError("The Agent has no tools available define at least one tool for the agent.")
         return tools
 
+    def get_configs(self) -> list[AgentConfig]:
+        """Get the configs of all registered agents.
+
+        Returns:
+            list: A list of all registered agent configs.
+        """
+        return list(self._agents.values())
+
     def get_all(self):
         """Get all registered agents.
 
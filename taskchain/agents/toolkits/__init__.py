@@ -1,4 +1,3 @@
-from taskchain.agents.toolkits import (
-    external_toolkits
-)
+from taskchain.lazy import lazy_exports
 
+__getattr__, __dir__ = lazy_exports(__name__, submodules=["external_toolkits"])
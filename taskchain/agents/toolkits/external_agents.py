@@ -13,8 +13,6 @@ from pandas import DataFrame
 
 from taskchain.llm import get_llm_by_name
 
-llm = get_llm_by_name("gpt-3.5-turbo")
-
 
 class AgentLoader:
     def __init__(self, model_name: str="gpt-3.5-turbo", verbose: bool=True):
@@ -0,0 +1,75 @@
+"""Cold start benchmark of taskchain imports.
+
+Every measurement imports the module in a fresh interpreter, so nothing is cached in sys.modules.
+The exit code is 1 if the median import time exceeds --max-seconds or if a forbidden module
+was imported, which makes the script usable as a guard in CI.
+
+Usage:
+    python -m taskchain.benchmarks.import_time taskchain taskchain.llm --max-seconds 0.5 --forbid langchain
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module: str, repeat: int = 5) -> dict[str, any]:
+    """Import a module in fresh interpreters and return the median time and the loaded modules."""
+    timings = []
+    modules = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        modules = result["modules"]
+    return {"module": module, "median": statistics.median(timings), "min": min(timings), "modules": modules}
+
+
+def forbidden_imports(modules: list[str], forbidden: list[str]) -> list[str]:
+    """Get the loaded modules that are or belong to one of the forbidden packages."""
+    return [
+        name for name in modules
+        if any(name == package or name.startswith(package + ".") for package in forbidden)
+    ]
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the cold import time of taskchain modules.")
+    parser.add_argument("modules", nargs="*", default=["taskchain"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--forbid", action="append", default=[],
+                        help="Package that must not be imported, can be given multiple times.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        result = measure_import(module, args.repeat)
+        print(f"{module}: median {result['median'] * 1000:.1f} ms, min {result['min'] * 1000:.1f} ms, "
+              f"{len(result['modules'])} modules loaded")
+        if args.max_seconds is not None and result["median"] > args.max_seconds:
+            print(f"  exceeds the limit of {args.max_seconds * 1000:.1f} ms")
+            failed = True
+        loaded = forbidden_imports(result["modules"], args.forbid)
+        if loaded:
+            print(f"  imports forbidden modules: {', '.join(loaded[:10])}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
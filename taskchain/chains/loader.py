@@ -14,10 +14,15 @@ def load_chain(
         llm_name: str = None,
         suggest: bool = False,
         llm_kwargs: dict = None,
+        cache: bool = None,
         **kwargs,
 ) -> Chain:
-    """Load a chain from a prompt type and llm name"""
+    """Load a chain from a prompt type and llm name.
+    Set cache to False to bypass the shared LLM response cache for this chain.
+    """
     llm_kwargs = llm_kwargs or {}
+    if cache is not None:
+        llm_kwargs = {**llm_kwargs, "cache": cache}
     llm = get_llm_by_name(llm_name, **llm_kwargs)
     prompt = PROMPT_REGISTRY[prompt_type]
     if suggest:
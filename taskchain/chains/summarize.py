@@ -0,0 +1,181 @@
+"""Concurrent map-reduce summarization with memoized chunk summaries."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+from langchain import LLMChain, PromptTemplate
+from langchain.base_language import BaseLanguageModel
+from langchain.docstore.document import Document
+
+from taskchain.llm.tokenizer import count_tokens, split_tokens, truncate_tokens
+from taskchain.storage.result_store import ContentAddressedStore, content_hash
+
+SUMMARY_STORE_DIR_NAME = "summaries"
+
+
+def default_summary_store() -> ContentAddressedStore:
+    from taskchain.config import Config
+    return ContentAddressedStore(os.path.join(Config().local_storage_dir, SUMMARY_STORE_DIR_NAME))
+
+
+class MapReduceSummarizer:
+    """Summarizes many documents with concurrent map calls and a hierarchical reduce.
+
+    Every chunk is summarized with the map prompt, the calls run concurrently and are bounded by
+    max_concurrency as well as the shared LLM gateway. The summaries are combined with the combine
+    prompt, if they exceed context_tokens they are combined in groups and the partial results again,
+    until a single summary is left. Map and combine results are memoized by the content hash of the
+    prompt, the model and the text, in memory and optionally in a store shared across runs.
+
+    Attributes:
+        map_prompt: Template with a {text} variable, applied to every chunk.
+        combine_prompt: Template with a {text} variable, applied to joined summaries.
+            Defaults to the map prompt.
+        llm: The language model, defaults to the basic LLM.
+        max_concurrency: Maximum number of parallel LLM calls.
+        chunk_tokens: Documents above this size are split before the map step.
+        context_tokens: Maximum size of the text of a single combine call.
+        store: Persistent store of the summaries, None keeps them in memory only.
+    """
+
+    def __init__(
+            self,
+            map_prompt: str,
+            combine_prompt: Optional[str] = None,
+            llm: Optional[BaseLanguageModel] = None,
+            max_concurrency: int = 8,
+            chunk_tokens: int = 3000,
+            context_tokens: int = 3000,
+            max_depth: int = 4,
+            store: Optional[ContentAddressedStore] = None,
+    ):
+        if llm is None:
+            from taskchain.llm import get_basic_llm
+            llm = get_basic_llm()
+        self.llm = llm
+        self.map_prompt = map_prompt
+        self.combine_prompt = combine_prompt or map_prompt
+        self.max_concurrency = max_concurrency
+        self.chunk_tokens = chunk_tokens
+        self.context_tokens = context_tokens
+        self.max_depth = max_depth
+        self.store = store
+        self.model_name = getattr(llm, "model_name", None)
+        self._chains = {
+            prompt: LLMChain(llm=llm, prompt=PromptTemplate.from_template(prompt))
+            for prompt in {self.map_prompt, self.combine_prompt}
+        }
+        self._llm_params = llm.dict()
+        self._memo: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"llm_calls": 0, "memo_hits": 0}
+
+    # ===== Sync =====
+
+    def summarize(self, docs: list[Union[Document, str]]) -> str:
+        """Summarize documents or texts into a single summary."""
+        summaries = self._map(self.map_prompt, self._chunks(docs))
+        for _ in range(self.max_depth):
+            if len(summaries) == 1 and self._fits(summaries[0]):
+                return summaries[0]
+            summaries = self._map(self.combine_prompt, self._groups(summaries))
+        return truncate_tokens("\n".join(summaries), self.context_tokens, self.model_name)
+
+    def _map(self, prompt: str, texts: list[str]) -> list[str]:
+        if len(texts) == 1:
+            return [self._summarize(prompt, texts[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(texts))) as executor:
+            # the threads see the LLM priority of the caller
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._summarize, prompt, text)
+                for text in texts
+            ]
+            return [future.result() for future in futures]
+
+    def _summarize(self, prompt: str, text: str) -> str:
+        key = self._key(prompt, text)
+        summary = self._lookup(key)
+        if summary is None:
+            summary = self._chains[prompt].predict(text=text).strip()
+            self._remember(key, summary)
+        return summary
+
+    # ===== Async =====
+
+    async def asummarize(self, docs: list[Union[Document, str]]) -> str:
+        """Async version of summarize()."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        summaries = await self._amap(self.map_prompt, self._chunks(docs), semaphore)
+        for _ in range(self.max_depth):
+            if len(summaries) == 1 and self._fits(summaries[0]):
+                return summaries[0]
+            summaries = await self._amap(self.combine_prompt, self._groups(summaries), semaphore)
+        return truncate_tokens("\n".join(summaries), self.context_tokens, self.model_name)
+
+    async def _amap(self, prompt: str, texts: list[str], semaphore: asyncio.Semaphore) -> list[str]:
+        async def summarize(text: str) -> str:
+            key = self._key(prompt, text)
+            summary = self._lookup(key)
+            if summary is None:
+                async with semaphore:
+                    summary = (await self._chains[prompt].apredict(text=text)).strip()
+                self._remember(key, summary)
+            return summary
+
+        return list(await asyncio.gather(*(summarize(text) for text in texts)))
+
+    # ===== Chunks and memo =====
+
+    def _chunks(self, docs: list[Union[Document, str]]) -> list[str]:
+        chunks = []
+        for doc in docs:
+            text = doc.page_content if isinstance(doc, Document) else doc
+            if not text.strip():
+                continue
+            if self.count(text) > self.chunk_tokens:
+                chunks.extend(split_tokens(text, self.chunk_tokens, self.model_name))
+            else:
+                chunks.append(text)
+        return chunks or [""]
+
+    def _groups(self, summaries: list[str]) -> list[str]:
+        """Join consecutive summaries into groups that fit into a single combine call."""
+        groups, group, size = [], [], 0
+        for summary in summaries:
+            tokens = self.count(summary)
+            if group and size + tokens > self.context_tokens:
+                groups.append("\n\n".join(group))
+                group, size = [], 0
+            group.append(truncate_tokens(summary, self.context_tokens, self.model_name))
+            size += min(tokens, self.context_tokens)
+        groups.append("\n\n".join(group))
+        return groups
+
+    def _fits(self, text: str) -> bool:
+        return self.count(text) <= self.context_tokens
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def _key(self, prompt: str, text: str) -> str:
+        return content_hash([prompt, self._llm_params, text])
+
+    def _lookup(self, key: str) -> Optional[str]:
+        summary = self._memo.get(key, None)
+        if summary is None and self.store is not None:
+            entry = self.store.get(key)
+            summary = entry["result"] if entry is not None else None
+        with self._lock:
+            self.stats["memo_hits" if summary is not None else "llm_calls"] += 1
+        return summary
+
+    def _remember(self, key: str, summary: str):
+        with self._lock:
+            self._memo[key] = summary
+        if self.store is not None:
+            self.store.put(key, summary)
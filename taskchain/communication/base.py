@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from abc import abstractmethod, ABC
 from typing import Union
 
@@ -7,7 +8,14 @@ from taskchain.task import Task
 
 
 class BaseMessagingUnit(ABC):
-    """Abstract Base class for single communication unit"""
+    """Abstract Base class for single communication unit
+
+    Attributes:
+        is_blocking (bool): Whether the unit performs blocking I/O (e.g. network or console).
+            Async methods of blocking units are executed in a worker thread.
+    """
+
+    is_blocking: bool = True
 
     @abstractmethod
     def fetch_all(self):
@@ -35,6 +43,26 @@ class BaseMessagingUnit(ABC):
     def submit_direct(self, formatted_message: dict):
         pass
 
+    async def afetch_all(self):
+        if self.is_blocking:
+            return await asyncio.to_thread(self.fetch_all)
+        return self.fetch_all()
+
+    async def afetch(self, task: Task):
+        if self.is_blocking:
+            return await asyncio.to_thread(self.fetch, task)
+        return self.fetch(task)
+
+    async def asubmit(
+            self,
+            message: str,
+            header: dict,
+            payload: dict = None,
+            **kwargs: any):
+        if self.is_blocking:
+            return await asyncio.to_thread(self.submit, message, header=header, payload=payload, **kwargs)
+        return self.submit(message, header=header, payload=payload, **kwargs)
+
 
 class BaseCommunicator(ABC):
     """A Facade abstract base class for all communication systems"""
@@ -45,6 +73,10 @@ class BaseCommunicator(ABC):
     def register(self, unit: BaseMessagingUnit):
         self._units[unit.type] = unit
 
+    def get_unit(self, message_type: str) -> BaseMessagingUnit:
+        """Get the unit registered for a message type, None if there is none."""
+        return self._units.get(message_type, None)
+
     def fetch(self, message_type: str, task: Task) -> dict[str, Union[str, dict]]:
         """Fetches all messages for a given task."""
         return self._units[message_type].fetch(task)
@@ -98,6 +130,41 @@ class BaseCommunicator(ABC):
 
         return self._units[message_type].submit(message, header=header, payload=payload, **kwargs)
 
+    async def afetch(self, message_type: str, task: Task) -> dict[str, Union[str, dict]]:
+        """Fetches all messages for a given task asynchronously."""
+        return await self._units[message_type].afetch(task)
+
+    async def afetch_all(self, message_type: str) -> list:
+        """Fetches all messages for a given message type asynchronously."""
+        return await self._units[message_type].afetch_all()
+
+    async def afetch_all_for_task(self, task: Task) -> dict[str, any]:
+        """Fetches all messages for a given task from all units asynchronously."""
+        message_types = list(self._units)
+        results = await asyncio.gather(*[self._units[message_type].afetch(task) for message_type in message_types])
+        return dict(zip(message_types, results))
+
+    async def asubmit(
+            self,
+            message: str,
+            message_type: str,
+            source_id: str = None,
+            destination_id: str = None,
+            payload: dict = None,
+            header: dict = None,
+            **kwargs: any):
+        """Submits a message to the communication system asynchronously. See submit() for details."""
+        if message_type not in self._units:
+            raise ValueError(f"Message type {message_type} not registered.")
+
+        header = header or {}
+        if "source" not in header:
+            header["source"] = source_id
+        if "destination" not in header:
+            header["destination"] = destination_id
+
+        return await self._units[message_type].asubmit(message, header=header, payload=payload, **kwargs)
+
     def submit_direct(self, formatted_message: dict, message_type: str):
         if message_type not in self._units:
             raise ValueError(f"Message type {message_type} not registered.")
@@ -3,7 +3,7 @@ from __future__ import annotations
 from taskchain.communication.base import BaseCommunicator, BaseMessagingUnit
 from taskchain.communication.units.interaction.non_interactive import NonInteractor
 from taskchain.communication.units.messaging import SimpleMessaging
-from taskchain.communication.units.type_messaging import SingleTypeMessaging
+from taskchain.communication.units.router import IssueRouter
 from taskchain.singleton import AbstractSingleton
 
 
@@ -12,11 +12,11 @@ class NonInteractiveCommunicator(BaseCommunicator, AbstractSingleton):
 
     def __init__(
             self,
-            messaging: BaseMessagingUnit = SimpleMessaging(),
-            interactor: BaseMessagingUnit = NonInteractor(),
+            messaging: BaseMessagingUnit = None,
+            interactor: BaseMessagingUnit = None,
     ):
         """simple communicator constructor with a trello board, a simple messaging system and an issue message store"""
         super().__init__()
-        self.register(messaging)
-        self.register(interactor)
-        self.register(SingleTypeMessaging("issue"))
+        self.register(messaging or SimpleMessaging())
+        self.register(interactor or NonInteractor())
+        self.register(IssueRouter())
@@ -0,0 +1,195 @@
+"""Thread safe in-process message bus with per destination queues."""
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from typing import Hashable, Optional
+
+
+class _Stripe:
+    """Lock shared by a subset of the destinations, with conditions for waiting fetchers and submitters."""
+
+    __slots__ = ("lock", "not_empty", "not_full", "async_waiters")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.async_waiters: dict[Hashable, list[tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+
+
+class MessageBus:
+    """Per destination message queues guarded by striped locks.
+
+    Destinations are looked up in a dict and hashed onto a fixed number of lock stripes, so submitters
+    and fetchers of different destinations rarely contend. Fetching drains the queue of a destination
+    and can block or be awaited until a message arrives, drained queues are removed. With max_queue_size,
+    submitting to a full queue blocks until it is drained, which slows down producers that outpace
+    their consumers.
+
+    Attributes:
+        stripes: Number of locks.
+        max_queue_size: Maximum number of queued messages per destination, None for no limit.
+    """
+
+    def __init__(self, stripes: int = 16, max_queue_size: Optional[int] = None):
+        self.max_queue_size = max_queue_size
+        self._stripes = [_Stripe() for _ in range(max(stripes, 1))]
+        self._queues: dict[Hashable, deque] = {}
+        self._queues_lock = threading.Lock()
+
+    def _stripe(self, destination: Hashable) -> _Stripe:
+        return self._stripes[hash(destination) % len(self._stripes)]
+
+    # The queue of a destination is only looked up with its stripe lock held, a drained queue is
+    # removed, so nobody may keep a reference to it across a wait.
+
+    def _queue(self, destination: Hashable) -> deque:
+        messages = self._queues.get(destination, None)
+        if messages is None:
+            with self._queues_lock:
+                messages = self._queues.setdefault(destination, deque())
+        return messages
+
+    def _size(self, destination: Hashable) -> int:
+        messages = self._queues.get(destination, None)
+        return 0 if messages is None else len(messages)
+
+    def _discard(self, destination: Hashable):
+        with self._queues_lock:
+            self._queues.pop(destination, None)
+
+    # ===== Submit =====
+
+    def put(self, destination: Hashable, message: dict, block: bool = True, timeout: Optional[float] = None):
+        """Queue a message for a destination.
+
+        Raises:
+            queue.Full: If the queue is full and the message could not be queued within timeout,
+                or right away if block is False.
+        """
+        stripe = self._stripe(destination)
+        with stripe.lock:
+            if self.max_queue_size is not None and self._size(destination) >= self.max_queue_size:
+                if not block:
+                    raise queue.Full(f"Message queue of {destination} is full.")
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while self._size(destination) >= self.max_queue_size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Full(f"Message queue of {destination} is full.")
+                    stripe.not_full.wait(remaining)
+            self._queue(destination).append(message)
+            self._notify(stripe, destination)
+
+    async def aput(self, destination: Hashable, message: dict, timeout: Optional[float] = None):
+        """Async version of put(), only a full queue is waited for in a worker thread."""
+        try:
+            self.put(destination, message, block=False)
+        except queue.Full:
+            await asyncio.to_thread(self.put, destination, message, True, timeout)
+
+    def replace(self, destination: Hashable, messages: list[dict]):
+        """Replace the queued messages of a destination, the queue size limit does not apply."""
+        stripe = self._stripe(destination)
+        with stripe.lock:
+            if messages:
+                with self._queues_lock:
+                    self._queues[destination] = deque(messages)
+                self._notify(stripe, destination)
+            else:
+                self._discard(destination)
+            stripe.not_full.notify_all()
+
+    def _notify(self, stripe: _Stripe, destination: Hashable):
+        stripe.not_empty.notify_all()
+        for loop, future in stripe.async_waiters.pop(destination, []):
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    # ===== Fetch =====
+
+    def fetch(
+            self,
+            destination: Hashable,
+            block: bool = False,
+            timeout: Optional[float] = None,
+            max_items: Optional[int] = None,
+    ) -> list[dict]:
+        """Take the queued messages of a destination.
+
+        Args:
+            destination: The destination, e.g. a task id.
+            block: Wait until at least one message is queued.
+            timeout: Seconds to wait at most if blocking, an empty list is returned after it.
+            max_items: Maximum number of messages taken, the others stay queued.
+        """
+        stripe = self._stripe(destination)
+        with stripe.lock:
+            if block and not self._size(destination):
+                stripe.not_empty.wait_for(lambda: self._size(destination) > 0, timeout)
+            return self._take(stripe, destination, max_items)
+
+    async def afetch(
+            self,
+            destination: Hashable,
+            timeout: Optional[float] = None,
+            max_items: Optional[int] = None,
+    ) -> list[dict]:
+        """Await the queued messages of a destination, an empty list is returned after timeout."""
+        stripe = self._stripe(destination)
+        with stripe.lock:
+            if self._size(destination):
+                return self._take(stripe, destination, max_items)
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            waiters = stripe.async_waiters.setdefault(destination, [])
+            waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with stripe.lock:
+                waiters = stripe.async_waiters.get(destination, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                if not waiters:
+                    stripe.async_waiters.pop(destination, None)
+        with stripe.lock:
+            return self._take(stripe, destination, max_items)
+
+    def _take(self, stripe: _Stripe, destination: Hashable, max_items: Optional[int]) -> list[dict]:
+        messages = self._queues.get(destination, None)
+        if not messages:
+            return []
+        count = len(messages) if max_items is None else min(max_items, len(messages))
+        taken = [messages.popleft() for _ in range(count)]
+        if not messages:
+            self._discard(destination)
+        stripe.not_full.notify_all()
+        return taken
+
+    def fetch_all(self) -> dict[Hashable, list[dict]]:
+        """Take the queued messages of all destinations."""
+        with self._queues_lock:
+            destinations = list(self._queues)
+        result = {}
+        for destination in destinations:
+            messages = self.fetch(destination)
+            if messages:
+                result[destination] = messages
+        return result
+
+    # ===== Inspection =====
+
+    def qsize(self, destination: Hashable) -> int:
+        messages = self._queues.get(destination, None)
+        return 0 if messages is None else len(messages)
+
+    @property
+    def destinations(self) -> list[Hashable]:
+        with self._queues_lock:
+            return list(self._queues)
@@ -37,7 +37,9 @@ def _review_task(remarks: str = None):
 
 class ConsoleInteractor(BaseMessagingUnit):
     """Abstract base class for fetching and submitting feedback interactions on tasks"""
-    _data = {}
+
+    def __init__(self):
+        self._data: dict[str, dict] = {}
 
     def fetch_all(self):
         return NotImplemented
@@ -7,7 +7,8 @@ from taskchain.task.task_node import Task
 
 class NonInteractor(BaseMessagingUnit):
     """Abstract base class for fetching and submitting feedback interactions on tasks"""
-    _data = {}
+    is_blocking = False
+
     def fetch_all(self):
         return NotImplemented
 
@@ -1,6 +1,8 @@
 from abc import abstractmethod
+from typing import Optional
 
 from taskchain.communication.base import BaseMessagingUnit
+from taskchain.communication.units.bus import MessageBus
 from taskchain.task import Task
 
 
@@ -13,50 +15,64 @@ class BaseMessaging(BaseMessagingUnit):
 
 class SimpleMessaging(BaseMessaging):
     """A router for sending and receiving messages between agents.
-    Stores messages in a dictionary keyed by receiver name.
+    Stores messages in per receiver queues of a thread safe message bus, keyed by the receiver task id.
+
+    Attributes:
+        bus (MessageBus): The message bus, can be shared by several units.
+        max_queue_size (int): Maximum number of queued messages per receiver of a new bus.
+            Submitting to a full queue blocks until the receiver fetched its messages.
     """
 
-    def __init__(self):
-        self._data = {}
-        self._receivers = []
+    is_blocking = False
+
+    def __init__(self, bus: Optional[MessageBus] = None, max_queue_size: Optional[int] = None):
+        self._bus = bus or MessageBus(max_queue_size=max_queue_size)
 
     def submit(
             self,
             message: str,
             header: dict = None,
             payload: dict = None,
+            timeout: Optional[float] = None,
             **kwargs: any):
         """Push a message to a receiver identified by the task id."""
         if header["destination"] is None:
             raise ValueError("No destination id specified.")
-        self._validate_receiver(header["destination"])
-        self._data[header["destination"]].append(
-            {"header": header, "body": message, "payload": payload}
-        )
+        self._bus.put(header["destination"], {"header": header, "body": message, "payload": payload}, timeout=timeout)
 
-    def fetch(self, task: Task) -> list[dict]:
+    async def asubmit(
+            self,
+            message: str,
+            header: dict = None,
+            payload: dict = None,
+            timeout: Optional[float] = None,
+            **kwargs: any):
+        if header["destination"] is None:
+            raise ValueError("No destination id specified.")
+        await self._bus.aput(header["destination"], {"header": header, "body": message, "payload": payload}, timeout=timeout)
+
+    def fetch(self, task: Task, timeout: Optional[float] = None) -> list[dict]:
         """Fetches all messages for a given task and clears the message queue.
-        Receiver is identified by the task id.
+        Receiver is identified by the task id. With a timeout, waits for the first message at most that long.
         """
-        messages = self._get_messages(task.id)
-        self._data[task.id] = []
-        return messages
-
-    def _get_messages(self, receiver: str) -> list[dict]:
-        self._validate_receiver(receiver)
-        return self._data[receiver]
+        return self._bus.fetch(task.id, block=timeout is not None, timeout=timeout)
 
-    def _validate_receiver(self, receiver: str):
-        if receiver not in self._receivers:
-            self._receivers.append(receiver)
-            self._data[receiver] = []
+    async def afetch(self, task: Task, timeout: Optional[float] = None) -> list[dict]:
+        """Async version of fetch(), awaits the first message at most timeout seconds if given."""
+        if timeout is None:
+            return self._bus.fetch(task.id)
+        return await self._bus.afetch(task.id, timeout=timeout)
 
-    def fetch_all(self):
-        ...
+    def fetch_all(self) -> dict[str, list[dict]]:
+        """Fetches the messages of all receivers, keyed by receiver id."""
+        return self._bus.fetch_all()
 
     @property
     def type(self):
         return "direct"
 
     def submit_direct(self, formatted_message: dict):
-        self._data.update(formatted_message)
+        """Set already formatted messages, a dict of receiver ids and their lists of messages.
+        The messages of a receiver replace the ones queued for it."""
+        for destination, messages in formatted_message.items():
+            self._bus.replace(destination, messages)
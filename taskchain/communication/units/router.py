@@ -0,0 +1,175 @@
+"""Issue message unit indexing reported issues by the ancestors of their source task."""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Optional
+
+from taskchain.communication.base import BaseMessagingUnit
+from taskchain.task import Task
+
+
+class IssueRouter(BaseMessagingUnit):
+    """Routes issues to the managers of the subtrees they were reported in.
+
+    Every issue is indexed under its source task and all ancestors of it, so a manager takes the
+    issues of its subtree with fetch_for() in O(k) for k matching issues instead of draining and
+    re-submitting all issues. A taken issue is removed from all index entries, so it is delivered
+    at most once, and an issue escalated while it is handled is not delivered again to a handler
+    that already had it. Once an issue is completed, the same id raised again is a new issue. The time from submission to delivery and from delivery to completion is measured per issue.
+
+    The ancestors are read from header["ancestors"] if the submitter sets it, otherwise they are
+    resolved with the ancestors callable.
+
+    Attributes:
+        ancestors: Callable(task_id) -> ancestor ids, used for issues submitted without ancestors.
+        history: Number of latency measurements kept for the statistics.
+    """
+
+    is_blocking = False
+
+    def __init__(self, ancestors: Callable[[str], list[str]] = None, history: int = 1000):
+        self.ancestors = ancestors
+        self._issues: dict[str, dict] = {}
+        self._index: dict[str, dict[str, None]] = {}
+        self._keys: dict[str, list[str]] = {}
+        self._submitted_at: dict[str, float] = {}
+        self._delivered_at: dict[str, float] = {}
+        self._delivered_to: dict[str, set[str]] = {}
+        self._queue_latency: deque[float] = deque(maxlen=history)
+        self._handling_latency: deque[float] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def bind(self, ancestors: Callable[[str], list[str]]):
+        """Set the ancestor lookup, e.g. task_network.get_ancestors."""
+        self.ancestors = ancestors
+
+    # ===== Submit =====
+
+    def submit(
+            self,
+            message: str,
+            header: dict,
+            payload: dict = None,
+            **kwargs: any):
+        self.submit_direct({"header": header, "body": message, "payload": payload})
+
+    def submit_direct(self, formatted_message: dict):
+        header = formatted_message["header"]
+        payload = formatted_message.get("payload", None) or {}
+        source = header.get("source", None)
+        issue_id = payload.get("id", None) or uuid.uuid4().hex
+        ancestors = header.get("ancestors", None)
+        if ancestors is None:
+            ancestors = self.ancestors(source) if self.ancestors is not None and source is not None else []
+        keys = ([source] if source is not None else []) + list(ancestors)
+
+        with self._lock:
+            self._remove(issue_id)
+            self._issues[issue_id] = formatted_message
+            self._keys[issue_id] = keys
+            for key in keys:
+                self._index.setdefault(key, {})[issue_id] = None
+            if issue_id in self._delivered_at:
+                # escalated by its handler, the issue keeps its submission time and handlers
+                self._submitted_at.setdefault(issue_id, time.monotonic())
+            else:
+                self._submitted_at[issue_id] = time.monotonic()
+                self._delivered_to.pop(issue_id, None)
+
+    # ===== Fetch =====
+
+    def fetch_for(self, ancestor_id: str, handler_id: Optional[str] = None) -> list[dict]:
+        """Take the issues reported in the subtree below a task, the task itself excluded.
+
+        Args:
+            ancestor_id: The root task of the subtree, e.g. the task of a pipeline manager.
+            handler_id: Identifies the handler for at most once delivery, defaults to ancestor_id.
+        """
+        handler_id = handler_id or ancestor_id
+        now = time.monotonic()
+        taken = []
+        with self._lock:
+            for issue_id in list(self._index.get(ancestor_id, {})):
+                message = self._issues[issue_id]
+                if message["header"].get("source", None) == ancestor_id:
+                    continue
+                if handler_id in self._delivered_to.get(issue_id, ()):
+                    continue
+                self._remove(issue_id)
+                self._delivered_to.setdefault(issue_id, set()).add(handler_id)
+                self._delivered_at[issue_id] = now
+                self._queue_latency.append(now - self._submitted_at.get(issue_id, now))
+                taken.append(message)
+        return taken
+
+    async def afetch_for(self, ancestor_id: str, handler_id: Optional[str] = None) -> list[dict]:
+        return self.fetch_for(ancestor_id, handler_id)
+
+    def fetch_all(self) -> list[dict]:
+        """Take all queued issues regardless of their source."""
+        with self._lock:
+            messages = list(self._issues.values())
+            for issue_id in list(self._issues):
+                self._remove(issue_id)
+                self._submitted_at.pop(issue_id, None)
+                self._delivered_to.pop(issue_id, None)
+        return messages
+
+    def fetch(self, task: Task) -> list[dict]:
+        return []
+
+    def complete(self, issue_id: str):
+        """Record that a delivered issue was handled, resolved or escalated.
+        The state of a resolved issue is dropped, an escalated one keeps it until it is completed upstream."""
+        with self._lock:
+            delivered_at = self._delivered_at.pop(issue_id, None)
+            if delivered_at is not None:
+                self._handling_latency.append(time.monotonic() - delivered_at)
+            if issue_id not in self._issues:
+                self._submitted_at.pop(issue_id, None)
+                self._delivered_to.pop(issue_id, None)
+
+    def _remove(self, issue_id: str):
+        self._issues.pop(issue_id, None)
+        for key in self._keys.pop(issue_id, []):
+            bucket = self._index.get(key, None)
+            if bucket is not None:
+                bucket.pop(issue_id, None)
+                if not bucket:
+                    del self._index[key]
+
+    # ===== Statistics =====
+
+    @property
+    def pending(self) -> int:
+        return len(self._issues)
+
+    @property
+    def stats(self) -> dict[str, any]:
+        """Latencies in seconds from submission to delivery (queue) and from delivery to completion (handling)."""
+        with self._lock:
+            return {
+                "pending": len(self._issues),
+                "queue_latency": _summary(self._queue_latency),
+                "handling_latency": _summary(self._handling_latency),
+            }
+
+    @property
+    def type(self):
+        return "issue"
+
+
+def _summary(values: deque[float]) -> dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
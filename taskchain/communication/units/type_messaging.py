@@ -1,25 +1,37 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from taskchain.communication.base import BaseMessagingUnit
+from taskchain.communication.units.bus import MessageBus
 from taskchain.task import Task
 
 
 class SingleTypeMessaging(BaseMessagingUnit):
 
-    def __init__(self, message_type: str):
+    is_blocking = False
+
+    def __init__(self, message_type: str, bus: Optional[MessageBus] = None, max_queue_size: Optional[int] = None):
         """ Stores messages of a given type.
-        Allows fetching and submitting of messages of that type without receiver verification
+        Allows fetching and submitting of messages of that type without receiver verification.
+        The messages are queued on a thread safe message bus under the message type.
 
         Attributes:
             message_type (str): the type of messages to be stored
+            bus (MessageBus): the message bus, can be shared by several units
+            max_queue_size (int): maximum number of queued messages of a new bus
         """
         self._type = message_type
-        self._data: list[dict] = []
+        self._bus = bus or MessageBus(stripes=1, max_queue_size=max_queue_size)
+
+    def fetch_all(self, timeout: Optional[float] = None) -> list[dict]:
+        """Take all queued messages. With a timeout, waits for the first message at most that long."""
+        return self._bus.fetch(self._type, block=timeout is not None, timeout=timeout)
 
-    def fetch_all(self):
-        messages = self._data
-        self._data = []
-        return messages
+    async def afetch_all(self, timeout: Optional[float] = None) -> list[dict]:
+        if timeout is None:
+            return self._bus.fetch(self._type)
+        return await self._bus.afetch(self._type, timeout=timeout)
 
     def fetch(self, task: Task) -> list[dict]:
         return []
@@ -29,13 +41,24 @@ class SingleTypeMessaging(BaseMessagingUnit):
             message: str,
             header: dict,
             payload: dict = None,
+            timeout: Optional[float] = None,
             **kwargs: any):
         """Add a message with self._type to the message queue without specific destination id."""
         message = {"header": header, "body": message, "payload": payload}
-        self._data.append(message)
+        self._bus.put(self._type, message, timeout=timeout)
+
+    async def asubmit(
+            self,
+            message: str,
+            header: dict,
+            payload: dict = None,
+            timeout: Optional[float] = None,
+            **kwargs: any):
+        message = {"header": header, "body": message, "payload": payload}
+        await self._bus.aput(self._type, message, timeout=timeout)
 
     def submit_direct(self, formatted_message: dict):
-        self._data.append(formatted_message)
+        self._bus.put(self._type, formatted_message)
 
     @property
     def type(self):
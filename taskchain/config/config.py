@@ -11,8 +11,6 @@ from dotenv import load_dotenv
 from taskchain.singleton import Singleton
 from taskchain.utilities import find_file_in_parents, find_root_dir
 
-load_dotenv(verbose=True, override=True)
-
 
 class Config(metaclass=Singleton):
     """Configuration class to store the state of bools for different scripts access.
@@ -20,6 +18,7 @@ class Config(metaclass=Singleton):
 
     def __init__(self) -> None:
         """Initialize the Config class"""
+        load_dotenv(verbose=True, override=True)
         filename = find_file_in_parents("config.yaml")
         with open(filename) as f:
             self.config_file = yaml.load(f, Loader=yaml.FullLoader)
@@ -54,6 +53,36 @@ class Config(metaclass=Singleton):
         self.openai_api_key = self.getenv("OPENAI_API_KEY", set_env=True)
         self.serp_api_key = self.getenv("SERPAPI_API_KEY", set_env=True)
 
+        self.llm_cache = self.getenv("LLM_CACHE", False)
+        self.llm_cache_path = self.getenv("LLM_CACHE_PATH", os.path.join(self.local_storage_dir, "llm_cache.sqlite"))
+        self.llm_cache_ttl = self.getenv("LLM_CACHE_TTL", None)
+        self.llm_cache_max_entries = self.getenv("LLM_CACHE_MAX_ENTRIES", None)
+        self.llm_cache_bypass = self.getenv("LLM_CACHE_BYPASS", False)
+
+        self.llm_backend = self.getenv("LLM_BACKEND", "openai")
+        self.llm_gateway = self.getenv("LLM_GATEWAY", "True")
+        # per model limits, a mapping in config.yaml or a JSON object in the environment, e.g.
+        # LLM_RATE_LIMITS='{"gpt-3.5-turbo": {"rpm": 3500, "tpm": 90000, "max_concurrency": 32}}'
+        self.llm_rate_limits = self.getenv("LLM_RATE_LIMITS", {})
+        self.llm_max_concurrency = self.getenv("LLM_MAX_CONCURRENCY", "16")
+        self.llm_max_retries = self.getenv("LLM_MAX_RETRIES", "6")
+
+        self.web_fetch_concurrency = self.getenv("WEB_FETCH_CONCURRENCY", "8")
+        self.web_fetch_browser_contexts = self.getenv("WEB_FETCH_BROWSER_CONTEXTS", "4")
+        # seconds between two requests to the same domain
+        self.web_fetch_domain_delay = self.getenv("WEB_FETCH_DOMAIN_DELAY", "1.0")
+        self.web_cache = self.getenv("WEB_CACHE", "True")
+        # seconds until cached pages are revalidated, search results expire after web_cache_query_ttl
+        self.web_cache_ttl = self.getenv("WEB_CACHE_TTL", "604800")
+        self.web_cache_query_ttl = self.getenv("WEB_CACHE_QUERY_TTL", "86400")
+        self.web_cache_max_bytes = self.getenv("WEB_CACHE_MAX_BYTES", "536870912")
+
+        self.typed_task_store = self.getenv("TYPED_TASK_STORE", False)
+        self.task_journal = self.getenv("TASK_JOURNAL", False)
+        self.resource_context_budget = self.getenv("RESOURCE_CONTEXT_BUDGET", None)
+        self.task_memoization = self.getenv("TASK_MEMOIZATION", False)
+        self.task_memoization_ttl = self.getenv("TASK_MEMOIZATION_TTL", None)
+
     def get_local_dirs(self):
         """Get root storage dir and logging dir in root path.
         For execution from different paths, this is needed to ensure
@@ -76,7 +105,7 @@ class Config(metaclass=Singleton):
     def getenv(self, key: str, default: Union[str, dict] = None, set_env: bool = True
                ) -> Union[str, int, float, bool, dict]:
         """Get an environment variable."""
-        value = self.config_file.get(key, default)
+        value = self.config_file.get(key, None)
         if value:
             return value
         value = os.getenv(key, default)
@@ -84,7 +113,7 @@ class Config(metaclass=Singleton):
             return True
         if value == "False":
             return False
-        if set_env and value:
+        if set_env and value and isinstance(value, str):
             os.environ[key] = value
         return value
 
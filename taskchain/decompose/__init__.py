@@ -1,2 +1,12 @@
-from taskchain.decompose.pipeline import SimplePipelineDecomposer
-from taskchain.decompose.project import SimpleProjectDecomposer
+from typing import TYPE_CHECKING
+
+from taskchain.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from taskchain.decompose.pipeline import SimplePipelineDecomposer
+    from taskchain.decompose.project import SimpleProjectDecomposer
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "SimplePipelineDecomposer": "taskchain.decompose.pipeline",
+    "SimpleProjectDecomposer": "taskchain.decompose.project",
+})
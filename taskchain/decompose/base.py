@@ -15,16 +15,26 @@ class BaseTaskDecomposer(ABC):
             storage_context: TaskContextStore,
             root_type: TaskType,
             agents: list[dict] = None,
+            assign_batch_size: int = None,
+            assign_top_k: int = None,
     ):
         """Base Class for decompose an objective into tasks and subtasks.
         Attributes:
             objective: the initial objective or problem description
             storage_context: TaskContextStore creates graph, storage and optional mirrors task to a Project Board
             root_type: one of Project, Pipeline, Task or Subtask
+            assign_batch_size: number of tasks assigned to agents with a single LLM call
+            assign_top_k: number of agents pre-selected by embedding similarity for each task
         """
         self.storage_context = storage_context
         self.root_type = root_type
         self.agents = agents
+        self.assign_batch_size = assign_batch_size
+        self.assign_top_k = assign_top_k
+
+    @property
+    def assign_kwargs(self) -> dict:
+        return dict(batch_size=self.assign_batch_size, top_k=self.assign_top_k)
 
     @abstractmethod
     def create_tasks(self, objective: str, verbose: bool = True, run_async: bool = True):
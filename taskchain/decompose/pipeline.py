@@ -17,18 +17,38 @@ class SimplePipelineDecomposer(BaseTaskDecomposer):
             self,
             storage_context: TaskContextStore,
             agents: list[dict] = None,
+            assign_batch_size: int = None,
+            assign_top_k: int = None,
     ):
-        super().__init__(storage_context, root_type=TaskType.PIPELINE, agents=agents)
+        super().__init__(
+            storage_context,
+            root_type=TaskType.PIPELINE,
+            agents=agents,
+            assign_batch_size=assign_batch_size,
+            assign_top_k=assign_top_k
+        )
+
+    async def acreate_tasks(self, objective: str, verbose: bool = True) -> Tuple[Task, Sequence[Task]]:
+        """Breaks down the objective into tasks and assigns agents within the running event loop."""
+        parent, children = await abreak_down_objective(objective, parent_type=self.root_type, verbose=verbose)
+        children = [update_relation(child, TaskRelations.ROOT, parent.id) for child in children]
+        if self.agents:
+            children = await self.aassign_tasks(children, verbose=verbose)
+
+        return self.store_tasks(parent, children)
+
+    async def aassign_tasks(self, tasks: Sequence[Task], verbose: bool = True) -> Sequence[Task]:
+        return await aassign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs)
 
     def create_tasks(self, objective: str, verbose: bool = True, run_async: bool = False) -> Tuple[Task, Sequence[Task]]:
         """Breaks down the objective into tasks and stores them in the storage context."""
         if run_async:
-            parent, children = asyncio.run(abreak_down_objective(objective, parent_type=self.root_type, verbose=verbose))
-        else:
-            parent, children = break_down_objective(objective, parent_type=self.root_type, verbose=verbose)
+            return asyncio.run(self.acreate_tasks(objective, verbose=verbose))
+
+        parent, children = break_down_objective(objective, parent_type=self.root_type, verbose=verbose)
         children = [update_relation(child, TaskRelations.ROOT, parent.id) for child in children]
         if self.agents:
-            children = self.assign_tasks(children, run_async=run_async)
+            children = self.assign_tasks(children, run_async=False)
 
         return self.store_tasks(parent, children)
 
@@ -39,8 +59,8 @@ class SimplePipelineDecomposer(BaseTaskDecomposer):
             verbose: bool = True) -> Sequence[Task]:
         """Assigns agents to tasks."""
         if run_async:
-            return asyncio.run(aassign_agents_to_tasks(tasks, self.agents, verbose=verbose))
-        return assign_agents_to_tasks(tasks, self.agents, verbose=verbose)
+            return asyncio.run(aassign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs))
+        return assign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs)
 
     def store_tasks(self, parent, children) -> Tuple[Task, Sequence[Task]]:
         self.storage_context.add_tasks(parent, children)
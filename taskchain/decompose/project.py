@@ -5,7 +5,7 @@ from typing import Sequence, Tuple
 
 from taskchain.decompose.base import BaseTaskDecomposer
 from taskchain.decompose.utilities import (
-    break_down_project, aassign_agents_to_tasks, assign_agents_to_tasks
+    break_down_project, abreak_down_project, aassign_agents_to_tasks, assign_agents_to_tasks
 )
 from taskchain.schema import TaskType
 from taskchain.storage.storage_context import TaskContextStore
@@ -17,15 +17,40 @@ class SimpleProjectDecomposer(BaseTaskDecomposer):
             self,
             storage_context: TaskContextStore = TaskContextStore(),
             agents: list[dict] = None,
+            assign_batch_size: int = None,
+            assign_top_k: int = None,
     ):
         """Decomposes a project into tasks and stores them in the storage context."""
-        super().__init__(storage_context, root_type=TaskType.PROJECT)
-        self.agents = agents
+        super().__init__(
+            storage_context,
+            root_type=TaskType.PROJECT,
+            agents=agents,
+            assign_batch_size=assign_batch_size,
+            assign_top_k=assign_top_k
+        )
 
     def assign_tasks(self, tasks: Sequence[Sequence[Task]], run_async: bool = True, verbose: bool = True) -> Sequence[Sequence[Task]]:
         if run_async:
-            return asyncio.run(aassign_agents_to_tasks(tasks, self.agents, verbose=verbose))
-        return assign_agents_to_tasks(tasks, self.agents, verbose=verbose)
+            return asyncio.run(aassign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs))
+        return assign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs)
+
+    async def aassign_tasks(self, tasks: Sequence[Sequence[Task]], verbose: bool = True) -> Sequence[Sequence[Task]]:
+        return await aassign_agents_to_tasks(tasks, self.agents, verbose=verbose, **self.assign_kwargs)
+
+    async def acreate_tasks(
+            self, objective: str, verbose: bool = True
+    ) -> Tuple[Task, Sequence[Task], Sequence[Sequence[Task]]]:
+        """Create a task pipelines and sequence of subtasks from an input string
+        with decomposition and agent assignment running in the same event loop.
+        Attributes:
+            objective: The objective of the project.
+        """
+        project, pipelines, tasks = await abreak_down_project(objective, verbose=verbose)
+
+        if self.agents:
+            tasks = await self.aassign_tasks(tasks, verbose=verbose)
+
+        return self.store_tasks(project, pipelines, tasks)
 
     def create_tasks(
             self, objective: str, verbose: bool = True, run_async: bool = True
@@ -35,8 +60,10 @@ class SimpleProjectDecomposer(BaseTaskDecomposer):
         Attributes:
             objective: The objective of the project.
         """
+        if run_async:
+            return asyncio.run(self.acreate_tasks(objective, verbose=verbose))
 
-        project, pipelines, tasks = break_down_project(objective, verbose=verbose, run_async=run_async)
+        project, pipelines, tasks = break_down_project(objective, verbose=verbose, run_async=False)
 
         if self.agents:
             tasks = self.assign_tasks(tasks, run_async=run_async)
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 import asyncio
+import math
+import uuid
+from functools import lru_cache
 from typing import Sequence, Tuple, Optional, Union
 
+from langchain.chains.base import Chain
+from langchain.embeddings.base import Embeddings
+
 from taskchain.chains.loader import load_chain
 from taskchain.parser.string_formatter import format_nested_object
 from taskchain.schema import TaskType, TaskRelations
-from taskchain.schema.output_model import PredictChoice
+from taskchain.schema.output_model import (
+    PredictChoice, PredictAssignmentSequence, PredictTask, PredictTaskSequence
+)
 from taskchain.schema.types import PromptTypes
 from taskchain.task.task_node import Task
 from taskchain.task.utilities import update_relation
@@ -19,14 +27,65 @@ CHILD_TASK_TYPE = {
 
 
 
-def _assign_agents_to_tasks(task: Task, agents: list[dict], verbose: bool = False) -> Task:
-    """Assign agents to tasks."""
+DEFAULT_ASSIGN_CONCURRENCY = 8
+
+_AGENT_EMBEDDINGS: dict[str, list[float]] = {}
+
+
+@lru_cache(maxsize=None)
+def _get_chain(prompt_type: PromptTypes, verbose: bool = False) -> Chain:
+    """Load a chain once per prompt type, LLMChains hold no run state and can be shared."""
+    return load_chain(prompt_type, verbose=verbose)
+
+
+def _numbered_agents(agents: list[dict]) -> str:
     numbered_list = []
     for i, agent in enumerate(agents):
         numbered_list.append(f"{i+1}. Name: {agent['name']}, Description: {agent['description']}")
-    numbered_list = "\n".join(numbered_list)
-    chain = load_chain(PromptTypes.ASSIGN_TASK, verbose=verbose)
-    context = f"TASK:\n{task.get_summary(indent=4)}\n\nAGENTS:\n{numbered_list}"
+    return "\n".join(numbered_list)
+
+
+def _cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def filter_candidate_agents(
+        tasks: Sequence[Task],
+        agents: list[dict],
+        top_k: Optional[int],
+        embeddings: Embeddings = None
+) -> list[list[dict]]:
+    """Select the top_k agents per task by embedding similarity of task and agent description.
+    Agent embeddings are cached across calls, all tasks are embedded with one request.
+    """
+    if not top_k or top_k >= len(agents) or not tasks:
+        return [agents for _ in tasks]
+
+    if embeddings is None:
+        from langchain.embeddings import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings()
+
+    descriptions = [f"{agent['name']}: {agent['description']}" for agent in agents]
+    missing = [text for text in dict.fromkeys(descriptions) if text not in _AGENT_EMBEDDINGS]
+    if missing:
+        _AGENT_EMBEDDINGS.update(zip(missing, embeddings.embed_documents(missing)))
+    agent_vectors = [_AGENT_EMBEDDINGS[text] for text in descriptions]
+    task_vectors = embeddings.embed_documents([task.get_summary() for task in tasks])
+
+    candidates = []
+    for task_vector in task_vectors:
+        scores = [_cosine_similarity(task_vector, agent_vector) for agent_vector in agent_vectors]
+        ranked = sorted(range(len(agents)), key=lambda i: scores[i], reverse=True)[:top_k]
+        candidates.append([agents[i] for i in sorted(ranked)])
+    return candidates
+
+
+def _assign_agents_to_tasks(task: Task, agents: list[dict], verbose: bool = False) -> Task:
+    """Assign agents to tasks."""
+    chain = _get_chain(PromptTypes.ASSIGN_TASK, verbose=verbose)
+    context = f"TASK:\n{task.get_summary(indent=4)}\n\nAGENTS:\n{_numbered_agents(agents)}"
     choice: PredictChoice = chain.predict_and_parse(context=context, remarks="Begin!")
     agent = agents[int(choice.choice) - 1]
     task = update_relation(task, TaskRelations.AGENT, agent["name"])
@@ -35,55 +94,148 @@ def _assign_agents_to_tasks(task: Task, agents: list[dict], verbose: bool = Fals
 #TODO: add verbose to execution chain
 async def _aassign_agents_to_tasks(task: Task, agents: list[dict], verbose: bool = False) -> Task:
     """Assign agents to tasks Async."""
-    numbered_list = []
-    for i, agent in enumerate(agents):
-        numbered_list.append(f"{i+1}. Name: {agent['name']}, Description: {agent['description']}")
-    numbered_list = "\n".join(numbered_list)
-    chain = load_chain(PromptTypes.ASSIGN_TASK, verbose=verbose)
-    context = f"TASK:\n{task.get_summary(indent=4)}\n\nAGENTS:\n{numbered_list}"
+    chain = _get_chain(PromptTypes.ASSIGN_TASK, verbose=verbose)
+    context = f"TASK:\n{task.get_summary(indent=4)}\n\nAGENTS:\n{_numbered_agents(agents)}"
     choice: PredictChoice = await chain.apredict_and_parse(context=context, remarks="Begin!")
     agent = agents[int(choice.choice) - 1]
     task = update_relation(task, TaskRelations.AGENT, agent["name"])
     return task
 
+
+def _batch_context(tasks: Sequence[Task], agents: list[dict]) -> str:
+    numbered_tasks = "\n".join(f"{i+1}. {task.get_summary(indent=4).strip()}" for i, task in enumerate(tasks))
+    return f"TASKS:\n{numbered_tasks}\n\nAGENTS:\n{_numbered_agents(agents)}"
+
+
+def _apply_batch_assignments(
+        tasks: Sequence[Task],
+        agents: list[dict],
+        assignments: PredictAssignmentSequence
+) -> tuple[list[Task], list[int]]:
+    """Set the assigned agents, returns the tasks and the indices of tasks without valid assignment."""
+    tasks = list(tasks)
+    assigned = set()
+    for assignment in assignments.assignments:
+        task_index, agent_index = int(assignment.task) - 1, int(assignment.choice) - 1
+        if 0 <= task_index < len(tasks) and 0 <= agent_index < len(agents):
+            tasks[task_index] = update_relation(tasks[task_index], TaskRelations.AGENT, agents[agent_index]["name"])
+            assigned.add(task_index)
+    return tasks, [i for i in range(len(tasks)) if i not in assigned]
+
+
+def _union_agents(candidates: Sequence[list[dict]]) -> list[dict]:
+    return list({agent["name"]: agent for agents in candidates for agent in agents}.values())
+
+
+def _assign_agents_batch(
+        tasks: Sequence[Task],
+        candidates: Sequence[list[dict]],
+        verbose: bool = False
+) -> list[Task]:
+    """Assign agents to several tasks with one call, tasks missing in the answer are assigned one by one."""
+    agents = _union_agents(candidates)
+    chain = _get_chain(PromptTypes.ASSIGN_TASK_BATCH, verbose=verbose)
+    assignments = chain.predict_and_parse(context=_batch_context(tasks, agents), remarks="Begin!")
+    tasks, missing = _apply_batch_assignments(tasks, agents, assignments)
+    for i in missing:
+        tasks[i] = _assign_agents_to_tasks(tasks[i], candidates[i], verbose=verbose)
+    return tasks
+
+
+async def _aassign_agents_batch(
+        tasks: Sequence[Task],
+        candidates: Sequence[list[dict]],
+        verbose: bool = False
+) -> list[Task]:
+    """Assign agents to several tasks with one call Async."""
+    agents = _union_agents(candidates)
+    chain = _get_chain(PromptTypes.ASSIGN_TASK_BATCH, verbose=verbose)
+    assignments = await chain.apredict_and_parse(context=_batch_context(tasks, agents), remarks="Begin!")
+    tasks, missing = _apply_batch_assignments(tasks, agents, assignments)
+    missing_tasks = await asyncio.gather(
+        *[_aassign_agents_to_tasks(tasks[i], candidates[i], verbose=verbose) for i in missing]
+    )
+    for i, task in zip(missing, missing_tasks):
+        tasks[i] = task
+    return tasks
+
+
+def _flatten_tasks(
+        tasks: Union[Sequence[Sequence[Task]], Sequence[Task]]
+) -> tuple[list[Task], Optional[list[int]]]:
+    """Flatten a sequence of pipelines, returns the tasks and the pipeline lengths (None if flat)."""
+    if not tasks or isinstance(tasks[0], Task):
+        return list(tasks), None
+    return [task for pipeline_tasks in tasks for task in pipeline_tasks], [len(p) for p in tasks]
+
+
+def _unflatten_tasks(tasks: list[Task], lengths: Optional[list[int]]):
+    if lengths is None:
+        return tasks
+    seq_tasks, start = [], 0
+    for length in lengths:
+        seq_tasks.append(tasks[start:start + length])
+        start += length
+    return seq_tasks
+
+
+def _batches(items: Sequence, batch_size: Optional[int]) -> list[tuple[int, int]]:
+    batch_size = batch_size or 1
+    return [(start, min(start + batch_size, len(items))) for start in range(0, len(items), batch_size)]
+
+
 #TODO: add verbose to execution chain
 def assign_agents_to_tasks(
         tasks: Union[Sequence[Sequence[Task]],Sequence[Task]],
         agents: list[dict],
-        verbose: bool=False
+        verbose: bool=False,
+        batch_size: Optional[int] = None,
+        top_k: Optional[int] = None,
 ) -> Union[Sequence[Sequence[Task]],Sequence[Task]]:
-    _tasks = []
-
-    for pipeline_tasks in tasks:
-
-        if isinstance(pipeline_tasks, Task):
-            _tasks.append(_assign_agents_to_tasks(pipeline_tasks, agents, verbose=verbose))
+    """Assign agents to a sequence of tasks or of pipelines of tasks.
+    Attributes:
+        batch_size: If set, up to batch_size tasks are assigned with a single call.
+        top_k: If set, only the top_k agents by embedding similarity are offered per task.
+    """
+    flat_tasks, lengths = _flatten_tasks(tasks)
+    candidates = filter_candidate_agents(flat_tasks, agents, top_k)
 
+    assigned = []
+    for start, end in _batches(flat_tasks, batch_size):
+        if end - start == 1:
+            assigned.append(_assign_agents_to_tasks(flat_tasks[start], candidates[start], verbose=verbose))
         else:
-            _pipeline_tasks = []
-            for task in pipeline_tasks:
-                task = _assign_agents_to_tasks(task, agents, verbose=verbose)
-                _pipeline_tasks.append(task)
-            _tasks.append(_pipeline_tasks)
-    return _tasks
+            assigned.extend(_assign_agents_batch(flat_tasks[start:end], candidates[start:end], verbose=verbose))
+    return _unflatten_tasks(assigned, lengths)
 
 #TODO: add verbose to execution chain
 async def aassign_agents_to_tasks(
         tasks: Union[Sequence[Sequence[Task]], Sequence[Task]],
         agents: list[dict],
-        verbose: bool=False
+        verbose: bool=False,
+        batch_size: Optional[int] = None,
+        top_k: Optional[int] = None,
+        max_concurrency: int = DEFAULT_ASSIGN_CONCURRENCY,
 ) -> Union[Sequence[Sequence[Task]], Sequence[Task]]:
+    """Assign agents to a sequence of tasks or of pipelines of tasks Async.
+    The calls of all pipelines run concurrently, bounded by max_concurrency.
+    Attributes:
+        batch_size: If set, up to batch_size tasks are assigned with a single call.
+        top_k: If set, only the top_k agents by embedding similarity are offered per task.
+        max_concurrency: Maximum number of concurrent LLM calls.
+    """
+    flat_tasks, lengths = _flatten_tasks(tasks)
+    candidates = await asyncio.to_thread(filter_candidate_agents, flat_tasks, agents, top_k)
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-    if isinstance(tasks[0], Task):
-        _tasks = await asyncio.gather(*[_aassign_agents_to_tasks(task, agents, verbose=verbose) for task in tasks])
-        return _tasks
-    seq_tasks = []
-    for pipeline_tasks in tasks:
-        _pipeline_tasks = []
-        _inputs = [{"task": task, "agents": agents, "verbose": verbose} for task in pipeline_tasks]
-        _tasks = await asyncio.gather(*[_aassign_agents_to_tasks(**_input) for _input in _inputs])
-        seq_tasks.append(_tasks)
-    return seq_tasks
+    async def _assign(start: int, end: int) -> list[Task]:
+        async with semaphore:
+            if end - start == 1:
+                return [await _aassign_agents_to_tasks(flat_tasks[start], candidates[start], verbose=verbose)]
+            return await _aassign_agents_batch(flat_tasks[start:end], candidates[start:end], verbose=verbose)
+
+    results = await asyncio.gather(*[_assign(start, end) for start, end in _batches(flat_tasks, batch_size)])
+    return _unflatten_tasks([task for batch in results for task in batch], lengths)
 
 def break_down_objective(
         objective: str,
@@ -116,21 +268,40 @@ def break_down_objective(
     else:
         parent_task.summary = summary
 
-    children = [Task(**child.dict(), type=child_type) for child in children.tasks]
-    children_tasks = []
+    return parent_task, _link_children(children, parent_task.id, child_type)
+
+
+async def _asummarize_objective(objective: str, is_chunk: bool = False, verbose: bool = True) -> str:
+    prompt_type = PromptTypes.BREAK_DOWN_CHUNK if is_chunk else PromptTypes.BREAK_DOWN
+    summary_chain = _get_chain(prompt_type, verbose=verbose)
+    return await summary_chain.apredict_and_parse(context=objective, remarks="Begin!")
+
 
+async def _aextend_summary(summary: str, verbose: bool = True) -> PredictTaskSequence:
+    extend_chain = _get_chain(PromptTypes.EXTEND_LIST, verbose=verbose)
+    return await extend_chain.apredict_and_parse(context=summary, remarks="Begin!")
+
+
+async def _apredict_parent(children: PredictTaskSequence, objective: str, verbose: bool = True) -> PredictTask:
+    parent_chain = _get_chain(PromptTypes.PARENT_TASK, verbose=verbose)
+    context = format_nested_object(children.dict())
+    remarks = f"Known information about the parent task: {objective} \nBegin! "
+    return await parent_chain.apredict_and_parse(context=context, remarks=remarks)
+
+
+def _link_children(children: PredictTaskSequence, parent_id: str, child_type: TaskType) -> list[Task]:
+    """Create child tasks and chain them with parent, previous and next relations."""
+    children = [Task(**child.dict(), type=child_type) for child in children.tasks]
     for i, child in enumerate(children):
         next_task_id = children[i + 1].id if i + 1 < len(children) else None
         prev_task_id = children[i - 1].id if i - 1 >= 0 else None
-        relations = {
-            TaskRelations.PARENT: parent_task.id,
+        child.relations = {
+            TaskRelations.PARENT: parent_id,
             TaskRelations.NEXT: next_task_id,
             TaskRelations.PREV: prev_task_id,
         }
-        child.relations = relations
+    return children
 
-        children_tasks.append(child)
-    return parent_task, children_tasks
 
 async def abreak_down_objective(
         objective: str,
@@ -141,45 +312,19 @@ async def abreak_down_objective(
         verbose: bool = True,
 
 ) -> Tuple[Task, Sequence[Task]]:
-    """Create a task and sequence of subtasks from an input string."""
+    """Create a task and sequence of subtasks from an input string Async."""
     child_type = child_type or CHILD_TASK_TYPE[parent_type]
 
-    remarks = "Begin!"
-    if is_chunk:
-        prompt_type = PromptTypes.BREAK_DOWN_CHUNK
-    else:
-        prompt_type = PromptTypes.BREAK_DOWN
-    summary_chain = load_chain(prompt_type, suggest=False, verbose=verbose)
-    summary = await summary_chain.apredict_and_parse(context=objective, remarks=remarks)
-
-    extend_chain = load_chain(PromptTypes.EXTEND_LIST, verbose=verbose)
-    children = await extend_chain.apredict_and_parse(context=summary, remarks=remarks)
-    print(children)
+    summary = await _asummarize_objective(objective, is_chunk=is_chunk, verbose=verbose)
+    children = await _aextend_summary(summary, verbose=verbose)
 
     if not parent_task:
-        parent_chain = load_chain(PromptTypes.PARENT_TASK, verbose=verbose)
-        context = format_nested_object(children.dict())
-        remarks = f"Known information about the parent task: {objective} \nBegin! "
-        parent = await parent_chain.apredict_and_parse(context=context, remarks=remarks)
+        parent = await _apredict_parent(children, objective, verbose=verbose)
         parent_task = Task(**parent.dict(), summary=summary, type=parent_type)
     else:
         parent_task.summary = summary
 
-    children = [Task(**child.dict(), type=child_type) for child in children.tasks]
-    children_tasks = []
-
-    for i, child in enumerate(children):
-        next_task_id = children[i + 1].id if i + 1 < len(children) else None
-        prev_task_id = children[i - 1].id if i - 1 >= 0 else None
-        relations = {
-            TaskRelations.PARENT: parent_task.id,
-            TaskRelations.NEXT: next_task_id,
-            TaskRelations.PREV: prev_task_id,
-        }
-        child.relations = relations
-
-        children_tasks.append(child)
-    return parent_task, children_tasks
+    return parent_task, _link_children(children, parent_task.id, child_type)
 
 
 def break_down_task(task: Task, verbose: bool = False):
@@ -253,6 +398,37 @@ def _break_down_pipelines(task_dict: dict[str, Task], verbose: bool = False):
     return tasks, seq_subtasks, summaries
 
 
+async def abreak_down_project(
+        objective: str, verbose: bool = True
+) -> Tuple[Task, Sequence[Task], Sequence[Sequence[Task]]]:
+    """Create a task pipelines and sequence of subtasks from an input string in one event loop.
+    The project task is predicted from the extended pipelines while the pipelines are broken down.
+    Attributes:
+        objective: The objective of the project.
+    """
+    project_id = uuid.uuid4().hex
+    summary = await _asummarize_objective(objective, verbose=verbose)
+    children = await _aextend_summary(summary, verbose=verbose)
+
+    pipelines = _link_children(children, project_id, TaskType.PIPELINE)
+    pipelines = [update_relation(pipeline, TaskRelations.ROOT, project_id) for pipeline in pipelines]
+    pipeline_dict = {pipeline.id: pipeline for pipeline in pipelines}
+
+    (pipelines, tasks, summaries), parent = await asyncio.gather(
+        _abreak_down_pipelines(pipeline_dict, verbose=verbose),
+        _apredict_parent(children, objective, verbose=verbose),
+    )
+    project = Task(**parent.dict(), id=project_id, type=TaskType.PROJECT)
+
+    seq_tasks = []
+    for seq_task in tasks:
+        _tasks = [update_relation(task, TaskRelations.ROOT, project.id) for task in seq_task]
+        seq_tasks.append(_tasks)
+
+    project.summary = "\n".join(summaries)
+    return project, pipelines, seq_tasks
+
+
 def break_down_project(
         objective: str, run_async: bool = True, verbose: bool = True
 ) -> Tuple[Task, Sequence[Task], Sequence[Sequence[Task]]]:
@@ -261,15 +437,15 @@ def break_down_project(
     Attributes:
         objective: The objective of the project.
     """
+    if run_async:
+        return asyncio.run(abreak_down_project(objective, verbose=verbose))
+
     project, pipelines = break_down_objective(objective, parent_type=TaskType.PROJECT, verbose=verbose)
     pipelines = [update_relation(pipeline, TaskRelations.ROOT, project.id) for pipeline in pipelines]
     pipeline_dict = {pipeline.id: pipeline for pipeline in pipelines}
 
     # break down pipelines into tasks
-    if run_async:
-        pipelines, tasks, summaries = asyncio.run(_abreak_down_pipelines(pipeline_dict, verbose=verbose))
-    else:
-        pipelines, tasks, summaries = _break_down_pipelines(pipeline_dict, verbose=verbose)
+    pipelines, tasks, summaries = _break_down_pipelines(pipeline_dict, verbose=verbose)
     seq_tasks = []
     for seq_task in tasks:
         _tasks = [update_relation(task, TaskRelations.ROOT, project.id) for task in seq_task]
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 from abc import abstractmethod, ABC
-from typing import Union
+from typing import AsyncIterator, Union
 
 from langchain.agents import AgentExecutor
 from langchain.callbacks.manager import Callbacks, CallbackManager, CallbackManagerForChainRun
 
 from taskchain.agents.agent_registry import AgentRegistry
 from taskchain.communication.base import BaseCommunicator
+from taskchain.config import Config
 from taskchain.executor.issue_handler import BaseIssueHandler
+from taskchain.communication.units.router import IssueRouter
+from taskchain.executor.resource_packer import PackedResource, ResourcePacker, ResourceRepresentation
+from taskchain.executor.streaming import StreamEvent, StreamEventType, StreamingCallbackHandler, with_handler
 from taskchain.schema import TaskRelations, TaskStatus
 from taskchain.schema.base import BaseIssue, Issue
 from taskchain.schema.types import MessageTypes, ManagerRole, IssueTypes
@@ -35,6 +40,8 @@ class BaseTaskManager(ABC):
             verbose: bool = False,
             persist_path: str = None,
             persist: bool = False,
+            context_budget: int = None,
+            resource_packer: ResourcePacker = None,
             **kwargs
     ):
         self.task = task
@@ -50,12 +57,18 @@ class BaseTaskManager(ABC):
         self.should_persist = persist
         self.agent_executor = agent_executor
         self.agent_registry = agent_registry
-
+        self.resource_packer = resource_packer
+        # representation of each resource in the last prepared prompt
+        self.resource_packing: list[PackedResource] = []
 
         if persist_path is None:
             self.persist_path = DEFAULT_PERSIST_PATH
         if self.agent_executor is None and self.agent_registry is None:
             self.agent_registry = AgentRegistry()
+        if self.resource_packer is None:
+            if context_budget is None and Config().resource_context_budget:
+                context_budget = int(Config().resource_context_budget)
+            self.resource_packer = ResourcePacker(budget=context_budget)
 
     ################################
     #  Main Execution Process
@@ -74,25 +87,32 @@ class BaseTaskManager(ABC):
 
         if self.communication:
             all_messages = self.communication.fetch_all_for_task(self.task)
-            feedback = ""
-            for message_type, messages in all_messages.items():
-                if message_type == MessageTypes.FEEDBACK.value:
-                    self.task.status = messages["payload"]["status"]
-                    feedback += f"USER FEEDBACK: {messages['payload']['feedback']}"
-                else:
-                    if isinstance(messages, list):
-                        if len(messages) > 0:
-                            feedback += f"{message_type.upper()}: {', '.join([m['body'] for m in messages])}\n"
-                    else:
-                        raise NotImplementedError(f"Message type {message_type} not implemented.")
-            if feedback != "":
-                self.resources["feedback"] = feedback
+            self._process_messages(all_messages)
 
         if skip_startup:
             return None, True
 
         return self._startup(run_manager=run_manager)
 
+    async def astartup(
+            self,
+            run_manager: CallbackManagerForChainRun = None,
+            skip_startup: bool = False) -> tuple[any, bool]:
+        """Async startup process before execution. See startup() for details.
+        Custom async startup logic can be implemented in _astartup() method.
+        """
+        if self.issue_handler is not None:
+            await self._aprocess_issue()
+
+        if self.communication:
+            all_messages = await self.communication.afetch_all_for_task(self.task)
+            self._process_messages(all_messages)
+
+        if skip_startup:
+            return None, True
+
+        return await self._astartup(run_manager=run_manager)
+
     def run(
             self,
             callbacks: Callbacks = None,
@@ -121,6 +141,63 @@ class BaseTaskManager(ABC):
 
         return self.shutdown(result=result, run_manager=run_manager)
 
+    async def arun(
+            self,
+            callbacks: Callbacks = None,
+            repeat_execution: bool = False,
+            skip_startup: bool = False) -> any:
+        """Async execution process runs startup, execution and shutdown.
+        Returns the result of the execution or an issue if an error occurred.
+        """
+        run_manager = self._init_callbacks(callbacks=callbacks)
+        if not repeat_execution:
+            self.on_execution_start(run_manager=run_manager)
+            startup_output, success = await self.astartup(run_manager=run_manager, skip_startup=skip_startup)
+        else:
+            startup_output, success = None, True
+
+        if not success:
+            result = startup_output
+        elif self.task.status == TaskStatus.APPROVED.value:
+            try:
+                result = await self._arun(run_manager=run_manager)
+            except Exception as e:
+                self.on_execution_error(str(e), run_manager=run_manager)
+                result = BaseIssue(description=str(e), type=IssueTypes.EXEC)
+        else:
+            result = BaseIssue(description="waiting for approval", type=IssueTypes.APPROVAL)
+
+        return await self.ashutdown(result=result, run_manager=run_manager)
+
+    async def astream(
+            self,
+            callbacks: Callbacks = None,
+            skip_startup: bool = False,
+            on_final_answer_start: callable = None) -> AsyncIterator[StreamEvent]:
+        """Run the execution process asynchronously and stream its events.
+        Yields LLM tokens, agent actions and observations while the task runs and a final
+        RESULT event holding the updated task.
+        Attributes:
+            on_final_answer_start: Called once when the agent starts writing its final answer.
+        """
+        handler = StreamingCallbackHandler(task_id=self.task.id, on_final_answer_start=on_final_answer_start)
+        self._enable_streaming()
+        execution = asyncio.ensure_future(
+            self.arun(callbacks=with_handler(callbacks, handler), skip_startup=skip_startup)
+        )
+        execution.add_done_callback(lambda _: handler.close())
+        try:
+            async for event in handler:
+                yield event
+        finally:
+            if not execution.done():
+                execution.cancel()
+        yield StreamEvent(type=StreamEventType.RESULT, task_id=self.task.id, data=await execution)
+
+    def _enable_streaming(self):
+        """Hook to switch the models used by the manager to token streaming."""
+        pass
+
     def shutdown(self, result: any, run_manager: CallbackManagerForChainRun = None) -> Task:
 
         if isinstance(result, BaseIssue):
@@ -147,6 +224,32 @@ class BaseTaskManager(ABC):
         self.on_execution_end(result, run_manager=run_manager)
         return self.task
 
+    async def ashutdown(self, result: any, run_manager: CallbackManagerForChainRun = None) -> Task:
+
+        if isinstance(result, BaseIssue):
+            result = Issue(**result.dict(exclude_unset=True), task_id=self.task.id)
+            self.on_issue(issue=result, run_manager=run_manager)
+            self.task.relations[TaskRelations.ISSUE] = result.id
+            self.task.status = TaskStatus.ISSUE
+            await self._asubmit_issue(issue=result)
+        else:
+            shutdown_output, success = await self._ashutdown(result=result, run_manager=run_manager)
+            if success:
+                self.task.status = TaskStatus.CLOSED
+                self.task.results = shutdown_output
+            else:
+                # add shutdown output to feedback and rerun execution process
+                self.resources["feedback"] = self.resources["feedback"] + "\n" + shutdown_output
+                return await self.arun(repeat_execution=True)
+
+        await self.task_storage.aupdate_task(self.task)
+
+        if self.should_persist:
+            await self.apersist()
+
+        self.on_execution_end(result, run_manager=run_manager)
+        return self.task
+
     ################################
     #  Abstract Methods
     ################################
@@ -171,6 +274,29 @@ class BaseTaskManager(ABC):
     def _process_issue(self):
         pass
 
+    ################################
+    #  Async Methods
+    ################################
+
+    # The defaults run the sync implementation in a worker thread,
+    # subclasses override them with native async implementations.
+
+    async def _astartup(self, run_manager: CallbackManagerForChainRun) -> tuple[dict, bool]:
+        return await asyncio.to_thread(self._startup, run_manager=run_manager)
+
+    async def _arun(self, run_manager: CallbackManagerForChainRun) -> Union[str, dict, BaseIssue]:
+        return await asyncio.to_thread(self._run, run_manager=run_manager)
+
+    async def _ashutdown(
+            self,
+            result: any,
+            run_manager: CallbackManagerForChainRun
+            ) -> tuple[any, bool]:
+        return await asyncio.to_thread(self._shutdown, result=result, run_manager=run_manager)
+
+    async def _aprocess_issue(self):
+        return self._process_issue()
+
     ################################
     #  State Management
     ################################
@@ -181,6 +307,12 @@ class BaseTaskManager(ABC):
             return self.task_storage.persist(self.persist_path)
         return self.task_storage.persist()
 
+    async def apersist(self):
+        """Persist all states of the manager without blocking the event loop."""
+        if self.persist_path is not None:
+            return await self.task_storage.apersist(self.persist_path)
+        return await self.task_storage.apersist()
+
     def add_to_cache(self, *args):
         new_attr = [arg for arg in args if hasattr(self, arg)]
         self.cache_attributes.extend(new_attr)
@@ -194,6 +326,22 @@ class BaseTaskManager(ABC):
     #  Helper
     ################################
 
+    def _process_messages(self, all_messages: dict[str, any]):
+        """Apply fetched messages to the task status and feedback resource."""
+        feedback = ""
+        for message_type, messages in all_messages.items():
+            if message_type == MessageTypes.FEEDBACK.value:
+                self.task.status = messages["payload"]["status"]
+                feedback += f"USER FEEDBACK: {messages['payload']['feedback']}"
+            else:
+                if isinstance(messages, list):
+                    if len(messages) > 0:
+                        feedback += f"{message_type.upper()}: {', '.join([m['body'] for m in messages])}\n"
+                else:
+                    raise NotImplementedError(f"Message type {message_type} not implemented.")
+        if feedback != "":
+            self.resources["feedback"] = feedback
+
     def _fetch_feedback_and_status(self):
         if self.communication:
             feedback_message = self.communication.fetch(MessageTypes.FEEDBACK.value, self.task)
@@ -216,22 +364,69 @@ class BaseTaskManager(ABC):
                 message=message or issue.description,
                 message_type=MessageTypes.ISSUE.value,
                 source_id=issue.task_id,
-                payload=issue.dict()
+                payload=issue.dict(),
+                header=self._issue_header(issue),
+            )
+            return True
+        return False
+
+    async def _asubmit_issue(
+            self,
+            issue: Issue,
+            message: str = None) -> bool:
+        """Submit an issue to the communication system asynchronously."""
+        if self.communication:
+            await self.communication.asubmit(
+                message=message or issue.description,
+                message_type=MessageTypes.ISSUE.value,
+                source_id=issue.task_id,
+                payload=issue.dict(),
+                header=self._issue_header(issue),
             )
             return True
         return False
 
+    def _issue_header(self, issue: Issue) -> dict:
+        """Header of an issue message with the ancestors of its task, which the issue router indexes."""
+        if self.task_storage is None:
+            return {}
+        return {"ancestors": self.task_storage.task_network.get_ancestors(issue.task_id)}
+
+    def _resolve_subtree_issues(self) -> bool:
+        """Resolve the issues reported below the task of this manager, unresolved ones are escalated.
+        Returns False if the communicator has no issue router."""
+        router = self.communication.get_unit(MessageTypes.ISSUE.value) if self.communication else None
+        if not isinstance(router, IssueRouter):
+            return False
+        if router.ancestors is None:
+            router.bind(self.task_storage.task_network.get_ancestors)
+        for message in router.fetch_for(self.task.id):
+            issue = Issue(**message["payload"])
+            try:
+                success = self.issue_handler.resolve(issue)
+                # report unresolved issues
+                if not success:
+                    issue.task_id = self.task.id
+                    self._submit_issue(issue)
+            finally:
+                router.complete(issue.id)
+        return True
+
     def _prep_inputs(self, input_keys: list) -> dict[str, any]:
         """Prepare inputs for chain"""
-        resource_dict = {}
-        inputs = {}
-        objective = ""
-        for key in input_keys:
-            resource_dict[key] = self.resources.get(key, None)
+        resource_dict = {key: self.resources.get(key, None) for key in input_keys}
+        resources = self._pack_resources(resource_dict) if resource_dict else "None"
+        return self._format_inputs(resources)
 
-        resources = "\n - ".join([f"{key}: {value}" for key, value in resource_dict.items()]) \
-            if resource_dict else "None"
+    async def _aprep_inputs(self, input_keys: list) -> dict[str, any]:
+        """Prepare inputs for chain asynchronously, resource summaries do not block the event loop."""
+        resource_dict = {key: self.resources.get(key, None) for key in input_keys}
+        resources = await self._apack_resources(resource_dict) if resource_dict else "None"
+        return self._format_inputs(resources)
 
+    def _format_inputs(self, resources: str) -> dict[str, any]:
+        inputs = {}
+        objective = ""
         if "resources" in self.agent_executor.agent.input_keys:
             inputs["resources"] = resources
         else:
@@ -247,6 +442,28 @@ class BaseTaskManager(ABC):
 
         return {**inputs, "input": objective}
 
+    def _pack_resources(self, resource_dict: dict[str, any]) -> str:
+        """Render the resources into the prompt within the context budget of the manager."""
+        self.resource_packing = self.resource_packer.pack(resource_dict)
+        return self._render_packing()
+
+    async def _apack_resources(self, resource_dict: dict[str, any]) -> str:
+        self.resource_packing = await self.resource_packer.apack(resource_dict)
+        return self._render_packing()
+
+    def _render_packing(self) -> str:
+        lines = []
+        for packed in self.resource_packing:
+            if packed.representation == ResourceRepresentation.FULL:
+                lines.append(f"{packed.key}: {packed.text}")
+            elif packed.representation == ResourceRepresentation.OMITTED:
+                lines.append(f"{packed.key}: (omitted, too large for the context)")
+            elif packed.representation == ResourceRepresentation.SUMMARY:
+                lines.append(f"{packed.key} (summary): {packed.text}")
+            else:
+                lines.append(f"{packed.key} (truncated summary): {packed.text}")
+        return "\n - ".join(lines)
+
     ################################
     #  Callbacks
     ################################
@@ -258,7 +475,7 @@ class BaseTaskManager(ABC):
     def on_execution_start(self, run_manager: CallbackManagerForChainRun):
         """print current context within task tree and start message"""
         if self.task_storage is not None:
-            task_context = self.task_storage.repr_current_context(self.task.id)
+            task_context = self.task_storage.repr_current_context(self.task.id, depth=1, neighborhood=True)
             run_manager.on_text(f"\nCURRENT CONTEXT:\n{task_context}\n\n")
         run_manager.on_text(f"starting:\n\n")
         run_manager.on_text(f"{self.task.colored_card_str()}\n\n")
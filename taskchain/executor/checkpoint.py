@@ -0,0 +1,78 @@
+"""Durable checkpoints of task manager state for resuming interrupted runs."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from taskchain.agents.base import logger
+from taskchain.config import Config
+
+CHECKPOINT_DIR_NAME = "checkpoints"
+
+
+def default_checkpoint_path(task_id: str) -> str:
+    """Checkpoint file of a task in the local storage dir."""
+    return os.path.join(Config().local_storage_dir, CHECKPOINT_DIR_NAME, f"{task_id}.json")
+
+
+def json_safe(values: dict[str, any]) -> dict[str, any]:
+    """Filter the JSON serializable values of a dict, the others are rebuilt on resume."""
+    safe = {}
+    for key, value in values.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Resource {key} is not JSON serializable and is not checkpointed")
+            continue
+        safe[key] = value
+    return safe
+
+
+class Checkpoint:
+    """JSON checkpoint file written atomically, a crash while saving keeps the previous checkpoint.
+
+    Attributes:
+        path: Path of the checkpoint file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def save(self, state: dict) -> None:
+        state = dict(state, saved_at=time.time())
+        with self._lock:
+            dirpath = os.path.dirname(self.path)
+            if dirpath:
+                os.makedirs(dirpath, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def load(self) -> Optional[dict]:
+        """Load the checkpoint, None if there is none or it is unreadable."""
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}")
+            return None
+
+    def remove(self) -> None:
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
@@ -36,3 +36,4 @@ class SimpleIssueHandler(BaseIssueHandler):
         ref_task.status = TaskStatus.ISSUE
         self.task_storage.add_task(issue_task)
         self.task_storage.update_task(ref_task)
+        return True
@@ -1,21 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Sequence, Optional, Union
 
 from langchain.agents import AgentExecutor
-from langchain.callbacks.manager import CallbackManagerForChainRun
+from langchain.callbacks.manager import Callbacks, CallbackManagerForChainRun
 
 from taskchain.agents.agent_registry import AgentRegistry
+from taskchain.agents.base import logger
 from taskchain.communication.base import BaseCommunicator
 from taskchain.executor.base import BaseTaskManager
+from taskchain.executor.checkpoint import Checkpoint, default_checkpoint_path, json_safe
 from taskchain.executor.issue_handler import BaseIssueHandler
 from taskchain.executor.simple import SimpleTaskManager
+from taskchain.executor.streaming import StreamEventType
 from taskchain.schema import TaskStatus
 from taskchain.schema.base import BaseChain, BaseIssue, Issue
 from taskchain.schema.types import MessageTypes, ManagerRole, IssueTypes
 from taskchain.storage.storage_context import TaskContextStore
 from taskchain.communication.non_interactive import NonInteractiveCommunicator
 from taskchain.task import Task
+from taskchain.task.utilities import build_dependency_graph
 from taskchain.executor.issue_handler.simple import SimpleIssueHandler
 
 
@@ -35,6 +42,10 @@ class PipelineManager(BaseTaskManager):
             persist: bool = False,
             role: ManagerRole = ManagerRole.SUPERVISOR.value,
             verbose: bool = False,
+            max_concurrency: int = 1,
+            prepare_downstream: bool = False,
+            checkpoint: bool = False,
+            checkpoint_path: str = None,
             **kwargs
     ):
         """Supervising Manager for a pipeline tasks with multiple subtasks.
@@ -52,6 +63,16 @@ class PipelineManager(BaseTaskManager):
             persist (bool): Whether to persist the task storage.
             role (ManagerRole): The role of the manager.
             verbose (bool): Whether to print the logs.
+            max_concurrency (int): The maximum number of subtasks executed at the same time.
+                With a value greater than 1 independent subtasks are scheduled along the
+                dependency graph of their inputs and outputs and executed concurrently.
+            prepare_downstream (bool): Stream subtasks in the async execution and prepare the
+                managers of dependent subtasks (agent loading, startup chains with available inputs)
+                as soon as an upstream agent starts writing its final answer.
+            checkpoint (bool): Save the closed subtasks, their results and the resources after every
+                subtask, so an interrupted run can be continued with resume().
+            checkpoint_path (str): The path of the checkpoint file, defaults to the checkpoints
+                directory in the local storage dir. Setting it enables checkpointing.
 
         Example:
             .. code-block:: python
@@ -81,8 +102,15 @@ class PipelineManager(BaseTaskManager):
         )
 
         self.startup_chains = startup_chains
+        self.max_concurrency = max_concurrency
+        self.prepare_downstream = prepare_downstream
+        self._prepared_managers: dict[str, asyncio.Future] = {}
+        self._checkpoint = None
+        if checkpoint or checkpoint_path is not None:
+            self._checkpoint = Checkpoint(checkpoint_path or default_checkpoint_path(task.id))
         self.closed_tasks = []
         self.blocked_tasks = []
+        self._resource_lock = threading.Lock()
         self._subordinate_tasks = None
         self.add_to_cache("_subordinate_tasks")
 
@@ -94,6 +122,14 @@ class PipelineManager(BaseTaskManager):
 
         return None, True
 
+    async def _astartup(self, run_manager: CallbackManagerForChainRun = None) -> tuple[any, bool]:
+        if self.startup_chains:
+            for chain in self.startup_chains:
+                output: dict = await chain.apredict_and_parse(**await self._aprep_inputs(chain.input_keys))
+                self.resources.update(output)
+
+        return None, True
+
     def _prep_tasks(self) -> list[Task]:
         """Filter subtasks where all the inputs are available in resource."""
         excluded_tasks = self.closed_tasks + self.blocked_tasks
@@ -111,12 +147,36 @@ class PipelineManager(BaseTaskManager):
 
     def _run(self, run_manager: CallbackManagerForChainRun) -> Union[str, dict, BaseIssue]:
         """loop through all the subtasks and execute them."""
-        tasks = self._prep_tasks()
-        while tasks:
-            for task in tasks:
-                self._execute_subtask(task, run_manager)
+        if self.max_concurrency > 1:
+            self._run_parallel(run_manager)
+        else:
+            tasks = self._prep_tasks()
+            while tasks:
+                for task in tasks:
+                    self._execute_subtask(task, run_manager)
+                tasks = self._prep_tasks()
+
+        return self._collect_result()
+
+    async def _arun(self, run_manager: CallbackManagerForChainRun) -> Union[str, dict, BaseIssue]:
+        """loop through all the subtasks and execute them asynchronously."""
+        if self.max_concurrency > 1:
+            await self._arun_parallel(run_manager)
+        else:
             tasks = self._prep_tasks()
+            while tasks:
+                for task in tasks:
+                    await self._aexecute_subtask(task, run_manager)
+                tasks = self._prep_tasks()
+
+        # preparations of subtasks which never became ready
+        for prepared in self._prepared_managers.values():
+            prepared.cancel()
+        self._prepared_managers = {}
+        return self._collect_result()
 
+    def _collect_result(self) -> Union[dict, BaseIssue]:
+        """Collect the pipeline outputs or report the pipeline as blocked."""
         if len(self.closed_tasks) == len(self.subordinate_tasks):
             result = {}
             for key in self.task.outputs:
@@ -129,28 +189,230 @@ class PipelineManager(BaseTaskManager):
                 type=IssueTypes.BLOCKED
             )
 
-    def _execute_subtask(self, task: Task, run_manager: CallbackManagerForChainRun):
-        """Execute a subtask."""
-        task_manager = SimpleTaskManager(
+    def _run_parallel(self, run_manager: CallbackManagerForChainRun):
+        """Execute independent subtasks concurrently along their dependency graph.
+
+        A subtask is submitted as soon as all subtasks producing its inputs are closed and
+        all of its inputs are available in resources. Subtasks depending on a blocked subtask
+        are never submitted and therefore remain open.
+        """
+        pending, dependencies = self._pending_dependency_graph()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            running = {}
+            while True:
+                for task in self._ready_tasks(pending, dependencies, set(running.values())):
+                    future = executor.submit(self._execute_subtask, task, run_manager, True)
+                    running[future] = task.id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    future.result()
+
+    async def _arun_parallel(self, run_manager: CallbackManagerForChainRun):
+        """Execute independent subtasks concurrently on the event loop. See _run_parallel() for details."""
+        pending, dependencies = self._pending_dependency_graph()
+
+        running = {}
+        while True:
+            for task in self._ready_tasks(pending, dependencies, set(running.values())):
+                future = asyncio.ensure_future(self._aexecute_subtask(task, run_manager, True))
+                running[future] = task.id
+            if not running:
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                future.result()
+
+    def _pending_dependency_graph(self) -> tuple[list[Task], dict[str, set[str]]]:
+        """Load all open subtasks and build their dependency graph."""
+        excluded_tasks = self.closed_tasks + self.blocked_tasks
+        pending = [
+            self.task_storage.get_task(task_id) for task_id in self.subordinate_tasks
+            if task_id not in excluded_tasks
+        ]
+        dependencies = build_dependency_graph(pending, available=list(self.resources.keys()))
+        return pending, dependencies
+
+    def _ready_tasks(
+            self,
+            tasks: Sequence[Task],
+            dependencies: dict[str, set[str]],
+            running: set[str]
+    ) -> list[Task]:
+        """Filter tasks whose dependencies are closed and whose inputs are available."""
+        with self._resource_lock:
+            excluded_tasks = set(self.closed_tasks + self.blocked_tasks) | running
+            closed_tasks = set(self.closed_tasks)
+            return [
+                task for task in tasks
+                if task.id not in excluded_tasks
+                and dependencies[task.id].issubset(closed_tasks)
+                and all(input_key in self.resources for input_key in task.inputs)
+            ]
+
+    def _execute_subtask(
+            self,
+            task: Task,
+            run_manager: CallbackManagerForChainRun,
+            isolate_resources: bool = False
+    ):
+        """Execute a subtask.
+
+        With isolate_resources the subtask works on a snapshot of the resources,
+        its results are merged back into the shared resources once it is finished.
+        """
+        task_manager = self._create_subtask_manager(task, isolate_resources)
+        task = task_manager.run(callbacks=run_manager.get_child())
+        return self._record_subtask(task)
+
+    async def _aexecute_subtask(
+            self,
+            task: Task,
+            run_manager: CallbackManagerForChainRun,
+            isolate_resources: bool = False
+    ):
+        """Execute a subtask asynchronously. See _execute_subtask() for details.
+
+        With prepare_downstream the subtask is streamed, once its agent starts the final answer
+        the managers of the subtasks depending on it are prepared in the background.
+        """
+        task_manager = await self._aget_subtask_manager(task, isolate_resources)
+        if not self.prepare_downstream:
+            task = await task_manager.arun(callbacks=run_manager.get_child())
+            return self._record_subtask(task)
+
+        async for event in task_manager.astream(
+                callbacks=run_manager.get_child(),
+                on_final_answer_start=lambda: self._prepare_downstream(task.id)
+        ):
+            if event.type == StreamEventType.RESULT:
+                task = event.data
+        return self._record_subtask(task)
+
+    async def _aget_subtask_manager(self, task: Task, isolate_resources: bool = False) -> SimpleTaskManager:
+        """Get the prepared manager of a subtask or create a new one."""
+        prepared = self._prepared_managers.pop(task.id, None)
+        if prepared is not None:
+            try:
+                task_manager = await prepared
+                task_manager.attach_resources(self._subtask_resources(isolate_resources))
+                return task_manager
+            except Exception as e:
+                logger.warning(f"Preparation of task {task.id} failed, starting without it: {e}")
+        return self._create_subtask_manager(task, isolate_resources)
+
+    def _prepare_downstream(self, task_id: str):
+        """Start preparing the managers of the pending subtasks which depend on task_id."""
+        pending, dependencies = self._pending_dependency_graph()
+        for task in pending:
+            if task_id in dependencies[task.id] and task.id not in self._prepared_managers:
+                self._prepared_managers[task.id] = asyncio.ensure_future(self._aprepare_subtask(task))
+
+    async def _aprepare_subtask(self, task: Task) -> SimpleTaskManager:
+        task_manager = self._create_subtask_manager(task, isolate_resources=True)
+        await task_manager.aprepare()
+        return task_manager
+
+    def _subtask_resources(self, isolate_resources: bool = False) -> dict[str, any]:
+        if isolate_resources:
+            with self._resource_lock:
+                return dict(self.resources)
+        return self.resources
+
+    def _create_subtask_manager(self, task: Task, isolate_resources: bool = False) -> SimpleTaskManager:
+        """Create the task manager executing a subtask."""
+        resources = self._subtask_resources(isolate_resources)
+
+        return SimpleTaskManager(
             task=task,
             agent_registry=self.agent_registry,
             agent_executor=self.agent_executor,
-            resources=self.resources,
+            resources=resources,
             communication=self.communication,
             issue_handler=self.issue_handler,
             task_storage=self.task_storage,
             role=ManagerRole.EXECUTION.value,
             verbose=self.verbose,
+            resource_packer=self.resource_packer,
         )
-        task = task_manager.run(callbacks=run_manager.get_child())
-        if task.status == TaskStatus.CLOSED:
-            self.closed_tasks.append(task.id)
-            for key, value in task.results.items():
-                self.resources[key] = value
-            return True
-        else:
-            self.blocked_tasks.append(task.id)
-            return False
+
+    def _record_subtask(self, task: Task) -> bool:
+        """Record the status of a finished subtask and merge its results into resources."""
+        with self._resource_lock:
+            if task.status == TaskStatus.CLOSED:
+                self.closed_tasks.append(task.id)
+                for key, value in task.results.items():
+                    self.resources[key] = value
+                closed = True
+            else:
+                self.blocked_tasks.append(task.id)
+                closed = False
+        self._save_checkpoint()
+        return closed
+
+    ################################
+    #  Checkpoints
+    ################################
+
+    def resume(self, callbacks: Callbacks = None) -> Task:
+        """Continue an interrupted run. Closed subtasks are skipped and their results are restored
+        into the resources, blocked subtasks are retried. Startup chains are skipped if a checkpoint
+        with their outputs exists."""
+        restored = self._restore_checkpoint()
+        return self.run(callbacks=callbacks, skip_startup=restored)
+
+    async def aresume(self, callbacks: Callbacks = None) -> Task:
+        """Continue an interrupted run asynchronously. See resume() for details."""
+        restored = self._restore_checkpoint()
+        return await self.arun(callbacks=callbacks, skip_startup=restored)
+
+    def _save_checkpoint(self):
+        if self._checkpoint is None:
+            return
+        with self._resource_lock:
+            state = {
+                "task_id": self.task.id,
+                "closed_tasks": {
+                    task_id: self.task_storage.get_task(task_id).results for task_id in self.closed_tasks
+                },
+                "resources": json_safe(self.resources),
+            }
+        self._checkpoint.save(state)
+
+    def _restore_checkpoint(self) -> bool:
+        """Restore closed subtasks and resources from the checkpoint and the task storage.
+        The pipeline and its subtasks with an issue are approved again.
+        Returns True if a checkpoint was found."""
+        state = self._checkpoint.load() if self._checkpoint is not None else None
+        checkpointed = state["closed_tasks"] if state else {}
+        if state:
+            self.resources.update(state["resources"])
+
+        self.closed_tasks, self.blocked_tasks = [], []
+        for task_id in self.subordinate_tasks:
+            task = self.task_storage.get_task(task_id)
+            if task_id in checkpointed and task.status != TaskStatus.CLOSED:
+                # the task storage of the interrupted run was not persisted
+                task.status = TaskStatus.CLOSED
+                task.results = checkpointed[task_id]
+                self.task_storage.update_task(task)
+            if task.status == TaskStatus.CLOSED:
+                self.closed_tasks.append(task_id)
+                self.resources.update(task.results or {})
+            elif task.status in (TaskStatus.ISSUE, TaskStatus.BLOCKED):
+                # retry the subtasks which blocked the interrupted run
+                task.status = TaskStatus.APPROVED
+                self.task_storage.update_task(task)
+
+        # shutdown reports a blocked pipeline with the issue status
+        if self.task.status in (TaskStatus.ISSUE, TaskStatus.BLOCKED):
+            self.task.status = TaskStatus.APPROVED
+            self.task_storage.update_task(self.task)
+        return state is not None
 
     def _shutdown(
             self,
@@ -158,8 +420,18 @@ class PipelineManager(BaseTaskManager):
             run_manager: CallbackManagerForChainRun = None
     ) -> tuple[any, bool]:
         """Shutdown the manager."""
+        if self._checkpoint is not None:
+            self._checkpoint.remove()
         return result, True
 
+    async def _ashutdown(
+            self,
+            result: any,
+            run_manager: CallbackManagerForChainRun = None
+    ) -> tuple[any, bool]:
+        """Shutdown the manager asynchronously."""
+        return self._shutdown(result, run_manager=run_manager)
+
     @property
     def subordinate_tasks(self):
         """One time call of subordinate tasks"""
@@ -168,12 +440,19 @@ class PipelineManager(BaseTaskManager):
         return self._subordinate_tasks
 
     def _process_issue(self):
-        """Fetches all issues from communicator and resolves them if they are from subordinate tasks."""
+        """Resolves the issues reported by subordinate tasks.
+        Without an issue router, all issues are fetched and the ones of other managers are re-submitted."""
+        if self._resolve_subtree_issues():
+            return
         all_issues = self.communication.fetch_all(MessageTypes.ISSUE.value)
 
         if not all_issues:
             return
-        in_charge = [issue for issue in all_issues if issue["header"]["source"] in self.subordinate_tasks]
+        task_network = self.task_storage.task_network
+        in_charge = [
+            issue for issue in all_issues
+            if task_network.is_ancestor(self.task.id, issue["header"]["source"])
+        ]
         for issue in in_charge:
             issue = Issue(**issue["payload"])
             success = self.issue_handler.resolve(issue)
@@ -184,7 +463,7 @@ class PipelineManager(BaseTaskManager):
 
         not_in_charge = [
             issue for issue in all_issues
-            if issue["header"]["source"] not in self.subordinate_tasks
+            if not task_network.is_ancestor(self.task.id, issue["header"]["source"])
         ]
         for issue in not_in_charge:
             self._submit_issue(Issue(**issue["payload"]))
@@ -1,21 +1,94 @@
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from typing import Sequence
 
 from langchain.callbacks.manager import Callbacks, CallbackManager, CallbackManagerForChainRun
 
 from taskchain.agents.agent_registry import AgentRegistry
 from taskchain.communication.base import BaseCommunicator
-from taskchain.executor.base import BaseTaskManager
+from taskchain.communication.non_interactive import NonInteractiveCommunicator
+from taskchain.executor.checkpoint import Checkpoint, default_checkpoint_path, json_safe
 from taskchain.executor.issue_handler import BaseIssueHandler
-from taskchain.schema import TaskRelations
+from taskchain.executor.pipeline import PipelineManager
+from taskchain.schema import TaskStatus
 from taskchain.schema.types import MessageTypes
+from taskchain.singleton import Singleton
 from taskchain.storage.base import BaseStore
 from taskchain.storage.storage_context import TaskContextStore
 from taskchain.task import Task
 from taskchain.task.utilities import get_branch_tasks_by_id, filter_tasks_by_inputs
 
 
+def run_pipeline(
+        pipeline: Task,
+        task_storage: TaskContextStore,
+        agent_registry: AgentRegistry,
+        resources: dict[str, any],
+        communication: BaseCommunicator,
+        issue_handler: BaseIssueHandler = None,
+        verbose: bool = False,
+        checkpoint: bool = False,
+        callbacks: Callbacks = None,
+) -> PipelineManager:
+    """Execute a pipeline with a PipelineManager, the same way in the project process and in workers.
+    With checkpoint, a checkpoint of an interrupted run is resumed.
+
+    Worker processes always communicate through a NonInteractiveCommunicator, which approves
+    every request, reported issues and messages are handed back to the project communicator.
+    Distributed execution is therefore refused for interactive communicators (console, trello).
+    """
+    manager = PipelineManager(
+        task=pipeline,
+        agent_registry=agent_registry,
+        resources=resources,
+        communication=communication,
+        issue_handler=issue_handler,
+        task_storage=task_storage,
+        verbose=verbose,
+        checkpoint=checkpoint,
+    )
+    if checkpoint:
+        manager.resume(callbacks=callbacks)
+    else:
+        manager.run(callbacks=callbacks)
+    return manager
+
+
+def _run_pipeline_in_worker(payload: dict) -> dict:
+    """Execute a single pipeline in a worker process.
+
+    The worker loads the serialized pipeline subtree into its own task storage and communicator,
+    which replace the process wide instances inherited from the parent process, runs the pipeline
+    and returns all task states, the pipeline resources, the reported issues and the queued
+    messages to be merged back into the parent process.
+    """
+    Singleton._instances.pop(TaskContextStore, None)
+    Singleton._instances.pop(NonInteractiveCommunicator, None)
+    task_storage = TaskContextStore()
+    task_storage.load_subtree(payload["subtree"])
+    communication = NonInteractiveCommunicator()
+
+    manager = run_pipeline(
+        pipeline=task_storage.get_task(payload["pipeline_id"]),
+        task_storage=task_storage,
+        agent_registry=AgentRegistry(agents=payload["agents"]),
+        resources=payload["resources"],
+        communication=communication,
+        verbose=payload["verbose"],
+        checkpoint=payload["checkpoint"],
+    )
+
+    return dict(
+        pipeline_id=payload["pipeline_id"],
+        task_store=task_storage.task_store.to_dict(),
+        task_order=list(task_storage.task_network.all_tasks.values()),
+        resources=manager.resources,
+        issues=communication.fetch_all(MessageTypes.ISSUE.value),
+        messages=communication.fetch_all(MessageTypes.DIRECT.value),
+    )
+
+
 class ProjectExecutor:
 
     issue_backlog: list = []
@@ -28,10 +101,36 @@ class ProjectExecutor:
             issue_handler: BaseIssueHandler,
             communicator: BaseCommunicator,
             callbacks: Callbacks = None,
-            verbose: bool = True
-
-
+            verbose: bool = True,
+            max_workers: int = None,
+            checkpoint: bool = False,
+            checkpoint_path: str = None,
     ) -> None:
+        """Executor for a decomposed project running all pipelines of the project.
+
+        Args:
+            task_storage (TaskContextStore): The task storage holding the project tree.
+            kv_storage (BaseStore): The key-value storage holding the project resources.
+            agent_registry (AgentRegistry): The registry to load the agents from.
+            issue_handler (BaseIssueHandler): The issue handler to resolve reported issues.
+            communicator (BaseCommunicator): The communication system.
+            callbacks (Callbacks): Callbacks for the execution.
+            verbose (bool): Whether to print the logs.
+            max_workers (int): Number of worker processes. If greater than 1, every ready pipeline
+                is executed by a PipelineManager in a process pool worker. Agent configs and
+                resources have to be picklable in this mode. Only a NonInteractiveCommunicator
+                is supported, as workers can not ask for feedback interactively.
+            checkpoint (bool): Save the finished pipelines and the project resources after every
+                pipeline, so an interrupted run can be continued with resume(). Pipelines executed
+                in worker processes checkpoint their subtasks as well.
+            checkpoint_path (str): The path of the checkpoint file, defaults to the checkpoints
+                directory in the local storage dir. Setting it enables checkpointing.
+        """
+        if max_workers is not None and max_workers > 1 and not isinstance(communicator, NonInteractiveCommunicator):
+            raise ValueError(
+                f"{type(communicator).__name__} is interactive and can not be used with max_workers > 1, "
+                f"use a NonInteractiveCommunicator or run the pipelines sequentially"
+            )
         self.task_storage = task_storage
         self.kv_storage = kv_storage
         self.agent_registry = agent_registry
@@ -40,6 +139,13 @@ class ProjectExecutor:
 
         self.callbacks = callbacks
         self.verbose = verbose
+        self.max_workers = max_workers
+        self.finished_pipelines: set[str] = set()
+        self._checkpoint = None
+        if checkpoint or checkpoint_path is not None:
+            self._checkpoint = Checkpoint(
+                checkpoint_path or default_checkpoint_path(f"project_{task_storage.root_id}")
+            )
 
     def startup(self, callbacks: Callbacks = None):
         """resolve issues and fetch feedback for project and pipeline tasks"""
@@ -57,7 +163,10 @@ class ProjectExecutor:
 
 
     def shutdown(self):
-        pass
+        if self.task_storage.project_board is not None:
+            self.task_storage.project_board.close()
+        if self._checkpoint is not None and len(self.finished_pipelines) == len(self.pipeline_ids):
+            self._checkpoint.remove()
 
     def _init_callbacks(self, callbacks) -> CallbackManagerForChainRun:
         callback_manager = CallbackManager.configure(
@@ -88,6 +197,36 @@ class ProjectExecutor:
         self.shutdown()
         run_manager.on_text("finished shutdown sequence")
 
+    def resume(self, callbacks: Callbacks = None):
+        """Continue an interrupted run, finished pipelines are skipped and the project resources
+        are restored from the checkpoint."""
+        self._restore_checkpoint()
+        self.run(callbacks=callbacks)
+
+    def _save_checkpoint(self):
+        if self._checkpoint is None:
+            return
+        self._checkpoint.save({
+            "finished_pipelines": sorted(self.finished_pipelines),
+            "resources": json_safe(self.kv_storage.get_all()),
+        })
+
+    def _restore_checkpoint(self):
+        state = self._checkpoint.load() if self._checkpoint is not None else None
+        if state:
+            for key, value in state["resources"].items():
+                self.kv_storage.put(key, value)
+            self.finished_pipelines.update(state["finished_pipelines"])
+        self.finished_pipelines.update(
+            pipe.id for pipe in self.pipeline_tasks if pipe.status == TaskStatus.CLOSED
+        )
+
+    def _record_pipeline(self, pipeline: Task):
+        """Mark a closed pipeline as finished and save a checkpoint."""
+        if pipeline.status == TaskStatus.CLOSED:
+            self.finished_pipelines.add(pipeline.id)
+        self._save_checkpoint()
+
     def prepare_pipelines(self) -> Sequence[Task]:
         """find pipelines with all inputs ready and stored in kv_storage"""
         valid_pipelines = filter_tasks_by_inputs(self.pipeline_tasks, list(self.kv_storage.get_all().keys()))
@@ -96,29 +235,107 @@ class ProjectExecutor:
         return valid_pipelines
 
     def _run(self, run_manager: CallbackManagerForChainRun):
-        # find ready tasks
-        pipelines = self.prepare_pipelines()
-        for pipe in pipelines:
-            run_manager.on_text(f"starting pipeline {pipe.name}")
-            self.execute_task(pipe, run_manager.get_child())
-            run_manager.on_text(f"finished pipeline {pipe.name}")
-        return
+        if self.max_workers is not None and self.max_workers > 1:
+            return self._run_distributed(run_manager)
 
-    def execute_task(self, task: Task, run_manager: CallbackManager):
-        """execute task and all its children"""
-        task_agent = self._setup_agent(task)
-        task_agent.run(run_manager)
-        self.task_storage.update_task(task)
+        pipelines = [pipe for pipe in self.prepare_pipelines() if pipe.id not in self.finished_pipelines]
+        submitted = set(self.finished_pipelines)
+        while pipelines:
+            for pipe in pipelines:
+                run_manager.on_text(f"starting pipeline {pipe.name}")
+                self.execute_task(pipe, run_manager.get_child())
+                self._record_pipeline(self.task_storage.get_task(pipe.id))
+                submitted.add(pipe.id)
+                run_manager.on_text(f"finished pipeline {pipe.name}")
+            pipelines = self._ready_pipelines(submitted)
+
+    def _run_distributed(self, run_manager: CallbackManagerForChainRun):
+        """Execute pipelines in a process pool as soon as their inputs are available."""
+        pipelines = [pipe for pipe in self.prepare_pipelines() if pipe.id not in self.finished_pipelines]
+        submitted = set(self.finished_pipelines)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pipelines or running:
+                for pipe in pipelines:
+                    run_manager.on_text(f"starting pipeline {pipe.name} in worker process")
+                    future = executor.submit(_run_pipeline_in_worker, self._pipeline_payload(pipe))
+                    running[future] = pipe
+                    submitted.add(pipe.id)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pipe = running.pop(future)
+                    self._merge_pipeline_result(future.result())
+                    self._record_pipeline(self.task_storage.get_task(pipe.id))
+                    run_manager.on_text(f"finished pipeline {pipe.name}")
+
+                pipelines = self._ready_pipelines(submitted)
 
+    def _ready_pipelines(self, submitted: set[str]) -> list[Task]:
+        """Pipelines whose inputs became available and which were not executed yet."""
+        available_keys = list(self.kv_storage.get_all().keys())
+        return [
+            pipe for pipe in filter_tasks_by_inputs(self.pipeline_tasks, available_keys)
+            if pipe.id not in submitted
+        ]
 
-    def _setup_agent(self, task: Task, **kwargs) -> BaseTaskManager:
-        """Setup agent for task."""
-        if task.assigned_agent is None:
-            task.relations[TaskRelations.AGENT] = self.agent_registry.get_default_agent()
+    def _pipeline_payload(self, pipeline: Task) -> dict:
+        """Serialize everything a worker process needs to execute a pipeline."""
+        resources = {key: self.kv_storage.get(key) for key in pipeline.inputs}
+        return dict(
+            pipeline_id=pipeline.id,
+            subtree=self.task_storage.export_subtree(pipeline.id),
+            agents=self.agent_registry.get_configs(),
+            resources=resources,
+            verbose=self.verbose,
+            checkpoint=self._checkpoint is not None,
+        )
+
+    def _merge_pipeline_result(self, result: dict):
+        """Merge task states, resources, issues and messages of a worker process into the parent stores."""
+        for task_id in result["task_order"]:
+            task = Task(**result["task_store"][task_id])
+            if self.task_storage.task_exists(task_id):
+                if self.task_storage.task_store.get(task_id) != result["task_store"][task_id]:
+                    self.task_storage.update_task(task)
+            else:
+                self.task_storage.add_task(task)
+
+        self._store_pipeline_results(self.task_storage.get_task(result["pipeline_id"]), result["resources"])
+
+        task_network = self.task_storage.task_network
+        for issue in result["issues"]:
+            # the worker only knows the ancestors within the pipeline
+            source = issue["header"].get("source", None)
+            if source is not None and self.task_storage.task_exists(source):
+                issue["header"]["ancestors"] = task_network.get_ancestors(source)
+            self.communication.submit_direct(issue, MessageTypes.ISSUE.value)
+        if result["messages"]:
+            self.communication.submit_direct(result["messages"], MessageTypes.DIRECT.value)
 
-        task_agent = self.agent_registry.load(task.assigned_agent)
-        task_agent.assign_task(task)
-        return task_agent
+    def _store_pipeline_results(self, pipeline: Task, resources: dict[str, any]):
+        """Add the resources produced by a pipeline and the results of a closed pipeline
+        to the project resources."""
+        for key, value in resources.items():
+            self.kv_storage.put(key, value)
+        if pipeline.status == TaskStatus.CLOSED and pipeline.results:
+            for key, value in pipeline.results.items():
+                self.kv_storage.put(key, value)
+
+    def execute_task(self, task: Task, run_manager: CallbackManager):
+        """execute a pipeline and all its children"""
+        manager = run_pipeline(
+            pipeline=task,
+            task_storage=self.task_storage,
+            agent_registry=self.agent_registry,
+            resources={key: self.kv_storage.get(key) for key in task.inputs},
+            communication=self.communication,
+            issue_handler=self.issue_handler,
+            verbose=self.verbose,
+            checkpoint=self._checkpoint is not None,
+            callbacks=run_manager,
+        )
+        self._store_pipeline_results(self.task_storage.get_task(task.id), manager.resources)
 
     @property
     def pipeline_ids(self):
@@ -0,0 +1,211 @@
+"""Token budgeted packing of task resources into the prompt of an agent."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from enum import Enum
+from typing import Callable, Generator, Optional
+
+from pydantic import BaseModel
+
+from taskchain.llm.gateway import LLMPriority, llm_priority
+from taskchain.llm.tokenizer import count_tokens, split_tokens, truncate_tokens
+
+SUMMARIZE_RESOURCE_PROMPT = """Summarize the following resource "{key}" from previous work in at most {max_words} words.
+Keep all facts, names, numbers, links and decisions that later tasks may need, leave out filler.
+
+RESOURCE:
+{text}
+
+SUMMARY:"""
+
+# below this number of tokens a resource is left out instead of truncated
+MIN_RESOURCE_TOKENS = 16
+
+
+class ResourceRepresentation(str, Enum):
+    """How a resource is represented in the prompt
+
+    Attributes:
+        FULL: The complete value
+        SUMMARY: The memoized summary of the value
+        TRUNCATED: The beginning of the summary, cut to the available budget
+        OMITTED: Only the key, the budget is exhausted
+    """
+    FULL = "full"
+    SUMMARY = "summary"
+    TRUNCATED = "truncated"
+    OMITTED = "omitted"
+
+
+class PackedResource(BaseModel):
+    """A resource as represented in the prompt, the token counts are None if packing is disabled."""
+    key: str
+    representation: ResourceRepresentation
+    tokens: Optional[int] = None
+    original_tokens: Optional[int] = None
+    text: str
+
+
+class ResourcePacker:
+    """Fits the resources of a task into a token budget.
+
+    Resources are measured with the cached tokenizer. If all of them fit, they are used verbatim.
+    Otherwise the budget is shared out from the smallest to the largest resource, so small
+    resources stay complete and the largest ones fall back to their summary, a truncated summary
+    or are left out. Oversized values are split into chunks which are summarized and merged until
+    the summary fits, every summary is computed once per resource value and memoized.
+    The packer can be shared by the managers of a pipeline to reuse the summaries of upstream results.
+
+    Attributes:
+        budget: Maximum number of tokens of all packed resources, None disables packing.
+        summary_tokens: Target length of a resource summary.
+        chunk_tokens: Maximum number of tokens summarized in one LLM call.
+        model_name: Model whose tokenizer is used for counting.
+        summarize: Callable(key, text, max_tokens) -> summary, defaults to the basic LLM.
+    """
+
+    def __init__(
+            self,
+            budget: Optional[int] = None,
+            summary_tokens: int = 512,
+            chunk_tokens: int = 3000,
+            model_name: Optional[str] = None,
+            summarize: Callable[[str, str, int], str] = None,
+    ):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.chunk_tokens = chunk_tokens
+        self.model_name = model_name
+        self._summarize = summarize
+        self._summary_chain = None
+        self._summaries: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def pack(self, resources: dict[str, any]) -> list[PackedResource]:
+        """Choose a representation for every resource so that together they fit into the budget."""
+        plan = self._plan(resources)
+        try:
+            request = next(plan)
+            while True:
+                request = plan.send(self.summary(*request))
+        except StopIteration as done:
+            return done.value
+
+    async def apack(self, resources: dict[str, any]) -> list[PackedResource]:
+        """Async version of pack(), resource summaries do not block the event loop."""
+        plan = self._plan(resources)
+        try:
+            request = next(plan)
+            while True:
+                request = plan.send(await self.asummary(*request))
+        except StopIteration as done:
+            return done.value
+
+    def _plan(self, resources: dict[str, any]) -> Generator[tuple[str, str], str, list[PackedResource]]:
+        """Share out the budget, yields (key, text) of the resources whose summary is needed
+        and receives the summaries. Returns the packed resources."""
+        texts = {key: str(value) for key, value in resources.items()}
+        if self.budget is None:
+            return [PackedResource(key=key, representation=ResourceRepresentation.FULL, text=texts[key]) for key in texts]
+        sizes = {key: self.count(text) for key, text in texts.items()}
+        if sum(sizes.values()) <= self.budget:
+            return [self._packed(key, ResourceRepresentation.FULL, texts[key], sizes[key]) for key in texts]
+
+        packed = {}
+        remaining = self.budget
+        by_size = sorted(texts, key=lambda key: sizes[key])
+        for i, key in enumerate(by_size):
+            share = remaining // (len(by_size) - i)
+            if sizes[key] <= share:
+                packed[key] = self._packed(key, ResourceRepresentation.FULL, texts[key], sizes[key])
+            elif share < MIN_RESOURCE_TOKENS:
+                packed[key] = self._packed(key, ResourceRepresentation.OMITTED, "", sizes[key])
+            else:
+                summary = yield key, texts[key]
+                if self.count(summary) <= share:
+                    packed[key] = self._packed(key, ResourceRepresentation.SUMMARY, summary, sizes[key])
+                else:
+                    truncated = truncate_tokens(summary, share, self.model_name)
+                    packed[key] = self._packed(key, ResourceRepresentation.TRUNCATED, truncated, sizes[key])
+            remaining -= packed[key].tokens
+        return [packed[key] for key in texts]
+
+    def summary(self, key: str, text: str) -> str:
+        """Get the memoized summary of a resource value, it is created on first request."""
+        memo_key = self._memo_key(key, text)
+        if memo_key not in self._summaries:
+            summary = self._summarize_hierarchical(key, text)
+            with self._lock:
+                self._summaries.setdefault(memo_key, summary)
+        return self._summaries[memo_key]
+
+    async def asummary(self, key: str, text: str) -> str:
+        """Async version of summary(), the chunks are summarized concurrently."""
+        memo_key = self._memo_key(key, text)
+        if memo_key not in self._summaries:
+            summary = await self._asummarize_hierarchical(key, text)
+            with self._lock:
+                self._summaries.setdefault(memo_key, summary)
+        return self._summaries[memo_key]
+
+    def _memo_key(self, key: str, text: str) -> tuple[str, str]:
+        return key, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def _summarize_hierarchical(self, key: str, text: str, max_depth: int = 3) -> str:
+        """Summarize chunks of the text and merge the partial summaries until they fit."""
+        for _ in range(max_depth):
+            if self.count(text) <= self.summary_tokens:
+                return text
+            chunks = split_tokens(text, self.chunk_tokens, self.model_name)
+            if len(chunks) == 1:
+                return self._summarize_chunk(key, text, self.summary_tokens)
+            chunk_target = max(self.summary_tokens // len(chunks), MIN_RESOURCE_TOKENS)
+            text = "\n".join(self._summarize_chunk(key, chunk, chunk_target) for chunk in chunks)
+        return truncate_tokens(text, self.summary_tokens, self.model_name)
+
+    async def _asummarize_hierarchical(self, key: str, text: str, max_depth: int = 3) -> str:
+        """Async version of _summarize_hierarchical()."""
+        for _ in range(max_depth):
+            if self.count(text) <= self.summary_tokens:
+                return text
+            chunks = split_tokens(text, self.chunk_tokens, self.model_name)
+            if len(chunks) == 1:
+                return await self._asummarize_chunk(key, text, self.summary_tokens)
+            chunk_target = max(self.summary_tokens // len(chunks), MIN_RESOURCE_TOKENS)
+            summaries = await asyncio.gather(*(self._asummarize_chunk(key, chunk, chunk_target) for chunk in chunks))
+            text = "\n".join(summaries)
+        return truncate_tokens(text, self.summary_tokens, self.model_name)
+
+    def _summarize_chunk(self, key: str, text: str, max_tokens: int) -> str:
+        if self._summarize is not None:
+            return self._summarize(key, text, max_tokens)
+        # roughly 3 words per 4 tokens
+        with llm_priority(LLMPriority.BATCH):
+            return self._get_summary_chain().predict(key=key, text=text, max_words=max_tokens * 3 // 4).strip()
+
+    async def _asummarize_chunk(self, key: str, text: str, max_tokens: int) -> str:
+        if self._summarize is not None:
+            return await asyncio.to_thread(self._summarize, key, text, max_tokens)
+        with llm_priority(LLMPriority.BATCH):
+            summary = await self._get_summary_chain().apredict(key=key, text=text, max_words=max_tokens * 3 // 4)
+        return summary.strip()
+
+    def _get_summary_chain(self):
+        if self._summary_chain is None:
+            from taskchain.llm import get_basic_llm_chain
+            self._summary_chain = get_basic_llm_chain(SUMMARIZE_RESOURCE_PROMPT)
+        return self._summary_chain
+
+    def _packed(self, key: str, representation: ResourceRepresentation, text: str, original_tokens: int) -> PackedResource:
+        return PackedResource(
+            key=key,
+            representation=representation,
+            tokens=self.count(text) if representation != ResourceRepresentation.FULL else original_tokens,
+            original_tokens=original_tokens,
+            text=text,
+        )
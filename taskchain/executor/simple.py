@@ -1,16 +1,19 @@
 from __future__ import annotations
 
-from typing import Sequence
+import os
+from typing import Optional, Sequence
 
 from langchain.agents import AgentExecutor
 from langchain.callbacks.manager import CallbackManagerForChainRun
 
 from taskchain.agents.agent_registry import AgentRegistry
 from taskchain.communication.base import BaseCommunicator
+from taskchain.config import Config
 from taskchain.executor.base import BaseTaskManager
 from taskchain.executor.issue_handler import BaseIssueHandler
-from taskchain.schema.base import BaseChain
+from taskchain.schema.base import BaseChain, Issue
 from taskchain.schema.types import MessageTypes, ManagerRole
+from taskchain.storage.result_store import ContentAddressedStore, content_hash
 from taskchain.storage.storage_context import TaskContextStore
 from taskchain.task import Task
 
@@ -36,8 +39,19 @@ class SimpleTaskManager(BaseTaskManager):
             persist: bool = False,
             role: ManagerRole = ManagerRole.EXECUTION.value,
             verbose: bool = False,
+            memoize: bool = None,
+            result_store: ContentAddressedStore = None,
             **kwargs
     ):
+        """Execution Manager for a single task.
+
+        Args:
+            memoize (bool): Reuse the stored result of a previous run with the same task description,
+                inputs, outputs, agent config and input resource values instead of calling the agent.
+                Defaults to the TASK_MEMOIZATION config.
+            result_store (ContentAddressedStore): Store of the memoized results, defaults to the
+                results directory in the local storage dir.
+        """
         super().__init__(
             task=task,
             resources=resources,
@@ -54,6 +68,14 @@ class SimpleTaskManager(BaseTaskManager):
         )
 
         self.startup_chains = startup_chains
+        self._prepared_outputs: dict[int, dict] = {}
+        self._acquired_executor = False
+        # LLM switched to streaming and its previous setting, restored when the executor is released
+        self._streaming_llm: Optional[tuple[any, bool]] = None
+        self.memoize = bool(Config().task_memoization) if memoize is None else memoize
+        self.result_store = result_store
+        self._memo_key: Optional[str] = None
+        self._memo_hit: Optional[dict] = None
         self._subordinate_tasks = None
         self.add_to_cache("_subordinate_tasks")
 
@@ -70,24 +92,113 @@ class SimpleTaskManager(BaseTaskManager):
         if self.resources.get("resource_handler", None):
             pass
 
+        if self._lookup_memo(run_manager):
+            return None, True
+
+        self._load_agent_executor()
+        return None, True
+
+    async def _astartup(self, run_manager: CallbackManagerForChainRun = None) -> tuple[any, bool]:
+        if self.startup_chains:
+            for i, chain in enumerate(self.startup_chains):
+                if i in self._prepared_outputs:
+                    continue
+                output: dict = await chain.apredict_and_parse(**await self._aprep_inputs(chain.input_keys))
+                self.resources.update(output)
+
+        if self._lookup_memo(run_manager):
+            return None, True
+
+        self._load_agent_executor()
+        return None, True
+
+    async def aprepare(self):
+        """Prepare the execution ahead of time while upstream tasks are still finishing.
+        Loads the agent executor and runs the startup chains whose inputs are already available,
+        these chains are skipped in the startup.
+        """
+        self._load_agent_executor()
+        if self.startup_chains:
+            for i, chain in enumerate(self.startup_chains):
+                if all(key in self.resources for key in chain.input_keys):
+                    output: dict = await chain.apredict_and_parse(**await self._aprep_inputs(chain.input_keys))
+                    self._prepared_outputs[i] = output
+                    self.resources.update(output)
+
+    def attach_resources(self, resources: dict[str, any]):
+        """Replace the resources of a prepared manager, keeping the outputs of prepared startup chains."""
+        for output in self._prepared_outputs.values():
+            resources.update(output)
+        self.resources = resources
+
+    def _enable_streaming(self):
+        """Switch the LLM of the agent to token streaming if it supports it."""
+        self._load_agent_executor()
+        llm = getattr(getattr(self.agent_executor.agent, "llm_chain", None), "llm", None)
+        if llm is not None and hasattr(llm, "streaming"):
+            if self._streaming_llm is None:
+                self._streaming_llm = (llm, llm.streaming)
+            llm.streaming = True
+
+    def _disable_streaming(self):
+        """Restore the streaming setting changed by _enable_streaming()."""
+        if self._streaming_llm is not None:
+            llm, streaming = self._streaming_llm
+            llm.streaming = streaming
+            self._streaming_llm = None
+
+    def _load_agent_executor(self):
+        """Load the agent executor of the assigned agent from the registry."""
         if not self.agent_executor:
             if self.task.assigned_agent is None:
                 raise ValueError("No agent assigned to task.")
             if self.agent_registry is None:
                 raise ValueError("No agent registry provided.")
-            self.agent_executor = self.agent_registry.load(
+            self.agent_executor = self.agent_registry.acquire(
                 self.task.assigned_agent, verbose=self.verbose
             )
-        return None, True
+            self._acquired_executor = True
+
+    def _release_agent_executor(self):
+        """Hand an executor acquired from the registry back to its pool."""
+        self._disable_streaming()
+        if self._acquired_executor:
+            self.agent_registry.release(self.agent_executor)
+            self.agent_executor = None
+            self._acquired_executor = False
 
     def _run(self, run_manager: CallbackManagerForChainRun) -> str:
         """Execute the task."""
+        if self._memo_hit is not None:
+            return self._memo_hit["result"]
 
         agent_input = self._prep_inputs(self.task.inputs)
         return self.agent_executor.run(
             **agent_input, callbacks=run_manager.get_child()
         )
 
+    async def _arun(self, run_manager: CallbackManagerForChainRun) -> str:
+        """Execute the task asynchronously."""
+        if self._memo_hit is not None:
+            return self._memo_hit["result"]
+
+        agent_input = await self._aprep_inputs(self.task.inputs)
+        return await self.agent_executor.arun(
+            **agent_input, callbacks=run_manager.get_child()
+        )
+
+    def shutdown(self, result: any, run_manager: CallbackManagerForChainRun = None) -> Task:
+        try:
+            return super().shutdown(result, run_manager=run_manager)
+        finally:
+            self._release_agent_executor()
+
+    async def ashutdown(self, result: any, run_manager: CallbackManagerForChainRun = None) -> Task:
+        try:
+            return await super().ashutdown(result, run_manager=run_manager)
+        finally:
+            self._release_agent_executor()
+
     # TODO: add chain to prepare resources and select a resource handler for the following agents if necessary
     def _shutdown(
             self,
@@ -95,6 +206,9 @@ class SimpleTaskManager(BaseTaskManager):
             run_manager: CallbackManagerForChainRun = None
             ) -> tuple[dict, bool]:
         """Shutdown the manager."""
+        if self._memo_hit is not None:
+            # memoized results are stored after the validation below
+            return result, True
         if len(self.task.outputs) == 1:
             result = {self.task.outputs[0]: result}
         elif len(self.task.outputs) > 1:
@@ -104,8 +218,63 @@ class SimpleTaskManager(BaseTaskManager):
                 raise ValueError(
                     f"Task {self.task.id} has multiple outputs but result is not a dict."
                 )
+        if self._memo_key is not None:
+            self._get_result_store().put(self._memo_key, result, task_id=self.task.id, task_name=self.task.name)
         return result, True
 
+    async def _ashutdown(
+            self,
+            result: any,
+            run_manager: CallbackManagerForChainRun = None
+            ) -> tuple[dict, bool]:
+        """Shutdown the manager asynchronously."""
+        return self._shutdown(result, run_manager=run_manager)
+
+    ################################
+    #  Result Memoization
+    ################################
+
+    def memo_key(self) -> Optional[str]:
+        """Content hash of everything that determines the agent result, None if it can not be memoized."""
+        if self.agent_registry is None or self.task.assigned_agent is None:
+            return None
+        return content_hash({
+            "description": self.task.description,
+            "inputs": self.task.inputs,
+            "outputs": self.task.outputs,
+            "agent": self.agent_registry.fingerprint(self.task.assigned_agent),
+            "resources": {key: self.resources.get(key, None) for key in self.task.inputs},
+            "feedback": self.resources.get("feedback", None),
+        })
+
+    def invalidate_memo(self):
+        """Remove the memoized result of the current task state."""
+        key = self.memo_key()
+        if key is not None:
+            self._get_result_store().invalidate(key)
+
+    def _lookup_memo(self, run_manager: CallbackManagerForChainRun = None) -> bool:
+        """Look up the result of an identical previous run. Returns True on a hit."""
+        self._memo_key, self._memo_hit = None, None
+        if not self.memoize:
+            return False
+        self._memo_key = self.memo_key()
+        if self._memo_key is None:
+            return False
+        self._memo_hit = self._get_result_store().get(self._memo_key)
+        if self._memo_hit is not None and run_manager is not None:
+            run_manager.on_text(f"restored memoized result of {self.callback_name}\n\n")
+        return self._memo_hit is not None
+
+    def _get_result_store(self) -> ContentAddressedStore:
+        if self.result_store is None:
+            config = Config()
+            self.result_store = ContentAddressedStore(
+                os.path.join(config.local_storage_dir, "results"),
+                ttl=float(config.task_memoization_ttl) if config.task_memoization_ttl else None,
+            )
+        return self.result_store
+
     @property
     def subordinate_tasks(self):
         """One time call of subordinate tasks"""
@@ -114,11 +283,16 @@ class SimpleTaskManager(BaseTaskManager):
         return self._subordinate_tasks
 
     def _process_issue(self):
-        """Fetches all issues from communicator and resolves them if they are from subordinate tasks."""
+        """Resolves the issues reported by subordinate tasks.
+        Without an issue router, all issues are fetched and the ones of other managers are re-submitted."""
+        if self._resolve_subtree_issues():
+            return
         all_issues = self.communication.fetch_all(MessageTypes.ISSUE.value)
+        subordinate_tasks = set(self.subordinate_tasks)
 
-        in_charge = [issue for issue in all_issues if issue["source"] in self.subordinate_tasks]
-        for issue in in_charge:
+        in_charge = [issue for issue in all_issues if issue["header"]["source"] in subordinate_tasks]
+        for message in in_charge:
+            issue = Issue(**message["payload"])
             success = self.issue_handler.resolve(issue)
             # report unresolved issues
             if not success:
@@ -127,7 +301,7 @@ class SimpleTaskManager(BaseTaskManager):
 
         not_in_charge = [
             issue for issue in all_issues
-            if issue["source"] not in self.subordinate_tasks
+            if issue["header"]["source"] not in subordinate_tasks
         ]
-        for issue in not_in_charge:
-            self._submit_issue(issue)
+        for message in not_in_charge:
+            self._submit_issue(Issue(**message["payload"]))
@@ -0,0 +1,128 @@
+"""Streaming of LLM tokens and agent steps out of task manager runs."""
+from __future__ import annotations
+
+import asyncio
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Optional, Union
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler, BaseCallbackManager
+from langchain.callbacks.manager import Callbacks
+from langchain.schema import AgentAction, AgentFinish, LLMResult
+from pydantic import BaseModel
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+
+class StreamEventType(str, Enum):
+    """Types of streamed events
+
+    Attributes:
+        TOKEN: A new LLM token
+        ACTION: The agent decided on a tool call
+        OBSERVATION: The output of a tool call
+        FINAL_ANSWER_START: The agent started writing its final answer
+        FINISH: The agent finished with its final answer
+        RESULT: The task manager finished, data is the updated task
+        ERROR: An error occurred during execution
+    """
+    TOKEN = "token"
+    ACTION = "action"
+    OBSERVATION = "observation"
+    FINAL_ANSWER_START = "final_answer_start"
+    FINISH = "finish"
+    RESULT = "result"
+    ERROR = "error"
+
+
+class StreamEvent(BaseModel):
+    type: StreamEventType
+    task_id: Optional[str] = None
+    data: Any = None
+
+
+def with_handler(callbacks: Callbacks, handler: BaseCallbackHandler) -> Callbacks:
+    """Add an inheritable handler to callbacks without modifying them."""
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler, inherit=True)
+        return callbacks
+    return list(callbacks or []) + [handler]
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """Callback handler that turns LLM tokens and agent steps into an async iterator of StreamEvents.
+
+    Events may be emitted from worker threads, they are handed to the event loop the
+    handler was created in.
+
+    Attributes:
+        task_id: ID of the task the events belong to.
+        on_final_answer_start: Called once when the agent starts writing its final answer.
+    """
+
+    def __init__(
+            self,
+            task_id: str = None,
+            on_final_answer_start: Callable[[], None] = None,
+    ):
+        self.task_id = task_id
+        self.on_final_answer_start = on_final_answer_start
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[Optional[StreamEvent]] = asyncio.Queue()
+        self._buffer = ""
+        self._final_answer_started = False
+
+    def _emit(self, event_type: StreamEventType, data: Any = None):
+        event = StreamEvent(type=event_type, task_id=self.task_id, data=data)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def _final_answer_start(self):
+        if self._final_answer_started:
+            return
+        self._final_answer_started = True
+        self._emit(StreamEventType.FINAL_ANSWER_START)
+        if self.on_final_answer_start is not None:
+            self._loop.call_soon_threadsafe(self.on_final_answer_start)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> Any:
+        self._buffer = ""
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, **kwargs: Any) -> Any:
+        self._buffer = ""
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> Any:
+        self._emit(StreamEventType.TOKEN, token)
+        self._buffer += token
+        if FINAL_ANSWER_PREFIX in self._buffer:
+            self._final_answer_start()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
+        self._buffer = ""
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> Any:
+        self._emit(StreamEventType.ACTION, {"tool": action.tool, "tool_input": action.tool_input, "log": action.log})
+
+    def on_tool_end(self, output: str, **kwargs: Any) -> Any:
+        self._emit(StreamEventType.OBSERVATION, output)
+
+    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> Any:
+        # without token streaming the final answer is only known here
+        self._final_answer_start()
+        self._emit(StreamEventType.FINISH, finish.return_values)
+
+    def on_chain_error(
+            self, error: Union[Exception, KeyboardInterrupt], *, run_id: UUID = None, **kwargs: Any
+    ) -> Any:
+        self._emit(StreamEventType.ERROR, str(error))
+
+    def close(self):
+        """End the iteration once the queued events are consumed."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    async def __aiter__(self) -> AsyncIterator[StreamEvent]:
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                return
+            yield event
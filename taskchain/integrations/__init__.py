@@ -1 +1,10 @@
-from taskchain.integrations.trello import TrelloBoard
+from typing import TYPE_CHECKING
+
+from taskchain.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from taskchain.integrations.trello import TrelloBoard
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "TrelloBoard": "taskchain.integrations.trello",
+})
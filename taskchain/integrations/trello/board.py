@@ -3,6 +3,7 @@ from __future__ import annotations
 from trello import Card
 
 import taskchain.integrations.trello.utilities as trutils
+from taskchain.integrations.trello.sync import TrelloSyncEngine
 from taskchain.schema import TaskType, TaskStatus, TaskRelations
 from taskchain.storage.base import BaseProjectBoard
 from taskchain.storage.task_store import TaskStore
@@ -25,28 +26,41 @@ DEFAULT_LABEL: dict[str, str] = {
 
 class TrelloBoard(BaseProjectBoard):
 
-    def __init__(self, board_id: str = None, list_for_pipeline: bool = True):
+    def __init__(
+            self,
+            board_id: str = None,
+            list_for_pipeline: bool = True,
+            sync_engine: TrelloSyncEngine = None
+    ):
         """Trello board integration.
         Mirrors tasks to a Trello Board and adds Card IDs to the task nodes.
 
         Attributes:
             board_id: Trello board ID.
             list_for_pipeline: If True, a list for each pipeline is created where TaskType.TASK will be added.
+            sync_engine: If provided, cards are read from its cache and changes are batched
+                through its rate limited write queue instead of one request per call.
         """
-
+        self.sync_engine = sync_engine
+        self.list_for_pipeline = list_for_pipeline
+        if sync_engine is not None:
+            super().__init__(sync_engine.board_id)
+            self._task_cards: dict[str, str] = {}
+            return
 
         self.client = get_trello_client()
         if board_id is None:
             board_id = trutils.get_or_create_board_id(self.client)
 
         super().__init__(board_id)
-        self.list_for_pipeline = list_for_pipeline
         self.board = self.client.get_board(self.project_id)
         self._lists = trutils.map_list_names(self.board)
         self._labels = trutils.map_label_names(self.board)
 
     @trutils.retry_on_ssl_error
     def get_all(self):
+        if self.sync_engine is not None:
+            return [self._card_information_string(card) for card in self.sync_engine.get_cards()]
         cards = self.board.visible_cards()
         cards = [trutils.card_information_string(card) for card in cards]
         return cards
@@ -54,6 +68,8 @@ class TrelloBoard(BaseProjectBoard):
     @trutils.retry_on_ssl_error
     def add_task(self, task: Task):
         """Create Trello Card from Task and add Card ID to Task Node."""
+        if self.sync_engine is not None:
+            return self._sync_add_task(task)
         list_name = self._prep_list_name(task)
         if list_name not in self._lists:
             self._lists[list_name] = self.board.add_list(list_name, pos="bottom")
@@ -74,6 +90,8 @@ class TrelloBoard(BaseProjectBoard):
     @trutils.retry_on_ssl_error
     def close_task(self, task: Task):
         """Close a task by setting the card to closed and move to close list in Trello."""
+        if self.sync_engine is not None:
+            return self._sync_close_task(task)
         card = self.board.get_card(task.card_id)
         card.set_closed(True)
 
@@ -93,12 +111,16 @@ class TrelloBoard(BaseProjectBoard):
     def set_status(self, task: Task, status: str):
         """Set the status of a task as colored and named label.
         Only one label per card is allowed."""
+        if self.sync_engine is not None:
+            return self._sync_set_status(task.card_id, status)
         card = self.board.get_card(task.card_id)
         self._set_status(card, status)
 
     @trutils.retry_on_ssl_error
     def get_status(self, task: Task) -> str:
         """Get the status of a task as colored and named label."""
+        if self.sync_engine is not None:
+            return self.sync_engine.label_names(task.card_id)[0]
         card = self.board.get_card(task.card_id)
         return [label.name for label in card.labels][0]
 
@@ -106,6 +128,9 @@ class TrelloBoard(BaseProjectBoard):
     @trutils.retry_on_ssl_error
     def delete_task(self, task: Task):
         """Delete a task card from Trello."""
+        if self.sync_engine is not None:
+            self._task_cards.pop(task.id, None)
+            return self.sync_engine.delete_card(task.card_id)
         card = self.board.get_card(task.card_id)
         card.delete()
 
@@ -114,6 +139,9 @@ class TrelloBoard(BaseProjectBoard):
         """Update the name, description and status of a task from updated Task Node."""
         if card_id is None:
             card_id = updated_task.card_id
+        if self.sync_engine is not None:
+            self.sync_engine.update_card(card_id, name=updated_task.name, desc=updated_task.description)
+            return self._sync_set_status(card_id, updated_task.status)
         card = self.board.get_card(card_id)
         card.set_name(updated_task.name)
         card.set_description(updated_task.description)
@@ -122,12 +150,16 @@ class TrelloBoard(BaseProjectBoard):
     @trutils.retry_on_ssl_error
     def add_comment(self, task: Task, comment: str):
         """Add a comment to a task card."""
+        if self.sync_engine is not None:
+            return self.sync_engine.add_comment(task.card_id, comment)
         card = self.board.get_card(task.card_id)
         card.comment(comment)
 
     @trutils.retry_on_ssl_error
     def get_comments(self, task: Task):
         """Get all comments from a task card."""
+        if self.sync_engine is not None:
+            return self.sync_engine.get_comments(task.card_id)
         card = self.board.get_card(task.card_id)
         return card.comments
 
@@ -145,6 +177,15 @@ class TrelloBoard(BaseProjectBoard):
         if not trutils.item_in_sequence(checklist.items, item_name):
             checklist.add_checklist_item(item_name)
 
+    def flush(self):
+        """Send the changes queued in the sync engine."""
+        if self.sync_engine is not None:
+            self.sync_engine.flush()
+
+    def close(self):
+        """Stop the background flushing of the sync engine and send the remaining changes."""
+        if self.sync_engine is not None:
+            self.sync_engine.close()
 
     ### HELPER FUNCTIONS ###
 
@@ -174,6 +215,59 @@ class TrelloBoard(BaseProjectBoard):
         """Get the status of a task as colored and named label."""
         return [label.name for label in card.labels][0]
 
+    def _parent_card_id(self, task: Task) -> str | None:
+        """Card ID of the parent task, parents added in an earlier session are looked up in the task store."""
+        parent_card_id = self._task_cards.get(task.parent_id)
+        if parent_card_id is None:
+            parent = task_store.get_task(task.parent_id)
+            if parent is not None and parent.card_id is not None:
+                parent_card_id = self._task_cards[task.parent_id] = parent.card_id
+        return parent_card_id
+
+    def _sync_list_name(self, task: Task, parent_card_id: str | None) -> str:
+        if task.type == TaskType.TASK and self.list_for_pipeline:
+            parent_card = self.sync_engine.get_card(parent_card_id) if parent_card_id is not None else None
+            if parent_card is not None:
+                return f"P - {parent_card['name']}"
+            parent = task_store.get_task(task.parent_id)
+            if parent is not None:
+                return f"P - {parent.name}"
+        return task.type.title()
+
+    def _sync_add_task(self, task: Task):
+        parent_card_id = self._parent_card_id(task)
+        list_name = self._sync_list_name(task, parent_card_id)
+        card = self.sync_engine.create_card(list_name, name=task.name, desc=task.get_description())
+
+        if parent_card_id is not None:
+            self.sync_engine.set_checklist_item(parent_card_id, task.name, checklist_name=DEFAULT_CHECKLIST_NAME)
+
+        self._task_cards[task.id] = card["id"]
+        task.relations[TaskRelations.CARD] = card["id"]
+        task_store.put(task.id, task.dict())
+
+    def _sync_close_task(self, task: Task):
+        self.sync_engine.update_card(task.card_id, closed=True)
+        parent_card_id = self._parent_card_id(task)
+        if parent_card_id is not None:
+            self.sync_engine.set_checklist_item(
+                parent_card_id, task.name, checked=True, checklist_name=DEFAULT_CHECKLIST_NAME
+            )
+        self.sync_engine.move_card(task.card_id, TaskStatus.CLOSED.title())
+
+    def _sync_set_status(self, card_id: str, status: str):
+        self.sync_engine.ensure_label(status, DEFAULT_LABEL.get(status, "purple"))
+        self.sync_engine.set_labels(card_id, [status])
+
+    def _card_information_string(self, card: dict) -> str:
+        list_name = self.sync_engine.list_name(card.get("idList")) or ""
+        card_str = f"# {card['name']}"
+        card_str += "Stats:"
+        card_str += f"\n - List: {list_name}"
+        card_str += f"\n - Labels: {', '.join(self.sync_engine.label_names(card['id']))}"
+        card_str += f"\n# Description: {card.get('desc', '')}"
+        return card_str
+
     @property
     def type(self):
         return "TrelloBoard"
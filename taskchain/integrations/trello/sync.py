@@ -0,0 +1,299 @@
+"""Batched, rate-limited synchronisation of task cards with the Trello REST API."""
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from taskchain.agents.base import logger
+from taskchain.utilities import get_trello_config
+
+TRELLO_API_URL = "https://api.trello.com/1"
+
+CARD_FIELDS = "name,desc,idList,idLabels,closed"
+
+DEFAULT_CHECKLIST_NAME = "Subtasks"
+
+# Trello allows 100 requests per 10 seconds per token
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 100
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread safe token bucket rate limiter.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """Block until the tokens are available and take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TrelloSyncEngine:
+    """Mirrors task cards to a Trello board with a local card cache and a coalescing write queue.
+
+    Card reads are served from the cache, which is filled with a single batch request.
+    Field updates of a card (name, description, list, labels, closed) are merged in the
+    write queue and sent as one PUT per card when the queue is flushed, a background thread
+    flushes it periodically and a last flush runs at interpreter exit. All requests pass a token
+    bucket rate limiter and are retried with exponential backoff on rate limit, server and connection errors.
+
+    Attributes:
+        board_id: ID of the mirrored board.
+        base_url: Trello API url, can point to a local fake server for testing.
+        max_retries: Number of retries of a failed request.
+        backoff: Base delay in seconds of the exponential backoff.
+        flush_interval: Seconds between background flushes, None disables the background thread.
+    """
+
+    def __init__(
+            self,
+            board_id: str,
+            api_key: str,
+            token: str,
+            base_url: str = TRELLO_API_URL,
+            rate: float = DEFAULT_RATE,
+            burst: int = DEFAULT_BURST,
+            max_retries: int = 5,
+            backoff: float = 1.0,
+            flush_interval: Optional[float] = 1.0,
+            session: requests.Session = None,
+    ):
+        self.board_id = board_id
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.flush_interval = flush_interval
+        self._auth = {"key": api_key, "token": token}
+        self._session = session or requests.Session()
+        self._limiter = TokenBucket(rate, burst)
+
+        self._cards: dict[str, dict] = {}
+        self._lists: dict[str, str] = {}
+        self._labels: dict[str, str] = {}
+        self._pending_fields: dict[str, dict] = {}
+        self._pending_items: list[tuple[str, str, str, Optional[bool]]] = []
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.load_board()
+        if flush_interval is not None:
+            self._worker = threading.Thread(target=self._flush_loop, daemon=True)
+            self._worker.start()
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_config(cls, board_id: str, **kwargs) -> TrelloSyncEngine:
+        config = get_trello_config()
+        return cls(board_id, api_key=config["TRELLO_KEY"], token=config["TRELLO_TOKEN"], **kwargs)
+
+    # ===== Reads =====
+
+    def load_board(self):
+        """Fill the list, label and card cache with one batch request."""
+        lists, labels, cards = self._request("GET", "/batch", urls=",".join([
+            f"/boards/{self.board_id}/lists?filter=open",
+            f"/boards/{self.board_id}/labels",
+            f"/boards/{self.board_id}/cards?fields={CARD_FIELDS}&checklists=all",
+        ]))
+        self._lists = {lst["name"]: lst["id"] for lst in lists.get("200", [])}
+        self._labels = {label["name"]: label["id"] for label in labels.get("200", [])}
+        self._cards = {card["id"]: card for card in cards.get("200", [])}
+
+    def get_card(self, card_id: str) -> Optional[dict]:
+        """Get a card from the cache including queued changes."""
+        return self._cards.get(card_id, None)
+
+    def get_cards(self) -> list[dict]:
+        return list(self._cards.values())
+
+    def label_names(self, card_id: str) -> list[str]:
+        id_to_name = {label_id: name for name, label_id in self._labels.items()}
+        card = self._cards.get(card_id, {})
+        return [id_to_name[label_id] for label_id in card.get("idLabels", []) if label_id in id_to_name]
+
+    def list_name(self, list_id: str) -> Optional[str]:
+        return next((name for name, _id in self._lists.items() if _id == list_id), None)
+
+    def get_comments(self, card_id: str) -> list[dict]:
+        return self._request("GET", f"/cards/{card_id}/actions", filter="commentCard")
+
+    # ===== Writes =====
+
+    def ensure_list(self, name: str, pos: str = "bottom") -> str:
+        """Get the id of an open list by name, the list is created if missing."""
+        if name not in self._lists:
+            lst = self._request("POST", "/lists", idBoard=self.board_id, name=name, pos=pos)
+            self._lists[name] = lst["id"]
+        return self._lists[name]
+
+    def ensure_label(self, name: str, color: str) -> str:
+        """Get the id of a label by name, the label is created if missing."""
+        if name not in self._labels:
+            label = self._request("POST", "/labels", idBoard=self.board_id, name=name, color=color)
+            self._labels[name] = label["id"]
+        return self._labels[name]
+
+    def create_card(self, list_name: str, name: str, desc: str = "") -> dict:
+        """Create a card right away, the card id is needed by the caller."""
+        card = self._request("POST", "/cards", idList=self.ensure_list(list_name), name=name, desc=desc)
+        card.setdefault("idLabels", [])
+        card.setdefault("checklists", [])
+        self._cards[card["id"]] = card
+        return card
+
+    def update_card(self, card_id: str, **fields):
+        """Queue field changes of a card, later changes of a field replace earlier ones."""
+        card = self._cards.setdefault(card_id, {"id": card_id})
+        with self._queue_lock:
+            card.update(fields)
+            self._pending_fields.setdefault(card_id, {}).update(fields)
+        self._wakeup.set()
+
+    def set_labels(self, card_id: str, label_names: list[str]):
+        """Replace all labels of a card with one request."""
+        self.update_card(card_id, idLabels=[self._labels[name] for name in label_names])
+
+    def move_card(self, card_id: str, list_name: str):
+        self.update_card(card_id, idList=self.ensure_list(list_name))
+
+    def set_checklist_item(
+            self,
+            card_id: str,
+            item_name: str,
+            checked: Optional[bool] = None,
+            checklist_name: str = DEFAULT_CHECKLIST_NAME
+    ):
+        """Queue adding a checklist item to a card or, if checked is given, setting its state.
+        The checklist is created if missing."""
+        with self._queue_lock:
+            self._pending_items.append((card_id, checklist_name, item_name, checked))
+        self._wakeup.set()
+
+    def add_comment(self, card_id: str, text: str):
+        self._request("POST", f"/cards/{card_id}/actions/comments", text=text)
+
+    def delete_card(self, card_id: str):
+        with self._queue_lock:
+            self._pending_fields.pop(card_id, None)
+            self._pending_items = [item for item in self._pending_items if item[0] != card_id]
+        self._cards.pop(card_id, None)
+        self._request("DELETE", f"/cards/{card_id}")
+
+    # ===== Flushing =====
+
+    def flush(self):
+        """Send all queued changes, one request per changed card."""
+        with self._flush_lock:
+            with self._queue_lock:
+                pending_fields, self._pending_fields = self._pending_fields, {}
+                pending_items, self._pending_items = self._pending_items, []
+
+            for card_id, fields in pending_fields.items():
+                params = dict(fields)
+                if "idLabels" in params:
+                    params["idLabels"] = ",".join(params["idLabels"])
+                try:
+                    self._request("PUT", f"/cards/{card_id}", **params)
+                except requests.RequestException as e:
+                    logger.error(f"Failed to sync Trello card {card_id}: {e}")
+                    self._requeue_fields(card_id, fields)
+
+            for card_id, checklist_name, item_name, checked in pending_items:
+                try:
+                    self._sync_checklist_item(card_id, checklist_name, item_name, checked)
+                except requests.RequestException as e:
+                    logger.error(f"Failed to sync checklist item {item_name} of Trello card {card_id}: {e}")
+
+    def close(self):
+        """Stop the background thread and flush the remaining changes."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def _requeue_fields(self, card_id: str, fields: dict):
+        """Queue the fields of a failed update again, changes queued in the meantime take precedence."""
+        with self._queue_lock:
+            if card_id in self._cards:
+                self._pending_fields[card_id] = {**fields, **self._pending_fields.get(card_id, {})}
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # give concurrent updates of the same card time to coalesce
+            self._stop.wait(self.flush_interval)
+            self.flush()
+
+    def _sync_checklist_item(self, card_id: str, checklist_name: str, item_name: str, checked: Optional[bool]):
+        card = self._cards.setdefault(card_id, {"id": card_id, "checklists": []})
+        checklists = card.setdefault("checklists", [])
+        checklist = next((cl for cl in checklists if cl["name"] == checklist_name), None)
+        if checklist is None:
+            checklist = self._request("POST", "/checklists", idCard=card_id, name=checklist_name)
+            checklist.setdefault("checkItems", [])
+            checklists.append(checklist)
+
+        item = next((it for it in checklist["checkItems"] if it["name"] == item_name), None)
+        if item is None:
+            item = self._request(
+                "POST", f"/checklists/{checklist['id']}/checkItems",
+                name=item_name, checked=bool(checked)
+            )
+            checklist["checkItems"].append(item)
+        elif checked is not None:
+            state = "complete" if checked else "incomplete"
+            self._request("PUT", f"/cards/{card_id}/checkItem/{item['id']}", state=state)
+            item["state"] = state
+
+    def _request(self, method: str, path: str, **params) -> any:
+        """Send a rate limited request, retrying with exponential backoff."""
+        url = f"{self.base_url}{path}"
+        params = {key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()}
+        params.update(self._auth)
+        for attempt in range(self.max_retries + 1):
+            self._limiter.acquire()
+            try:
+                response = self._session.request(method, url, params=params, timeout=30)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                time.sleep(float(retry_after) if retry_after else self.backoff * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            return response.json() if response.content else None
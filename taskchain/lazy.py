@@ -0,0 +1,46 @@
+"""Lazy loading of package attributes to keep the import of taskchain cheap."""
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import Callable, Iterable
+
+
+def lazy_exports(
+        package: str,
+        exports: dict[str, str] = None,
+        submodules: Iterable[str] = ()
+) -> tuple[Callable[[str], any], Callable[[], list[str]]]:
+    """Create module level __getattr__ and __dir__ functions for a package.
+
+    The module defining an exported name is imported on first attribute access and the
+    value is stored in the package namespace, so later lookups are plain attribute reads.
+
+    Args:
+        package: Name of the package, usually __name__.
+        exports: Maps exported names to the module defining them.
+        submodules: Names of submodules imported on attribute access.
+    """
+    exports = dict(exports or {})
+    submodules = set(submodules)
+
+    def __getattr__(name: str):
+        if name in exports:
+            value = getattr(importlib.import_module(exports[name]), name)
+        elif name in submodules:
+            value = importlib.import_module(f"{package}.{name}")
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports) | submodules)
+
+    return __getattr__, __dir__
+
+
+def preload(*modules: str) -> None:
+    """Import modules eagerly, e.g. in a parent process before forking workers."""
+    for module in modules:
+        importlib.import_module(module)
@@ -1 +1,28 @@
-from taskchain.llm.loader import get_basic_llm, get_expert_llm, get_default_llm, get_llm_by_name, get_basic_llm_chain
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from taskchain.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from taskchain.llm.loader import get_basic_llm, get_expert_llm, get_default_llm, get_llm_by_name, get_basic_llm_chain, get_llm_cache, set_llm_cache
+    from taskchain.llm.cache import SQLiteResponseCache
+    from taskchain.llm.gateway import LLMGateway, LLMPriority, get_gateway, set_gateway, llm_priority
+    from taskchain.llm.models import CachedChatOpenAI, GatewayChatOpenAI, LocalChatModel
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "get_basic_llm": "taskchain.llm.loader",
+    "get_expert_llm": "taskchain.llm.loader",
+    "get_default_llm": "taskchain.llm.loader",
+    "get_llm_by_name": "taskchain.llm.loader",
+    "get_basic_llm_chain": "taskchain.llm.loader",
+    "get_llm_cache": "taskchain.llm.loader",
+    "set_llm_cache": "taskchain.llm.loader",
+    "SQLiteResponseCache": "taskchain.llm.cache",
+    "LLMGateway": "taskchain.llm.gateway",
+    "LLMPriority": "taskchain.llm.gateway",
+    "get_gateway": "taskchain.llm.gateway",
+    "set_gateway": "taskchain.llm.gateway",
+    "llm_priority": "taskchain.llm.gateway",
+    "CachedChatOpenAI": "taskchain.llm.models",
+    "GatewayChatOpenAI": "taskchain.llm.models",
+    "LocalChatModel": "taskchain.llm.models",
+})
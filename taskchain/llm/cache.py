@@ -0,0 +1,159 @@
+"""Persistent response cache for LLM calls."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+from langchain.cache import BaseCache, RETURN_VAL_TYPE
+from langchain.schema import BaseMessage
+
+DEFAULT_CACHE_FNAME = "llm_cache.sqlite"
+
+
+def canonicalize_prompt(prompt: str) -> str:
+    """Normalize line endings and surrounding whitespace so equal prompts share one cache entry."""
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def messages_prompt(messages: Sequence[BaseMessage]) -> str:
+    """Serialize chat messages into a canonical prompt, the role and content of every message."""
+    return json.dumps([[message.type, canonicalize_prompt(message.content)] for message in messages])
+
+
+def llm_string(params: dict[str, Any]) -> str:
+    """Serialize the model parameters that change the response, e.g. model name and temperature."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """Content hash of the canonical prompt and the llm string.
+    The llm string holds the sorted model parameters e.g. model name and temperature.
+    """
+    payload = json.dumps([canonicalize_prompt(prompt), llm_string])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseCache(BaseCache):
+    """Disk backed LLM response cache with TTL, size based eviction and hit/miss statistics.
+
+    Attributes:
+        database_path: Path to the SQLite database file.
+        ttl: Seconds after which an entry expires. None keeps entries forever.
+        max_entries: Maximum number of stored responses, least recently used entries are evicted.
+        bypass: If True, the cache is neither read nor written.
+    """
+
+    def __init__(
+            self,
+            database_path: str,
+            ttl: Optional[float] = None,
+            max_entries: Optional[int] = None,
+            bypass: bool = False,
+    ):
+        dirpath = os.path.dirname(database_path)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        self.database_path = database_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, llm_string TEXT, response BLOB, "
+            "created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Look up a response by prompt and llm string."""
+        if self.bypass:
+            return None
+
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._evictions += 1
+                row = None
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._hits += 1
+        return pickle.loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store a response for prompt and llm string."""
+        if self.bypass:
+            return
+
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, llm_string, pickle.dumps(return_val), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self, **kwargs) -> None:
+        """Remove all cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove expired entries and the least recently used entries above max_entries."""
+        if self.ttl is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self._evictions += max(cursor.rowcount, 0)
+
+        if self.max_entries is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._evictions += max(cursor.rowcount, 0)
+
+    @property
+    def size(self) -> int:
+        """The number of cached responses."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def stats(self) -> dict[str, any]:
+        """Hit/miss statistics of the current process."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "size": self.size,
+        }
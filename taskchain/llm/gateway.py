@@ -0,0 +1,374 @@
+"""Shared gateway bounding concurrency, request rate and token rate of all LLM calls."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from taskchain.agents.base import logger
+
+T = TypeVar("T")
+
+# assumed completion length if a call does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+RETRYABLE_ERRORS = {
+    "RateLimitError", "APIError", "Timeout", "APIConnectionError", "ServiceUnavailableError", "TryAgain"
+}
+
+
+class LLMPriority(int, Enum):
+    """Priority classes of LLM calls, lower values are admitted first
+
+    Attributes:
+        INTERACTIVE: Calls a user is waiting for, e.g. agent steps
+        BATCH: Background work, e.g. decomposition and summaries
+    """
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: contextvars.ContextVar[LLMPriority] = contextvars.ContextVar("llm_priority", default=LLMPriority.INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: LLMPriority) -> Iterator[None]:
+    """Set the priority of the LLM calls made in this context, inherited by async tasks and threads
+    started with asyncio.to_thread."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "http_status", None) == 429
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    return type(error).__name__ in RETRYABLE_ERRORS or getattr(error, "http_status", None) in {429, 500, 502, 503}
+
+
+class RateBucket:
+    """Token bucket handing out reservations, a caller waits the returned delay before sending.
+    Reservations may overdraw the bucket, so waiting callers are served in order.
+
+    Attributes:
+        capacity: Amount available per minute, None for no limit.
+    """
+
+    def __init__(self, capacity: Optional[float]):
+        self.capacity = capacity
+        self.rate = capacity / 60 if capacity else None
+        self._level = float(capacity or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount out of the bucket and return the seconds to wait until it is covered."""
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            self._refill()
+            # a single request larger than the bucket has to be allowed eventually
+            self._level -= min(amount, self.capacity)
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def adjust(self, amount: float):
+        """Correct an earlier reservation, e.g. with the actual token usage of a response."""
+        if self.rate is None:
+            return
+        with self._lock:
+            self._refill()
+            self._level -= amount
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class _Waiter:
+    __slots__ = ("grant", "granted", "cancelled")
+
+    def __init__(self, grant: Callable[[], None]):
+        self.grant = grant
+        self.granted = False
+        self.cancelled = False
+
+
+class ModelLane:
+    """Admission control and rate limits of a single model.
+
+    Requests are admitted by priority up to max_concurrency, then pass the request and token
+    buckets. On rate limit errors the rates are halved and all requests of the model pause,
+    every successful request raises them again by a fraction of the configured limit (AIMD).
+    """
+
+    def __init__(
+            self,
+            name: str,
+            rpm: Optional[float] = None,
+            tpm: Optional[float] = None,
+            max_concurrency: int = 16,
+            min_rate_factor: float = 0.1,
+            recovery: float = 0.05,
+    ):
+        self.name = name
+        self.requests = RateBucket(rpm)
+        self.tokens = RateBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_rate_factor = min_rate_factor
+        self.recovery = recovery
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self._active = 0
+        self._waiters: list[tuple[int, int, _Waiter]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "errors": 0}
+
+    # ===== Admission =====
+
+    def _enqueue(self, priority: LLMPriority, grant: Callable[[], None]) -> Optional[_Waiter]:
+        """Admit right away or queue a waiter. Returns None if admitted."""
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return None
+            waiter = _Waiter(grant)
+            heapq.heappush(self._waiters, (int(priority), next(self._counter), waiter))
+            return waiter
+
+    def acquire(self, priority: LLMPriority):
+        event = threading.Event()
+        if self._enqueue(priority, event.set) is not None:
+            event.wait()
+
+    async def aacquire(self, priority: LLMPriority):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, grant)
+        if waiter is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            if granted:
+                # the slot was granted before the cancellation arrived
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            while self._waiters and self._active < self.max_concurrency:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                self._active += 1
+                waiter.granted = True
+                waiter.grant()
+
+    # ===== Rates =====
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve a request and its tokens, returns the seconds to wait before sending."""
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        return max(delay, self.paused_until - time.monotonic())
+
+    def on_success(self, reserved_tokens: int, used_tokens: Optional[int]):
+        self.stats["requests"] += 1
+        if used_tokens is not None:
+            self.tokens.adjust(used_tokens - reserved_tokens)
+        if self.rate_factor < 1.0:
+            self._set_rate_factor(min(1.0, self.rate_factor + self.recovery))
+
+    def on_rate_limit(self, retry_after: Optional[float]):
+        self.stats["rate_limited"] += 1
+        self._set_rate_factor(max(self.min_rate_factor, self.rate_factor / 2))
+        self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0))
+
+    def _set_rate_factor(self, factor: float):
+        self.rate_factor = factor
+        for bucket in (self.requests, self.tokens):
+            if bucket.capacity:
+                bucket.set_rate(bucket.capacity / 60 * factor)
+
+
+class LLMGateway:
+    """Routes LLM calls through per-model lanes with priority admission, rate limits and retries.
+
+    Attributes:
+        limits: Maps model names to dicts with the keys rpm, tpm and max_concurrency.
+        max_concurrency: Default concurrency bound of a model.
+        max_retries: Number of retries of a failed call.
+        backoff: Base delay in seconds of the exponential backoff.
+    """
+
+    def __init__(
+            self,
+            limits: dict[str, dict] = None,
+            max_concurrency: int = 16,
+            max_retries: int = 6,
+            backoff: float = 1.0,
+    ):
+        self.limits = limits or {}
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._lanes: dict[str, ModelLane] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, model_name: str) -> ModelLane:
+        with self._lock:
+            if model_name not in self._lanes:
+                limits = self.limits.get(model_name, {})
+                self._lanes[model_name] = ModelLane(
+                    model_name,
+                    rpm=limits.get("rpm", None),
+                    tpm=limits.get("tpm", None),
+                    max_concurrency=int(limits.get("max_concurrency", self.max_concurrency)),
+                )
+            return self._lanes[model_name]
+
+    def call(
+            self,
+            model_name: str,
+            fn: Callable[[], T],
+            tokens: int,
+            priority: LLMPriority = None,
+            usage: Callable[[T], Optional[int]] = None,
+    ) -> T:
+        """Call fn within the limits of the model, retrying retryable errors."""
+        lane = self.lane(model_name)
+        priority = priority if priority is not None else _priority.get()
+        for attempt in range(self.max_retries + 1):
+            lane.acquire(priority)
+            try:
+                time.sleep(lane.reserve(tokens))
+                result = fn()
+            except Exception as e:
+                delay = self._on_error(lane, e, attempt)
+            else:
+                lane.on_success(tokens, usage(result) if usage else None)
+                return result
+            finally:
+                lane.release()
+            time.sleep(delay)
+
+    async def acall(
+            self,
+            model_name: str,
+            fn: Callable[[], Awaitable[T]],
+            tokens: int,
+            priority: LLMPriority = None,
+            usage: Callable[[T], Optional[int]] = None,
+    ) -> T:
+        """Async version of call()."""
+        lane = self.lane(model_name)
+        priority = priority if priority is not None else _priority.get()
+        for attempt in range(self.max_retries + 1):
+            await lane.aacquire(priority)
+            try:
+                await asyncio.sleep(lane.reserve(tokens))
+                result = await fn()
+            except Exception as e:
+                delay = self._on_error(lane, e, attempt)
+            else:
+                lane.on_success(tokens, usage(result) if usage else None)
+                return result
+            finally:
+                lane.release()
+            await asyncio.sleep(delay)
+
+    def _on_error(self, lane: ModelLane, error: Exception, attempt: int) -> float:
+        """Re-raise errors that are not retried, otherwise return the delay until the next attempt."""
+        if not is_retryable_error(error) or attempt == self.max_retries:
+            lane.stats["errors"] += 1
+            raise error
+        lane.stats["retries"] += 1
+        retry_after = _retry_after(error)
+        if is_rate_limit_error(error):
+            lane.on_rate_limit(retry_after)
+        delay = retry_after or self.backoff * 2 ** attempt * (0.5 + random.random())
+        logger.warning(f"LLM call to {lane.name} failed with {type(error).__name__}, retrying in {delay:.1f}s")
+        return delay
+
+    @property
+    def stats(self) -> dict[str, dict]:
+        return {name: dict(lane.stats, rate_factor=lane.rate_factor) for name, lane in self._lanes.items()}
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Get the gateway shared by all LLMs of the process, initialized from config on first call."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            from taskchain.config import Config
+            config = Config()
+            limits = config.llm_rate_limits or {}
+            if isinstance(limits, str):
+                # set as JSON in the environment
+                try:
+                    limits = json.loads(limits)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"LLM_RATE_LIMITS is not a valid JSON object: {e}") from e
+            _gateway = LLMGateway(
+                limits=limits,
+                max_concurrency=int(config.llm_max_concurrency),
+                max_retries=int(config.llm_max_retries),
+            )
+        return _gateway
+
+
+def set_gateway(gateway: Optional[LLMGateway]):
+    """Replace the shared gateway, None re-initializes it from config on next use."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
+
+
+def estimate_tokens(messages: list, max_tokens: Optional[int], model_name: str) -> int:
+    """Estimate the tokens of a call from its prompt messages and the completion limit."""
+    from taskchain.llm.tokenizer import count_tokens
+    prompt = sum(count_tokens(message.content, model_name) for message in messages)
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def chat_result_usage(result: Any) -> Optional[int]:
+    llm_output = getattr(result, "llm_output", None) or {}
+    return (llm_output.get("token_usage") or {}).get("total_tokens", None)
@@ -1,16 +1,54 @@
 from __future__ import annotations
 
+from typing import Optional
+
+import langchain
+from langchain.cache import BaseCache
 from langchain.chains import LLMChain
-from langchain.chat_models import ChatOpenAI
+from langchain.chat_models.base import BaseChatModel
 from langchain.prompts import PromptTemplate
 from langchain.prompts import SystemMessagePromptTemplate, ChatPromptTemplate
 from pydantic import ValidationError
 
 from taskchain.config import Config
+from taskchain.llm.cache import SQLiteResponseCache
+from taskchain.llm.models import CachedChatOpenAI, GatewayChatOpenAI, LocalChatModel
 
 CFG = Config()
 
 
+def get_llm_cache() -> Optional[BaseCache]:
+    """Get the response cache shared by all LLMs, initialized from config on first call."""
+    if langchain.llm_cache is None and CFG.llm_cache:
+        set_llm_cache(SQLiteResponseCache(
+            database_path=CFG.llm_cache_path,
+            ttl=float(CFG.llm_cache_ttl) if CFG.llm_cache_ttl else None,
+            max_entries=int(CFG.llm_cache_max_entries) if CFG.llm_cache_max_entries else None,
+            bypass=bool(CFG.llm_cache_bypass),
+        ))
+    return langchain.llm_cache
+
+
+def set_llm_cache(cache: Optional[BaseCache]):
+    """Set the response cache used by all LLMs, None disables caching."""
+    langchain.llm_cache = cache
+
+
+def _chat_model(model_name: str, **kwargs) -> BaseChatModel:
+    """Construct a chat model with the shared response cache.
+    Pass cache=False to bypass the cache for a single model.
+    Calls of the model pass the shared LLM gateway unless LLM_GATEWAY is disabled,
+    with LLM_BACKEND set to local a local stand-in model is returned.
+    """
+    get_llm_cache()
+    if CFG.llm_backend == "local":
+        kwargs = {key: value for key, value in kwargs.items() if key in LocalChatModel.__fields__}
+        return LocalChatModel(model_name=model_name, **kwargs)
+    if CFG.llm_gateway:
+        return GatewayChatOpenAI(model_name=model_name, **kwargs)
+    return CachedChatOpenAI(model_name=model_name, **kwargs)
+
+
 def get_basic_llm_chain(
         prompt_template: str,
         model_name=None,
@@ -21,34 +59,34 @@ def get_basic_llm_chain(
         model_name = CFG.fast_llm_model
     if llm_kwargs is None:
         llm_kwargs = {}
-    llm = ChatOpenAI(model_name=model_name, **llm_kwargs)
+    llm = _chat_model(model_name, **llm_kwargs)
     prompt = PromptTemplate.from_template(prompt_template)
     return LLMChain(llm=llm, prompt=prompt, **kwargs)
 
 
 def call_expert_llm(prompt, **kwargs):
     system = SystemMessagePromptTemplate.from_template(prompt)
-    chain = LLMChain(llm=ChatOpenAI(model_name="gpt-4"), prompt=ChatPromptTemplate.from_messages([system]))
+    chain = LLMChain(llm=_chat_model("gpt-4"), prompt=ChatPromptTemplate.from_messages([system]))
     return chain.predict(**kwargs)
 
 
 def get_basic_llm(**kwargs):
     try:
-        return ChatOpenAI(model_name=CFG.fast_llm_model, **kwargs)
+        return _chat_model(CFG.fast_llm_model, **kwargs)
     except ValidationError:
         import os
         os.environ["OPENAI_API_KEY"] = Config().openai_api_key
-        return ChatOpenAI(model_name=CFG.fast_llm_model, **kwargs)
+        return _chat_model(CFG.fast_llm_model, **kwargs)
 
 
 def get_expert_llm(**kwargs):
-    return ChatOpenAI(model_name="gpt-4", **kwargs)
+    return _chat_model("gpt-4", **kwargs)
 
 
 def get_llm_by_name(model_name: str, **kwargs):
     if model_name is None:
         return get_basic_llm(**kwargs)
-    return ChatOpenAI(model_name=model_name, **kwargs)
+    return _chat_model(model_name, **kwargs)
 
 
 def get_default_llm(**kwargs):
@@ -0,0 +1,237 @@
+"""Chat models routing their calls through the shared response cache and LLM gateway."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from typing import Any, Callable, Iterator, List, Optional
+
+import langchain
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain.chat_models import ChatOpenAI
+from langchain.chat_models.base import SimpleChatModel
+from langchain.schema import AIMessage, BaseMessage, ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from taskchain.llm.cache import llm_string, messages_prompt
+from taskchain.llm.gateway import LLMPriority, chat_result_usage, estimate_tokens, get_gateway
+
+
+def _lookup_response(cache: Optional[bool], messages: List[BaseMessage], params: dict) -> Optional[ChatResult]:
+    """Look up a response in the shared response cache, chat models do not read langchain.llm_cache themselves."""
+    if cache is False or langchain.llm_cache is None:
+        return None
+    generations = langchain.llm_cache.lookup(messages_prompt(messages), llm_string(params))
+    return ChatResult(generations=generations) if generations is not None else None
+
+
+def _update_response(cache: Optional[bool], messages: List[BaseMessage], params: dict, result: ChatResult):
+    if cache is False or langchain.llm_cache is None:
+        return
+    langchain.llm_cache.update(messages_prompt(messages), llm_string(params), result.generations)
+
+
+class CachedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose responses are stored in the shared response cache, keyed on the canonical
+    messages and the parameters changing the response. Streamed calls are not cached, their callbacks
+    expect the tokens.
+
+    Attributes:
+        cache: False bypasses the response cache for this model.
+    """
+
+    cache: Optional[bool] = None
+
+    def _cache_params(self, stop: Optional[List[str]]) -> dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "n": self.n,
+            "stop": stop,
+        }
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        cache = False if self.streaming else self.cache
+        params = self._cache_params(stop)
+        result = _lookup_response(cache, messages, params)
+        if result is None:
+            result = self._call_model(messages, stop=stop, run_manager=run_manager, **kwargs)
+            _update_response(cache, messages, params, result)
+        return result
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        cache = False if self.streaming else self.cache
+        params = self._cache_params(stop)
+        result = _lookup_response(cache, messages, params)
+        if result is None:
+            result = await self._acall_model(messages, stop=stop, run_manager=run_manager, **kwargs)
+            _update_response(cache, messages, params, result)
+        return result
+
+    def _call_model(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _acall_model(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class GatewayChatOpenAI(CachedChatOpenAI):
+    """ChatOpenAI whose requests pass the concurrency bound, rate limits and retries of the gateway.
+    Retries are left to the gateway, so max_retries of the client defaults to a single attempt.
+    Cached responses do not pass the gateway.
+
+    Attributes:
+        priority: Priority class of the calls, defaults to the priority of the calling context.
+    """
+
+    priority: Optional[LLMPriority] = None
+    max_retries: int = 1
+
+    def _call_model(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        generate = super()._call_model
+        return get_gateway().call(
+            self.model_name,
+            lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=estimate_tokens(messages, self.max_tokens, self.model_name),
+            priority=self.priority,
+            usage=chat_result_usage,
+        )
+
+    async def _acall_model(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        agenerate = super()._acall_model
+        return await get_gateway().acall(
+            self.model_name,
+            lambda: agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+            tokens=estimate_tokens(messages, self.max_tokens, self.model_name),
+            priority=self.priority,
+            usage=chat_result_usage,
+        )
+
+
+class LocalChatModel(SimpleChatModel):
+    """Local stand-in for the chat models in tests and load tests, no API key or network is needed.
+    Calls pass the response cache and the gateway like the calls of the real models.
+
+    Attributes:
+        model_name: Name of the gateway lane.
+        responses: Responses returned in turn. Without responses the last message is echoed
+            as a final answer.
+        respond: Callable building the response from the messages, overrides responses.
+        latency: Seconds every call takes.
+        cache: False bypasses the response cache for this model.
+    """
+
+    model_name: str = "local"
+    responses: List[str] = []
+    respond: Optional[Callable[[List[BaseMessage]], str]] = None
+    latency: float = 0.0
+    priority: Optional[LLMPriority] = None
+    cache: Optional[bool] = None
+
+    _cycle: Optional[Iterator[str]] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, "responses": self.responses}
+
+    def _response(self, messages: List[BaseMessage]) -> str:
+        if self.respond is not None:
+            return self.respond(messages)
+        if self.responses:
+            if self._cycle is None:
+                self._cycle = itertools.cycle(self.responses)
+            return next(self._cycle)
+        return f"Final Answer: {messages[-1].content if messages else ''}"
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        params = {**self._identifying_params, "stop": stop}
+        result = _lookup_response(self.cache, messages, params)
+        if result is None:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            _update_response(self.cache, messages, params, result)
+        return result
+
+    def _call(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        def call():
+            time.sleep(self.latency)
+            return self._response(messages)
+
+        return get_gateway().call(
+            self.model_name, call, tokens=estimate_tokens(messages, None, None), priority=self.priority
+        )
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        params = {**self._identifying_params, "stop": stop}
+        result = _lookup_response(self.cache, messages, params)
+        if result is not None:
+            return result
+
+        async def call():
+            await asyncio.sleep(self.latency)
+            return self._response(messages)
+
+        text = await get_gateway().acall(
+            self.model_name, call, tokens=estimate_tokens(messages, None, None), priority=self.priority
+        )
+        result = ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+        _update_response(self.cache, messages, params, result)
+        return result
@@ -0,0 +1,56 @@
+"""Cached token counting for prompt budgeting."""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Optional
+
+# rough number of characters per token used if tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: Optional[str] = None):
+    """Get the tiktoken encoding of a model, None if tiktoken is not available."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        if model_name is not None:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # the encoding files are downloaded on first use, offline workers estimate
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """Count the tokens of a text, the result is cached for repeated resources."""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text: str, chunk_tokens: int, model_name: Optional[str] = None) -> list[str]:
+    """Split a text into chunks of at most chunk_tokens tokens."""
+    chunk_tokens = max(chunk_tokens, 1)
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        size = chunk_tokens * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + chunk_tokens]) for i in range(0, len(tokens), chunk_tokens)] or [""]
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+    """Cut a text after max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model_name) <= max_tokens:
+        return text
+    return split_tokens(text, max_tokens, model_name)[0]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import re
-from typing import TypeVar
+from typing import Optional, TypeVar
 
 from langchain.base_language import BaseLanguageModel
 from langchain.chains.llm import LLMChain
@@ -10,7 +10,7 @@ from langchain.prompts.base import BasePromptTemplate
 from langchain.schema import BaseOutputParser, OutputParserException
 from pydantic import BaseModel
 
-from taskchain.llm import get_basic_llm
+from taskchain.parser import json_repair
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -21,6 +21,8 @@ Thought: you should always think about what to do
 Action: <command>
 """
 
+# e.g. **Action**: <command> or action - <command>
+LENIENT_ACTION_REGEX = r"\baction\**\s*\d*\s*\**\s*[:\-]\**\s*(.*)"
 
 
 class SimpleActionParser(BaseOutputParser):
@@ -41,17 +43,18 @@ class SimpleActionParser(BaseOutputParser):
 
 
 class FixedActionParser(BaseOutputParser):
-    """Wraps a parser and tries to fix parsing errors."""
+    """Wraps a parser and tries to fix parsing errors.
+    Without a retry chain, one with the basic llm is created on the first parsing error."""
 
     parser: BaseOutputParser = SimpleActionParser()
-    retry_chain: LLMChain = LLMChain(llm=get_basic_llm(), prompt=NAIVE_FIX_PROMPT)
+    retry_chain: Optional[LLMChain] = None
 
     @classmethod
     def from_output_model(
             cls,
-            llm: BaseLanguageModel = get_basic_llm()
+            llm: BaseLanguageModel = None
     ) -> FixedActionParser:
-        chain = LLMChain(llm=llm, prompt=NAIVE_FIX_PROMPT)
+        chain = None if llm is None else LLMChain(llm=llm, prompt=NAIVE_FIX_PROMPT)
         parser = SimpleActionParser()
         return cls(parser=parser, retry_chain=chain)
 
@@ -70,7 +73,10 @@ class FixedActionParser(BaseOutputParser):
         try:
             parsed_completion = self.parser.parse(completion)
         except OutputParserException as e:
-            new_completion = self.retry_chain.run(
+            local_fix = self._local_fix(completion)
+            if local_fix is not None:
+                return local_fix
+            new_completion = self.get_retry_chain().run(
                 instructions=self.parser.get_format_instructions(),
                 completion=completion,
                 error=repr(e),
@@ -79,6 +85,25 @@ class FixedActionParser(BaseOutputParser):
 
         return parsed_completion
 
+    def get_retry_chain(self) -> LLMChain:
+        if self.retry_chain is None:
+            from taskchain.llm import get_basic_llm
+            self.retry_chain = LLMChain(llm=get_basic_llm(), prompt=NAIVE_FIX_PROMPT)
+        return self.retry_chain
+
+    def _local_fix(self, completion: str) -> Optional[str]:
+        """Recover the action without an LLM call, from markdown or differently cased labels
+        or from a JSON object with an action key."""
+        match = re.search(LENIENT_ACTION_REGEX, completion, re.DOTALL | re.IGNORECASE)
+        if match and match.group(1).strip():
+            return match.group(1).strip()
+        try:
+            json_object = json_repair.loads(completion, expect="{")
+        except json_repair.JSONRepairError:
+            return None
+        action = next((json_object[key] for key in ("action", "command") if key in json_object), None)
+        return action.strip() if isinstance(action, str) and action.strip() else None
+
     def get_format_instructions(self) -> str:
         return self.parser.get_format_instructions()
 
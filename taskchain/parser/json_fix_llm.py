@@ -13,7 +13,7 @@ from taskchain.logs import logger
 from taskchain.speech import say_text
 
 from taskchain.config import Config
-from taskchain.parser.json_fix_general import correct_json
+from taskchain.parser import json_repair
 
 JSON_SCHEMA = """
 {
@@ -129,27 +129,11 @@ def fix_and_parse_json(
     with contextlib.suppress(json.JSONDecodeError):
         return json.loads(json_to_load)
 
-    with contextlib.suppress(json.JSONDecodeError):
-        json_to_load = json_to_load.replace("\t", "")
-        return json.loads(json_to_load)
-
-    with contextlib.suppress(json.JSONDecodeError):
-        json_to_load = correct_json(json_to_load)
-        return json.loads(json_to_load)
-    # Let's do something manually:
-    # sometimes GPT responds with something BEFORE the braces:
-    # "I'm sorry, I don't understand. Please try again."
-    # {"text": "I'm sorry, I don't understand. Please try again.",
-    #  "confidence": 0.0}
-    # So let's try to find the first brace and then parse the rest
-    #  of the string
+    # fences, text around the braces, trailing commas, quotes, truncation ...
+    # are repaired locally before asking GPT
     try:
-        brace_index = json_to_load.index("{")
-        maybe_fixed_json = json_to_load[brace_index:]
-        last_brace_index = maybe_fixed_json.rindex("}")
-        maybe_fixed_json = maybe_fixed_json[: last_brace_index + 1]
-        return json.loads(maybe_fixed_json)
-    except (json.JSONDecodeError, ValueError) as e:
+        return json_repair.loads(json_to_load, expect="{")
+    except json_repair.JSONRepairError as e:
         return try_ai_fix(try_to_fix_with_gpt, e, json_to_load, schema)
 
 
@@ -0,0 +1,304 @@
+"""Tolerant single pass JSON parser for LLM outputs."""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$\-]*")
+
+_LITERALS = {
+    "true": (True, None), "false": (False, None), "null": (None, None),
+    "True": (True, "python_literals"), "False": (False, "python_literals"), "None": (None, "python_literals"),
+    "NaN": (None, "python_literals"), "undefined": (None, "python_literals"),
+}
+
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JSONRepairError(json.JSONDecodeError):
+    """Raised if no JSON value could be recovered from the text."""
+
+
+class RepairStats:
+    """Thread safe counters of parsed outputs and the repairs applied to them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.valid = 0
+            self.repaired = 0
+            self.failed = 0
+            self.repairs: Counter = Counter()
+
+    def record(self, valid: bool = False, repairs: set = None, failed: bool = False):
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.failed += 1
+            elif valid:
+                self.valid += 1
+            else:
+                self.repaired += 1
+                self.repairs.update(repairs or ())
+
+    def as_dict(self) -> dict[str, any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "valid": self.valid,
+                "repaired": self.repaired,
+                "failed": self.failed,
+                "repairs": dict(self.repairs),
+            }
+
+
+REPAIR_STATS = RepairStats()
+
+
+def loads(text: str, expect: Optional[str] = None, stats: RepairStats = REPAIR_STATS) -> Any:
+    """Parse JSON from an LLM output, repairing common defects in a single pass.
+
+    Handles code fences, surrounding prose, trailing and missing commas, single quoted strings,
+    unquoted keys, comments, Python literals, unescaped control characters and output that was
+    cut off. Valid JSON is returned by the standard parser without any overhead.
+
+    Args:
+        text: The LLM output.
+        expect: "{" or "[" to only accept an object or an array.
+        stats: Statistics to record the parse in.
+    Raises:
+        JSONRepairError: If no JSON value could be recovered.
+    """
+    try:
+        value = json.loads(text)
+        if expect is None or _kind(value) == expect:
+            stats.record(valid=True)
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        value, repairs = _Parser(text, expect).parse()
+    except JSONRepairError:
+        stats.record(failed=True)
+        raise
+    stats.record(repairs=repairs)
+    return value
+
+
+def repair_json(text: str, expect: Optional[str] = None) -> str:
+    """Repair an LLM output to a valid JSON string."""
+    return json.dumps(loads(text, expect=expect))
+
+
+def _kind(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        return "{"
+    if isinstance(value, list):
+        return "["
+    return None
+
+
+class _Parser:
+    """Recursive descent parser that accepts a superset of JSON and notes the repairs it made."""
+
+    def __init__(self, text: str, expect: Optional[str] = None):
+        self.text = text
+        self.expect = expect
+        self.pos = 0
+        self.repairs: set[str] = set()
+
+    def parse(self) -> tuple[Any, set[str]]:
+        self._locate_value()
+        value = self._value()
+        self._skip_whitespace()
+        if self.pos < len(self.text):
+            self.repairs.add("surrounding_text")
+        return value, self.repairs
+
+    def _error(self, message: str):
+        raise JSONRepairError(message, self.text, min(self.pos, len(self.text)))
+
+    def _locate_value(self):
+        """Move to the start of the JSON value inside code fences or prose."""
+        fence = _FENCE.search(self.text)
+        if fence is not None and fence.group(1).strip():
+            self.repairs.add("code_fence")
+            self.text = fence.group(1)
+
+        starts = [self.expect] if self.expect else ["{", "["]
+        positions = [self.text.find(char) for char in starts if self.text.find(char) != -1]
+        if not positions:
+            self._error("No JSON object or array found")
+        self.pos = min(positions)
+        if self.text[:self.pos].strip():
+            self.repairs.add("surrounding_text")
+
+    # ===== Tokens =====
+
+    def _skip_whitespace(self):
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char in " \t\n\r":
+                self.pos += 1
+            elif text.startswith("//", self.pos) or char == "#":
+                self.repairs.add("comments")
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end == -1 else end + 1
+            elif text.startswith("/*", self.pos):
+                self.repairs.add("comments")
+                end = text.find("*/", self.pos + 2)
+                self.pos = len(text) if end == -1 else end + 2
+            else:
+                return
+
+    def _peek(self) -> str:
+        self._skip_whitespace()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    # ===== Values =====
+
+    def _value(self) -> Any:
+        char = self._peek()
+        if char == "{":
+            return self._object()
+        if char == "[":
+            return self._array()
+        if char in "\"'":
+            return self._string()
+        if char == "":
+            self._error("Unexpected end of input")
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            number = match.group()
+            try:
+                return json.loads(number)
+            except json.JSONDecodeError:
+                # e.g. 1. or .5 or +1
+                self.repairs.add("numbers")
+                return float(number) if any(char in number for char in ".eE") else int(number)
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if match and match.group() in _LITERALS:
+            self.pos = match.end()
+            value, repair = _LITERALS[match.group()]
+            if repair:
+                self.repairs.add(repair)
+            return value
+        self._error(f"Unexpected character {char!r}")
+
+    def _object(self) -> dict:
+        self.pos += 1
+        result = {}
+        while True:
+            char = self._peek()
+            if char == "}":
+                self.pos += 1
+                return result
+            if char == "":
+                self.repairs.add("truncated")
+                return result
+            if char == ",":
+                # trailing comma or an empty member
+                self.repairs.add("trailing_comma")
+                self.pos += 1
+                continue
+
+            key = self._key()
+            if self._peek() != ":":
+                if self._peek() == "":
+                    self.repairs.add("truncated")
+                    return result
+                self._error("Expected ':' after object key")
+            self.pos += 1
+            if self._peek() in ("", "}", ","):
+                # the value was cut off or is missing
+                self.repairs.add("truncated" if self._peek() == "" else "missing_value")
+                continue
+            result[key] = self._value()
+
+            char = self._peek()
+            if char == ",":
+                self.pos += 1
+                if self._peek() == "}":
+                    self.repairs.add("trailing_comma")
+            elif char not in ("}", ""):
+                self.repairs.add("missing_comma")
+
+    def _key(self) -> str:
+        char = self._peek()
+        if char in "\"'":
+            return self._string()
+        match = _IDENTIFIER.match(self.text, self.pos)
+        if not match:
+            self._error("Expected an object key")
+        self.repairs.add("unquoted_keys")
+        self.pos = match.end()
+        return match.group()
+
+    def _array(self) -> list:
+        self.pos += 1
+        result = []
+        while True:
+            char = self._peek()
+            if char == "]":
+                self.pos += 1
+                return result
+            if char == "":
+                self.repairs.add("truncated")
+                return result
+            if char == ",":
+                self.repairs.add("trailing_comma")
+                self.pos += 1
+                continue
+            result.append(self._value())
+
+            char = self._peek()
+            if char == ",":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.repairs.add("trailing_comma")
+            elif char not in ("]", ""):
+                self.repairs.add("missing_comma")
+
+    def _string(self) -> str:
+        text = self.text
+        quote = text[self.pos]
+        if quote == "'":
+            self.repairs.add("single_quotes")
+        self.pos += 1
+        chars = []
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == quote:
+                self.pos += 1
+                return "".join(chars)
+            if char == "\\" and self.pos + 1 < len(text):
+                escaped = text[self.pos + 1]
+                if escaped == "u" and re.match(r"[0-9a-fA-F]{4}", text[self.pos + 2:self.pos + 6]):
+                    chars.append(chr(int(text[self.pos + 2:self.pos + 6], 16)))
+                    self.pos += 6
+                    continue
+                if escaped in _ESCAPES:
+                    chars.append(_ESCAPES[escaped])
+                else:
+                    self.repairs.add("invalid_escape")
+                    chars.append(escaped)
+                self.pos += 2
+                continue
+            if char in "\n\r\t":
+                self.repairs.add("control_characters")
+            chars.append(char)
+            self.pos += 1
+        self.repairs.add("truncated")
+        return "".join(chars)
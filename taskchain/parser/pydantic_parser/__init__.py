@@ -1,3 +1,6 @@
 from taskchain.parser.pydantic_parser.pydantic_reduced import (
     ReducedPydanticParser, FixedReducedPydanticParser
-)
\ No newline at end of file
+)
+from taskchain.parser.pydantic_parser.schema_compiler import (
+    compile_schema, find_json_object, SchemaStreamHandler
+)
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
 import json
-import re
-from typing import Type, TypeVar
+from typing import Optional, Type, TypeVar
 
 from langchain.agents.structured_chat.output_parser import StructuredChatOutputParser
 from langchain.base_language import BaseLanguageModel
@@ -12,9 +11,8 @@ from langchain.prompts.base import BasePromptTemplate
 from langchain.schema import BaseOutputParser, OutputParserException
 from pydantic import BaseModel, ValidationError
 
-from taskchain.llm import get_basic_llm
-from taskchain.parser.pydantic_parser.format_instructions import PYDANTIC_FORMAT_INSTRUCTIONS
-from taskchain.parser.utilities import get_short_schema
+from taskchain.parser import json_repair
+from taskchain.parser.pydantic_parser.schema_compiler import compile_schema
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -23,20 +21,18 @@ class ReducedPydanticParser(BaseOutputParser[T]):
     pydantic_object: Type[T]
 
     def parse(self, text: str) -> T:
+        schema = compile_schema(self.pydantic_object)
         try:
-            # Greedy search for 1st json candidate.
-            match = re.search(
-                "\{.*\}", text.strip(), re.MULTILINE | re.IGNORECASE | re.DOTALL
-            )
-            json_str = ""
-            if match:
-                json_str = match.group()
-            json_object = json.loads(json_str)
+            # 1st json object, malformed ones are repaired without an LLM call
+            json_object = schema.parse_json(text.strip())
             try:
-                return self.pydantic_object.parse_obj(json_object)
+                return schema.validate(json_object)
             except ValidationError as e:
                 if "action_input" in json_object:
-                    return self.pydantic_object.parse_raw(json_object["action_input"])
+                    action_input = json_object["action_input"]
+                    if isinstance(action_input, str):
+                        action_input = json_repair.loads(action_input, expect="{")
+                    return schema.validate(action_input)
                 else:
                     raise e
 
@@ -46,8 +42,7 @@ class ReducedPydanticParser(BaseOutputParser[T]):
             raise OutputParserException(msg)
 
     def get_format_instructions(self) -> str:
-        schema_str = get_short_schema(self.pydantic_object)
-        return PYDANTIC_FORMAT_INSTRUCTIONS.format(schema=schema_str)
+        return compile_schema(self.pydantic_object).format_instructions
 
     @property
     def _type(self) -> str:
@@ -56,19 +51,20 @@ class ReducedPydanticParser(BaseOutputParser[T]):
 
 
 class FixedReducedPydanticParser(BaseOutputParser[T]):
-    """Wraps a parser and tries to fix parsing errors."""
+    """Wraps a parser and tries to fix parsing errors.
+    Without a retry chain, one with the basic llm is created on the first parsing error."""
 
     parser: BaseOutputParser[T]
     model: Type[T]
-    retry_chain: LLMChain
+    retry_chain: Optional[LLMChain] = None
 
     @classmethod
     def from_output_model(
             cls,
             model: Type[T],
-            llm: BaseLanguageModel = get_basic_llm()
+            llm: BaseLanguageModel = None
     ) -> FixedReducedPydanticParser:
-        chain = LLMChain(llm=llm, prompt=NAIVE_FIX_PROMPT)
+        chain = None if llm is None else LLMChain(llm=llm, prompt=NAIVE_FIX_PROMPT)
         parser = ReducedPydanticParser(pydantic_object=model)
         return cls(parser=parser, retry_chain=chain, model=model)
 
@@ -87,7 +83,7 @@ class FixedReducedPydanticParser(BaseOutputParser[T]):
         try:
             parsed_completion = self.parser.parse(completion)
         except OutputParserException as e:
-            new_completion = self.retry_chain.run(
+            new_completion = self.get_retry_chain().run(
                 instructions=self.parser.get_format_instructions(),
                 completion=completion,
                 error=repr(e),
@@ -100,6 +96,12 @@ class FixedReducedPydanticParser(BaseOutputParser[T]):
                 parsed_completion = self.parser.parse(new_completion)
         return parsed_completion
 
+    def get_retry_chain(self) -> LLMChain:
+        if self.retry_chain is None:
+            from taskchain.llm import get_basic_llm
+            self.retry_chain = LLMChain(llm=get_basic_llm(), prompt=NAIVE_FIX_PROMPT)
+        return self.retry_chain
+
     def get_format_instructions(self) -> str:
         return self.parser.get_format_instructions()
 
@@ -0,0 +1,227 @@
+"""Per model cache of format instructions and validators for parsing structured LLM outputs."""
+from __future__ import annotations
+
+import json
+import re
+from functools import cached_property, lru_cache
+from typing import Any, Optional, Type, TypeVar
+
+from langchain.callbacks.base import BaseCallbackHandler
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField
+
+from taskchain.parser import json_repair
+from taskchain.parser.pydantic_parser.format_instructions import PYDANTIC_FORMAT_INSTRUCTIONS
+from taskchain.parser.utilities import get_short_schema
+
+T = TypeVar("T", bound=BaseModel)
+
+# characters that change the nesting or string state, everything else is skipped by the matcher
+_STRUCTURE = re.compile(r'[{}"\\]')
+
+
+def find_json_object(text: str, start: int = 0) -> Optional[tuple[int, int]]:
+    """Find the first balanced JSON object in text, braces inside strings are ignored.
+
+    Returns:
+        Start and end index of the object, None if there is no complete object.
+    """
+    begin = text.find("{", start)
+    if begin == -1:
+        return None
+    depth = 0
+    in_string = False
+    skip_until = 0
+    for match in _STRUCTURE.finditer(text, begin):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        char = match.group()
+        if char == "\\":
+            # the escaped character is skipped
+            skip_until = pos + 2
+        elif char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return begin, pos + 1
+    return None
+
+
+class CompiledSchema:
+    """Format instructions and field validators of a pydantic model, built once per model class.
+    Get instances with compile_schema().
+
+    Attributes:
+        model: The pydantic model.
+        format_instructions: Format instructions with the short schema of the model.
+        fields: Maps the aliases of the model fields to their pydantic fields.
+    """
+
+    def __init__(self, model: Type[T]):
+        self.model = model
+        self.fields: dict[str, ModelField] = {field.alias: field for field in model.__fields__.values()}
+        self.required = {alias for alias, field in self.fields.items() if field.required}
+
+    @cached_property
+    def format_instructions(self) -> str:
+        # built on first use, parsing does not depend on the short schema
+        return PYDANTIC_FORMAT_INSTRUCTIONS.format(schema=get_short_schema(self.model))
+
+    def parse_json(self, text: str) -> dict:
+        """Get the first JSON object of a completion. The brace matcher finds well formed objects,
+        malformed ones are repaired.
+
+        Raises:
+            json.JSONDecodeError: If no object could be recovered.
+        """
+        span = find_json_object(text)
+        if span is not None:
+            try:
+                json_object = json.loads(text[span[0]:span[1]])
+                json_repair.REPAIR_STATS.record(valid=True)
+                return json_object
+            except json.JSONDecodeError:
+                pass
+        return json_repair.loads(text, expect="{")
+
+    def validate(self, json_object: Any) -> T:
+        return self.model.parse_obj(json_object)
+
+    def validate_field(self, alias: str, value: Any, values: dict[str, Any] = None) -> Any:
+        """Validate the value of a single field, values of unknown fields are returned unchanged.
+        Validators see the values of the fields validated before.
+
+        Raises:
+            ValidationError: If the value is invalid.
+        """
+        field = self.fields.get(alias, None)
+        if field is None:
+            return value
+        value, errors = field.validate(value, values or {}, loc=alias, cls=self.model)
+        if errors:
+            raise ValidationError(errors if isinstance(errors, list) else [errors], self.model)
+        return value
+
+    def partial_validator(self) -> PartialValidator:
+        return PartialValidator(self)
+
+
+@lru_cache(maxsize=None)
+def compile_schema(model: Type[T]) -> CompiledSchema:
+    return CompiledSchema(model)
+
+
+class PartialValidator:
+    """Validates the top level fields of a JSON object while it is streamed, so an invalid output
+    is rejected before the completion has finished.
+
+    Every field is validated as soon as its value is complete, values that are not plain JSON
+    are left to the final parse.
+
+    Attributes:
+        schema: The compiled schema of the expected model.
+        values: The validated values by field alias.
+        complete: True once the object is closed.
+    """
+
+    def __init__(self, schema: CompiledSchema):
+        self.schema = schema
+        self.values: dict[str, Any] = {}
+        self.complete = False
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    @property
+    def missing(self) -> set[str]:
+        """Required fields without a value so far."""
+        return self.schema.required - self.values.keys()
+
+    def feed(self, chunk: str) -> dict[str, Any]:
+        """Add streamed text, returns the fields completed by it.
+
+        Raises:
+            ValidationError: If a completed field is invalid.
+        """
+        start = len(self.text)
+        self.text = text = self.text + chunk
+        completed = {}
+        if self.complete:
+            return completed
+        for pos in range(start, len(text)):
+            char = text[pos]
+            if self._depth == 0 and char != "{":
+                # text before the object
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:pos + 1])
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = pos
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_field(text, pos, completed)
+                    self.complete = True
+                    break
+            elif self._depth == 1 and char == ":" and self._key is not None and self._value_start is None:
+                self._value_start = pos + 1
+            elif self._depth == 1 and char == ",":
+                self._complete_field(text, pos, completed)
+        return completed
+
+    def _complete_field(self, text: str, end: int, completed: dict[str, Any]):
+        key, start = self._key, self._value_start
+        self._key = self._key_start = self._value_start = None
+        if key is None or start is None:
+            return
+        try:
+            value = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            return
+        self.values[key] = completed[key] = self.schema.validate_field(key, value, self.values)
+
+
+class SchemaStreamHandler(BaseCallbackHandler):
+    """Callback validating the fields of a streamed completion against a model, an invalid field
+    aborts the LLM call.
+
+    Attributes:
+        validator: The partial validator of the current completion.
+    """
+
+    raise_error: bool = True
+
+    def __init__(self, model: Type[T]):
+        self.schema = compile_schema(model)
+        self.validator = self.schema.partial_validator()
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> Any:
+        self.validator = self.schema.partial_validator()
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, **kwargs: Any) -> Any:
+        self.validator = self.schema.partial_validator()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> Any:
+        self.validator.feed(token)
@@ -9,7 +9,6 @@ from langchain.prompts import PromptTemplate, ChatPromptTemplate, HumanMessagePr
 from langchain.prompts.chat import BaseMessagePromptTemplate
 from pydantic import BaseModel
 
-from taskchain.llm import get_basic_llm
 from taskchain.parser.pydantic_parser import FixedReducedPydanticParser
 from taskchain.parser.utilities import get_short_schema
 
@@ -61,6 +60,8 @@ def _prompt_from_pydantic2(
     placeholder for example is {example} in template.
     """
 
+    from taskchain.llm import get_basic_llm
+
     _parser = PydanticOutputParser(pydantic_object=model)
     output_parser = OutputFixingParser.from_llm(get_basic_llm(), _parser)
 
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import threading
+from collections.abc import Mapping
+from typing import Callable, Iterator
+
 from langchain import BasePromptTemplate
 
 from taskchain.prompts.loader import prompt_from_pydantic
@@ -8,36 +12,68 @@ from taskchain.prompts.task import (
     EXTEND_TASKS,
     PARENT_TASK_PROMPT,
     ASSIGN_TASK_PROMPT,
+    ASSIGN_TASK_BATCH_PROMPT,
     BEAK_DOWN_CHUNK_PROMPT, _SUMMARY_CHUNK_SCHEMA,
 
 )
-from taskchain.schema.output_model import PredictTaskSequence, PredictTask, PredictChoice
+from taskchain.schema.output_model import (
+    PredictTaskSequence, PredictTask, PredictChoice, PredictAssignmentSequence
+)
 from taskchain.schema.types import PromptTypes
 
-PROMPT_REGISTRY: dict[PromptTypes, BasePromptTemplate] = {
-    PromptTypes.BREAK_DOWN: prompt_from_pydantic(
+
+class LazyPromptRegistry(Mapping):
+    """Mapping of prompt types to prompt templates, a template is built on first access."""
+
+    def __init__(self, builders: dict[PromptTypes, Callable[[], BasePromptTemplate]]):
+        self._builders = builders
+        self._prompts: dict[PromptTypes, BasePromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, prompt_type: PromptTypes) -> BasePromptTemplate:
+        if prompt_type not in self._prompts:
+            builder = self._builders[prompt_type]
+            with self._lock:
+                if prompt_type not in self._prompts:
+                    self._prompts[prompt_type] = builder()
+        return self._prompts[prompt_type]
+
+    def __iter__(self) -> Iterator[PromptTypes]:
+        return iter(self._builders)
+
+    def __len__(self) -> int:
+        return len(self._builders)
+
+
+PROMPT_REGISTRY: Mapping[PromptTypes, BasePromptTemplate] = LazyPromptRegistry({
+    PromptTypes.BREAK_DOWN: lambda: prompt_from_pydantic(
         BREAK_DOWN,
         input_variables=["context", "remarks"],
         partial_variables={"schema": _SUMMARY_SCHEMA},
     ),
-    PromptTypes.EXTEND_LIST: prompt_from_pydantic(
+    PromptTypes.EXTEND_LIST: lambda: prompt_from_pydantic(
         EXTEND_TASKS,
         input_variables=["context", "remarks"],
         model=PredictTaskSequence,
     ),
-    PromptTypes.PARENT_TASK: prompt_from_pydantic(
+    PromptTypes.PARENT_TASK: lambda: prompt_from_pydantic(
         PARENT_TASK_PROMPT,
         input_variables=["context", "remarks"],
         model=PredictTask,
     ),
-    PromptTypes.ASSIGN_TASK: prompt_from_pydantic(
+    PromptTypes.ASSIGN_TASK: lambda: prompt_from_pydantic(
         ASSIGN_TASK_PROMPT,
         input_variables=["context", "remarks"],
         model=PredictChoice,
     ),
-    PromptTypes.BREAK_DOWN_CHUNK: prompt_from_pydantic(
+    PromptTypes.ASSIGN_TASK_BATCH: lambda: prompt_from_pydantic(
+        ASSIGN_TASK_BATCH_PROMPT,
+        input_variables=["context", "remarks"],
+        model=PredictAssignmentSequence,
+    ),
+    PromptTypes.BREAK_DOWN_CHUNK: lambda: prompt_from_pydantic(
         BEAK_DOWN_CHUNK_PROMPT,
         input_variables=["context", "remarks"],
         partial_variables={"schema": _SUMMARY_CHUNK_SCHEMA},
     )
-}
\ No newline at end of file
+})
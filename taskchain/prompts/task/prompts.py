@@ -120,6 +120,18 @@ Additional instructions:
 {remarks}
 """
 
+ASSIGN_TASK_BATCH_PROMPT = """
+For each of the following tasks select the Agent that fits best for successfully executing the task.
+You should select a more specialized Agent over a more general one. 
+Return exactly one assignment for every task, referencing tasks and agents by their index.
+{context}
+
+{schema}
+
+Additional instructions:
+{remarks}
+"""
+
 ##############################
 # Assign & Revise Task Prompt
 ##############################
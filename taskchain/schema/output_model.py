@@ -36,6 +36,15 @@ class PredictChoice(BaseModel):
     reason: str = Field(description="Reason for the choice (string).")
 
 
+class PredictAssignment(BaseModel):
+    task: int = Field(description="index of the task (integer).")
+    choice: int = Field(description="index of the chosen agent (integer).")
+
+
+class PredictAssignmentSequence(BaseModel):
+    assignments: list[PredictAssignment] = Field(description="One assignment for each task.")
+
+
 class PredictRevision(BaseModel):
     decision: bool = Field(description="Bool value indicating whether the task was executed successfully or not.")
     feedback: Union[str, None] = Field(description="Feedback instruction for the execution team.")
@@ -125,5 +125,6 @@ class PromptTypes(str, Enum):
     EXTEND_LIST = "extend_list"
     PARENT_TASK = "parent_task"
     ASSIGN_TASK = "assign_task"
+    ASSIGN_TASK_BATCH = "assign_task_batch"
     ASSIGN_REVISE_TASK = "assign_revise_task"
     REVISION_TASK = "revision_task"
@@ -137,6 +137,14 @@ class BaseProjectBoard(ABC):
     def type(self) -> str:
         ...
 
+    def flush(self):
+        """Send changes the board buffers, boards writing through right away have nothing to do."""
+        pass
+
+    def close(self):
+        """Flush the board and release its resources."""
+        self.flush()
+
 
 class BaseTaskStore(ABC):
     """Base task store."""
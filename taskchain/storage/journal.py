@@ -0,0 +1,135 @@
+"""Append-only journal for incremental persistence of the task context store."""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+from typing import Iterator, Optional
+
+from taskchain.agents.base import logger
+
+JOURNAL_SUFFIX = ".journal"
+
+
+class TaskJournal:
+    """Write-ahead log of task store and task graph changes stored next to a snapshot file.
+
+    Every record is a JSON line holding a logical operation and a sequence number.
+    The snapshot stores the sequence number of the last record it contains, so on load only
+    newer records are replayed. Compaction rotates the current journal, writes a new snapshot
+    in a background thread and removes the rotated journal once the snapshot is on disk.
+
+    Attributes:
+        snapshot_path: Path of the JSON snapshot file.
+        compact_threshold: Number of journal records after which a compaction is due.
+        background: If True, snapshots are written in a background thread.
+    """
+
+    def __init__(
+            self,
+            snapshot_path: str,
+            compact_threshold: int = 500,
+            background: bool = True
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.background = background
+        self.seq = 0
+        self._records = 0
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    @property
+    def compaction_due(self) -> bool:
+        """Whether the journal grew beyond the compaction threshold."""
+        return self._records >= self.compact_threshold
+
+    def append(self, records: list[dict]) -> None:
+        """Append records to the journal and flush them to disk."""
+        if not records:
+            return
+        with self._lock:
+            self._ensure_dir()
+            lines = []
+            for record in records:
+                self.seq += 1
+                lines.append(json.dumps(dict(record, seq=self.seq)))
+            with open(self.journal_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._records += len(records)
+
+    def compact(self, snapshot: dict) -> bool:
+        """Write a snapshot of the current state and drop the journal records it contains.
+        The snapshot must reflect all records appended so far.
+        Returns False without writing if a compaction is still running.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return False
+
+        with self._lock:
+            snapshot = dict(snapshot, journal_seq=self.seq)
+            rotated_path = None
+            if os.path.exists(self.journal_path):
+                rotated_path = f"{self.journal_path}.{self.seq}"
+                os.replace(self.journal_path, rotated_path)
+            self._records = 0
+
+        if self.background:
+            self._compactor = threading.Thread(
+                target=self._write_snapshot, args=(snapshot, rotated_path), daemon=True
+            )
+            self._compactor.start()
+        else:
+            self._write_snapshot(snapshot, rotated_path)
+        return True
+
+    def wait(self) -> None:
+        """Block until a running compaction has finished."""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def replay(self, after_seq: int = 0) -> Iterator[dict]:
+        """Yield the records newer than after_seq from the rotated and the current journal."""
+        paths = sorted(
+            glob.glob(glob.escape(self.journal_path) + ".*"),
+            key=lambda path: int(path.rsplit(".", 1)[-1]) if path.rsplit(".", 1)[-1].isdigit() else -1
+        )
+        if os.path.exists(self.journal_path):
+            paths.append(self.journal_path)
+
+        self.seq = after_seq
+        self._records = 0
+        for path in paths:
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a torn write at the end of the journal after a crash
+                        logger.warning(f"Skipping incomplete record in journal {path}")
+                        break
+                    if record["seq"] <= after_seq:
+                        continue
+                    self.seq = record["seq"]
+                    self._records += 1
+                    yield record
+
+    def _write_snapshot(self, snapshot: dict, rotated_path: Optional[str]):
+        self._ensure_dir()
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if rotated_path is not None and os.path.exists(rotated_path):
+            os.remove(rotated_path)
+
+    def _ensure_dir(self):
+        dirpath = os.path.dirname(self.snapshot_path)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath)
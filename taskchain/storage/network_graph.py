@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Optional, Union, Sequence
+from collections import deque
+from typing import Callable, Iterator, Optional, Union, Sequence
 
 from colorama import Fore, Style, Back
+from pydantic import PrivateAttr
 
 from taskchain.storage.base import BaseTaskNetwork
 from taskchain.task.task_node import Task
@@ -18,17 +20,56 @@ def _colored_prefix(prefix: str, level: int):
         5: Fore.CYAN,
         6: Fore.WHITE,
     }
-    return f"{levels[level]}{prefix}{Style.RESET_ALL}"
+    return f"{levels[level % len(levels)]}{prefix}{Style.RESET_ALL}"
 
 
 class TaskGraph(BaseTaskNetwork):
-    """represents a tree structured task graph."""
+    """represents a tree structured task graph.
+
+    Reverse maps from task id to positional index and from child to parent are maintained
+    on every change, traversals are iterative and safe for deep trees.
+    """
+    _id_to_index: dict[str, int] = PrivateAttr(default_factory=dict)
+    _child_to_parent: dict[str, str] = PrivateAttr(default_factory=dict)
+    _next_index: int = PrivateAttr(default=0)
+    _version: int = PrivateAttr(default=0)
+    _subtree_cache: dict[str, frozenset] = PrivateAttr(default_factory=dict)
+    _subtree_cache_version: int = PrivateAttr(default=0)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._rebuild_index()
 
     def load(self, data: dict):
-        self.all_tasks = data['all_tasks']
-        self.root_tasks = data['root_tasks']
+        # JSON turns the integer index keys into strings
+        self.all_tasks = {int(index): task_id for index, task_id in data['all_tasks'].items()}
+        self.root_tasks = {int(index): task_id for index, task_id in data['root_tasks'].items()}
         self.id_to_children = data['id_to_children']
         self.issue_to_id = data['issue_to_id']
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        self._id_to_index = {task_id: index for index, task_id in self.all_tasks.items()}
+        self._child_to_parent = {
+            child_id: parent_id
+            for parent_id, child_ids in self.id_to_children.items()
+            for child_id in child_ids
+        }
+        self._next_index = max(self.all_tasks, default=-1) + 1
+        self._changed()
+
+    def _changed(self):
+        self._version += 1
+
+    def _allocate_index(self) -> int:
+        index = self._next_index
+        self._next_index += 1
+        return index
+
+    @property
+    def version(self) -> int:
+        """Counter incremented on every change of the graph structure."""
+        return self._version
 
     @property
     def size(self) -> int:
@@ -36,12 +77,12 @@ class TaskGraph(BaseTaskNetwork):
         return len(self.all_tasks)
 
     @property
-    def id_to_index(self):
+    def id_to_index(self) -> dict[str, int]:
         """Map from task id to positional index"""
-        return {task_id: index for index, task_id in self.all_tasks.items()}
+        return self._id_to_index
 
     def get_index(self, task: Task):
-        return self.id_to_index[task.id]
+        return self._id_to_index[task.id]
 
     def insert(
             self,
@@ -54,17 +95,11 @@ class TaskGraph(BaseTaskNetwork):
         if parent is not None:
             return self.insert_under_parent(task, parent, children)
 
-        index = self.size
+        index = self._allocate_index()
         self.all_tasks[index] = task.id
         self.root_tasks[index] = task.id
-
-        if children is None:
-            children = []
-        if all(isinstance(child, Task) for child in children):
-            child_ids = [child.id for child in children]
-        else:
-            child_ids = [child for child in children]
-        self.id_to_children[task.id] = child_ids
+        self._id_to_index[task.id] = index
+        self._set_children(task.id, children)
 
     def insert_under_issue(
             self,
@@ -83,7 +118,7 @@ class TaskGraph(BaseTaskNetwork):
     ):
         """Insert a task under a parent task
         if None provided task will be added as root pipe task."""
-        index = self.size
+        index = self._allocate_index()
         if parent is None:
             self.root_tasks[index] = task.id
         else:
@@ -91,16 +126,23 @@ class TaskGraph(BaseTaskNetwork):
             if parent_id not in self.id_to_children:
                 self.id_to_children[parent_id] = []
             self.id_to_children[parent_id].append(task.id)
+            self._child_to_parent[task.id] = parent_id
 
         self.all_tasks[index] = task.id
+        self._id_to_index[task.id] = index
+        self._set_children(task.id, children)
 
+    def _set_children(self, task_id: str, children: Optional[Sequence[Union[Task, str]]]):
         if children is None:
             children = []
         if all(isinstance(child, Task) for child in children):
             child_ids = [child.id for child in children]
         else:
             child_ids = [child for child in children]
-        self.id_to_children[task.id] = child_ids
+        self.id_to_children[task_id] = child_ids
+        for child_id in child_ids:
+            self._child_to_parent[child_id] = task_id
+        self._changed()
 
     def get_children(self, parent: Optional[Union[Task, str]]) -> list[str]:
         """Get children ids with a depth of 1 for a given parent task or id."""
@@ -108,23 +150,85 @@ class TaskGraph(BaseTaskNetwork):
         children = self.id_to_children[parent_id]
         return [child for child in children]
 
+    def iter_bfs(self, parent: Optional[Union[Task, str]], include_root: bool = False) -> Iterator[str]:
+        """Iterate over all children of a task breadth first."""
+        parent_id = parent.id if isinstance(parent, Task) else parent
+        visited = {parent_id}
+        if include_root:
+            yield parent_id
+        queue = deque(self.id_to_children.get(parent_id, []))
+        while queue:
+            task_id = queue.popleft()
+            if task_id in visited:
+                continue
+            visited.add(task_id)
+            yield task_id
+            queue.extend(self.id_to_children.get(task_id, []))
+
+    def iter_dfs(self, parent: Optional[Union[Task, str]], include_root: bool = False) -> Iterator[str]:
+        """Iterate over all children of a task depth first in pre-order."""
+        parent_id = parent.id if isinstance(parent, Task) else parent
+        visited = {parent_id}
+        if include_root:
+            yield parent_id
+        stack = list(reversed(self.id_to_children.get(parent_id, [])))
+        while stack:
+            task_id = stack.pop()
+            if task_id in visited:
+                continue
+            visited.add(task_id)
+            yield task_id
+            stack.extend(reversed(self.id_to_children.get(task_id, [])))
+
     def get_all_children(self, parent: Optional[Union[Task, str]]) -> list[str]:
         """Get all child up to an unlimited depth."""
-        children = self.get_children(parent)
-        if not children:
-            return []
-        for child in children:
-            children.extend(self.get_all_children(child))
-        return children
+        return list(self.iter_bfs(parent))
+
+    def subtree_ids(self, parent: Optional[Union[Task, str]]) -> frozenset[str]:
+        """The ids of a task and all its children, cached until the graph changes."""
+        parent_id = parent.id if isinstance(parent, Task) else parent
+        if self._subtree_cache_version != self._version:
+            self._subtree_cache = {}
+            self._subtree_cache_version = self._version
+        if parent_id not in self._subtree_cache:
+            self._subtree_cache[parent_id] = frozenset(self.iter_bfs(parent_id, include_root=True))
+        return self._subtree_cache[parent_id]
+
+    def get_parent(self, task: Union[Task, str]) -> Optional[str]:
+        """Get the parent id of a task, None for root tasks."""
+        task_id = task.id if isinstance(task, Task) else task
+        return self._child_to_parent.get(task_id, None)
+
+    def get_ancestors(self, task: Union[Task, str]) -> list[str]:
+        """Get the ids of all ancestors of a task, starting with its parent."""
+        task_id = task.id if isinstance(task, Task) else task
+        ancestors = []
+        parent_id = self._child_to_parent.get(task_id, None)
+        while parent_id is not None and parent_id not in ancestors:
+            ancestors.append(parent_id)
+            parent_id = self._child_to_parent.get(parent_id, None)
+        return ancestors
+
+    def is_ancestor(self, ancestor: Union[Task, str], task: Union[Task, str]) -> bool:
+        """Whether a task lies in the subtree below ancestor."""
+        ancestor_id = ancestor.id if isinstance(ancestor, Task) else ancestor
+        task_id = task.id if isinstance(task, Task) else task
+        return task_id != ancestor_id and ancestor_id in self.get_ancestors(task_id)
 
     def delete_task(self, task: Task):
         """Delete a task from the graph."""
-        index = self.get_index(task)
+        index = self._id_to_index.pop(task.id)
         del self.all_tasks[index]
         if index in self.root_tasks:
             del self.root_tasks[index]
+        parent_id = self._child_to_parent.pop(task.id, None)
+        if parent_id is not None and task.id in self.id_to_children.get(parent_id, []):
+            self.id_to_children[parent_id].remove(task.id)
         if task.id in self.id_to_children:
+            for child_id in self.id_to_children[task.id]:
+                self._child_to_parent.pop(child_id, None)
             del self.id_to_children[task.id]
+        self._changed()
 
     def formatted_tree_view(self, task_id: str = None) -> str:
         if task_id is None:
@@ -134,84 +238,135 @@ class TaskGraph(BaseTaskNetwork):
 
     def print_list_tree_from(self, task_id: str):
         """Print the task graph as a list tree."""
-        lvl = 0
-        lines = [_colored_prefix("┐", lvl)]
-        num_roots = len(self.root_tasks)
-        for i, root_id in enumerate(self.root_tasks.values()):
-            if root_id == task_id:
-                root_id_str = f"{Back.BLACK}{root_id}{Style.RESET_ALL} {Fore.RED}<<<<<<<<{Fore.RESET}"
-            else:
-                root_id_str = root_id
-            if i == num_roots - 1:
-                root_str = f"{_colored_prefix('└──', lvl)}{root_id_str}"
-                prefix = _colored_prefix("   ", lvl)
-                sub_lines = self._node_to_str_from(prefix, root_id, lvl+1, task_id=task_id)
-            else:
-                root_str = f"{_colored_prefix('├──',lvl)}{root_id_str}"
-                prefix = _colored_prefix("│  ", lvl)
-                sub_lines = self._node_to_str_from(prefix, root_id, lvl+1, task_id=task_id)
-            root_lines = [root_str] + sub_lines
-            lines.extend(root_lines)
-        return "\n".join(lines)
+        return TreeRenderer(self, cache=False).render(highlight=task_id)
 
     def print_list_tree(self):
         """Print the task graph as a list tree."""
-        lvl = 0
-        lines = [_colored_prefix("┐", lvl)]
-        num_roots = len(self.root_tasks)
-        for i, root_id in enumerate(self.root_tasks.values()):
-            if i == num_roots - 1:
-                root_str = f"{_colored_prefix('└──', lvl)}{root_id}"
-                prefix = _colored_prefix("   ", lvl)
-                sub_lines = self._node_to_str(prefix, root_id, lvl+1)
-            else:
-                root_str = f"{_colored_prefix('├──',lvl)}{root_id}"
-                prefix = _colored_prefix("│  ", lvl)
-                sub_lines = self._node_to_str(prefix, root_id, lvl+1)
-            root_lines = [root_str] + sub_lines
-            lines.extend(root_lines)
+        return TreeRenderer(self, cache=False).render()
+
+
+class TreeRenderer:
+    """Renders a task graph as a list tree in a single iterative pass.
+
+    Task names are resolved while walking the tree. Rendered subtrees are cached and
+    the cache is dropped when the graph structure changes (TaskGraph.version) or, for the
+    affected branches only, when a task name changes (set_name).
+
+    Attributes:
+        graph: The task graph to render.
+        name_resolver: Maps a task id to the name shown in the tree, defaults to the id.
+        cache: If True, rendered subtrees are cached between calls.
+    """
+
+    def __init__(
+            self,
+            graph: TaskGraph,
+            name_resolver: Optional[Callable[[str], str]] = None,
+            cache: bool = True
+    ):
+        self.graph = graph
+        self.name_resolver = name_resolver or (lambda task_id: task_id)
+        self.cache = cache
+        self._names: dict[str, str] = {}
+        self._subtrees: dict[tuple, list[str]] = {}
+        self._version = graph.version
+
+    def name(self, task_id: str) -> str:
+        if task_id not in self._names:
+            self._names[task_id] = self.name_resolver(task_id)
+        return self._names[task_id]
+
+    def set_name(self, task_id: str, name: str):
+        """Update the name of a task, dropping the cached subtrees which show it."""
+        if self._names.get(task_id) == name:
+            return
+        self._names[task_id] = name
+        affected = {task_id, *self.graph.get_ancestors(task_id)}
+        self._subtrees = {key: lines for key, lines in self._subtrees.items() if key[0] not in affected}
+
+    def invalidate(self):
+        """Drop all cached names and subtrees."""
+        self._names = {}
+        self._subtrees = {}
+
+    def render(self, highlight: Optional[str] = None) -> str:
+        """Render the whole graph, optionally marking the task with id highlight."""
+        roots = list(self.graph.root_tasks.values())
+        lines = [_colored_prefix("┐", 0)]
+        self._walk(roots, self._all_children, highlight, lines, use_cache=self.cache)
+        return "\n".join(lines)
+
+    def render_neighborhood(self, task_id: str, depth: Optional[int] = 1) -> str:
+        """Render the local neighborhood of a task: its ancestors, its siblings and
+        its children up to depth levels below it (unlimited if None).
+        """
+        ancestors = self.graph.get_ancestors(task_id)
+        path = list(reversed(ancestors)) + [task_id]
+        next_on_path = {path[i]: path[i + 1] for i in range(len(path) - 1)}
+        parent_id = ancestors[0] if ancestors else None
+        task_lvl = len(ancestors)
+
+        def expand(node_id: str, lvl: int) -> list[str]:
+            if node_id == parent_id:
+                return self._all_children(node_id, lvl)
+            if node_id in next_on_path:
+                return [next_on_path[node_id]]
+            if lvl >= task_lvl and (node_id == task_id or lvl > task_lvl):
+                if depth is None or lvl - task_lvl < depth:
+                    return self._all_children(node_id, lvl)
+            return []
+
+        lines = [_colored_prefix("┐", 0)]
+        self._walk([path[0]], expand, task_id, lines, use_cache=False)
         return "\n".join(lines)
 
-    def _node_to_str(self, line_prefix: str, node_id: str, lvl: int=0):
-        """Format a branch of the tree."""
-        children = list(self.get_children(node_id))
-        branches = len(children)
-        lines = []
-        if branches > 0:
-            for i, child_id in enumerate(children):
-                if i == branches - 1:
-                    child_str = f"{line_prefix}{_colored_prefix('└──', lvl)}{child_id}"
-                    sub_line_prefix = line_prefix + _colored_prefix("   ", lvl)
-                else:
-                    child_str = f"{line_prefix}{_colored_prefix('├──', lvl)}{child_id}"
-                    sub_line_prefix = line_prefix + _colored_prefix("│  ", lvl)
-                sub_lines = self._node_to_str(sub_line_prefix, child_id, lvl+1)
-                child_lines = [child_str] + sub_lines
-                lines.extend(child_lines)
-        return lines
-
-    def _node_to_str_from(self, line_prefix: str, node_id: str, lvl: int=0, task_id: str=None):
-        """Format a branch of the tree."""
-        children = list(self.get_children(node_id))
-        branches = len(children)
-        lines = []
-        if branches > 0:
-            for i, child_id in enumerate(children):
-                if child_id == task_id:
-                    child_id_str = f"{Back.BLACK}{child_id}{Style.RESET_ALL} {Fore.GREEN}<<<<<<<<{Fore.RESET}"
-                else:
-                    child_id_str = child_id
-
-                if i == branches - 1:
-                    child_str = f"{line_prefix}{_colored_prefix('└──', lvl)}{child_id_str}"
-                    sub_line_prefix = line_prefix + _colored_prefix("   ", lvl)
-                else:
-                    child_str = f"{line_prefix}{_colored_prefix('├──', lvl)}{child_id_str}"
-                    sub_line_prefix = line_prefix + _colored_prefix("│  ", lvl)
-                sub_lines = self._node_to_str(sub_line_prefix, child_id, lvl+1)
-                child_lines = [child_str] + sub_lines
-                lines.extend(child_lines)
-        return lines
+    def _all_children(self, node_id: str, lvl: int) -> list[str]:
+        return self.graph.id_to_children.get(node_id, [])
+
+    def _walk(
+            self,
+            roots: list[str],
+            expand: Callable[[str, int], list[str]],
+            highlight: Optional[str],
+            lines: list[str],
+            use_cache: bool
+    ):
+        if self._version != self.graph.version:
+            self._subtrees = {}
+            self._version = self.graph.version
+        # only subtrees on the path to the highlighted task render differently
+        highlight_path = {highlight, *self.graph.get_ancestors(highlight)} if highlight else set()
+
+        stack = [("enter", root_id, "", 0, i == len(roots) - 1) for i, root_id in enumerate(roots)]
+        stack.reverse()
+        while stack:
+            item = stack.pop()
+            if item[0] == "exit":
+                _, key, start, prefix_length = item
+                self._subtrees[key] = [line[prefix_length:] for line in lines[start:]]
+                continue
+
+            _, node_id, line_prefix, lvl, is_last = item
+            lines.append(self._node_line(node_id, line_prefix, lvl, is_last, highlight))
+            children = expand(node_id, lvl)
+            if not children:
+                continue
 
+            sub_line_prefix = line_prefix + _colored_prefix("   " if is_last else "│  ", lvl)
+            if use_cache:
+                key = (node_id, lvl, highlight if node_id in highlight_path else None)
+                cached = self._subtrees.get(key, None)
+                if cached is not None:
+                    lines.extend(sub_line_prefix + line for line in cached)
+                    continue
+                stack.append(("exit", key, len(lines), len(sub_line_prefix)))
 
+            for i in reversed(range(len(children))):
+                stack.append(("enter", children[i], sub_line_prefix, lvl + 1, i == len(children) - 1))
 
+    def _node_line(self, node_id: str, line_prefix: str, lvl: int, is_last: bool, highlight: Optional[str]) -> str:
+        name = self.name(node_id)
+        if node_id == highlight:
+            marker_color = Fore.RED if lvl == 0 else Fore.GREEN
+            name = f"{Back.BLACK}{name}{Style.RESET_ALL} {marker_color}<<<<<<<<{Fore.RESET}"
+        return f"{line_prefix}{_colored_prefix('└──' if is_last else '├──', lvl)}{name}"
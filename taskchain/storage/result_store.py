@@ -0,0 +1,96 @@
+"""Content addressed store of task execution results."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+from taskchain.agents.base import logger
+
+# bump to invalidate all stored results, e.g. after changes of the agent prompts
+RESULT_STORE_VERSION = 1
+
+
+def content_hash(payload: any) -> str:
+    """Stable sha256 hash of a JSON serializable payload, dict keys are sorted."""
+    data = json.dumps([RESULT_STORE_VERSION, payload], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ContentAddressedStore:
+    """Directory of JSON files keyed by the content hash of the task execution inputs.
+
+    Entries are written atomically, so a crashed run never leaves a partial result behind.
+
+    Attributes:
+        directory: Directory holding the entries.
+        ttl: Seconds after which an entry expires. None keeps entries until they are invalidated.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = None):
+        self.directory = directory
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        """Get the stored entry of a key, None if it is missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning(f"Removing corrupted result store entry {path}")
+            self.invalidate(key)
+            return None
+
+        if self._expired(entry):
+            self.invalidate(key)
+            return None
+        return entry
+
+    def put(self, key: str, result: any, **metadata) -> bool:
+        """Store a result under a key. Returns False if the result is not JSON serializable."""
+        entry = {"key": key, "created_at": time.time(), "result": result, "metadata": metadata}
+        try:
+            data = json.dumps(entry)
+        except (TypeError, ValueError):
+            logger.warning(f"Result of {key} is not JSON serializable and is not stored")
+            return False
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self) -> int:
+        """Remove expired entries, returns the number of removed entries."""
+        if self.ttl is None or not os.path.exists(self.directory):
+            return 0
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".json") and self.get(filename[:-len(".json")]) is None:
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl is not None and time.time() - entry["created_at"] > self.ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
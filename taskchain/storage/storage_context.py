@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import threading
+from contextlib import contextmanager
 from typing import Dict, Optional, Sequence
 
+from taskchain.config import Config
 from taskchain.schema import TaskRelations, TaskStatus, TaskType
 from taskchain.singleton import AbstractSingleton
+from taskchain.storage.journal import TaskJournal
 from taskchain.storage.base import BaseTaskStore, BaseProjectBoard, BaseStore, BaseTaskNetwork
-from taskchain.storage.network_graph import TaskGraph
-from taskchain.storage.task_store import TaskStore
+from taskchain.storage.network_graph import TaskGraph, TreeRenderer
+from taskchain.storage.task_store import TaskStore, TypedTaskStore
 from taskchain.task.task_node import Task
 from taskchain.task.utilities import update_relation
 
@@ -27,29 +32,41 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
             self,
             task_store: BaseStore = None,
             index_graph: BaseTaskNetwork = None,
-            project_board: BaseProjectBoard = None
+            project_board: BaseProjectBoard = None,
+            journal: bool = None
     ):
         """Initialize the task context storage.
         Attributes:
-            task_store: Key-value store to store tasks.
+            task_store: Key-value store to store tasks. Defaults to a TypedTaskStore if
+                the TYPED_TASK_STORE config is set, otherwise to a TaskStore.
             index_graph: Graph to store task relationships.
             project_board: Project board integration.
+            journal: If True, persist appends the changes since the last call to a journal
+                and only rewrites the full snapshot on compaction. Defaults to the TASK_JOURNAL config.
         """
-        self.task_store: TaskStore = task_store or TaskStore()
+        if task_store is None:
+            task_store = TypedTaskStore() if Config().typed_task_store else TaskStore()
+        self.task_store: TaskStore = task_store
         self.task_network: TaskGraph = index_graph or TaskGraph()
         self.project_board: Optional[BaseProjectBoard] = project_board
+        self.renderer = TreeRenderer(self.task_network, self._task_name)
+        self.journal_enabled = Config().task_journal if journal is None else journal
+        self._journal: Optional[TaskJournal] = None
+        self._pending_records: list[dict] = []
+        # subtasks running in threads record changes while another thread persists them
+        self._records_lock = threading.Lock()
+        self._persist_lock = threading.Lock()
 
     # ===== Persistence =====
 
     def persist(self, persist_path: str = DEFAULT_PERSIST_PATH) -> None:
-        """Persist the task store."""
-        data = dict(
-            task_store={k: v.dict() for k, v in self.task_store.get_all().items()},
-            task_network=self.task_network.dict(),
-            project_board={
-                "type": self.project_board.type,
-                "project_id": self.project_board.project_id} if self.project_board is not None else "None"
-        )
+        """Persist the task store and flush the changes buffered by the project board."""
+        if self.project_board is not None:
+            self.project_board.flush()
+        if self.journal_enabled:
+            return self._persist_journal(persist_path)
+
+        data = self._snapshot()
         if not os.path.exists(os.path.dirname(persist_path)):
             print(f"Directory {os.path.dirname(persist_path)} does not exist.")
             # create directory
@@ -59,6 +76,68 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
             json.dump(data, f)
         print(f"Persisted task store to {persist_path}")
 
+    def _snapshot(self) -> dict:
+        return dict(
+            task_store=dict(self.task_store.to_dict()),
+            task_network=self.task_network.dict(),
+            project_board={
+                "type": self.project_board.type,
+                "project_id": self.project_board.project_id} if self.project_board is not None else "None"
+        )
+
+    def _persist_journal(self, persist_path: str):
+        """Append the pending changes to the journal, compact it into a new snapshot when due."""
+        # persisting is serialized, so the records are appended in the order they were taken
+        with self._persist_lock:
+            journal = self._get_journal(persist_path)
+            compact = not os.path.exists(persist_path) or journal.compaction_due
+            # a change is recorded and applied under the same lock, so the snapshot holds exactly
+            # the changes of the taken records
+            with self._records_lock:
+                records, self._pending_records = self._pending_records, []
+                snapshot = self._snapshot() if compact else None
+            if snapshot is not None and journal.compact(snapshot):
+                return
+            journal.append(records)
+
+    def _get_journal(self, persist_path: str) -> TaskJournal:
+        if self._journal is None or self._journal.snapshot_path != persist_path:
+            self._journal = TaskJournal(persist_path)
+        return self._journal
+
+    @contextmanager
+    def _record(self, op: str, task: Task, **kwargs):
+        """Record a change, which is applied to the task store and task network inside the block."""
+        record = dict(op=op, task=task.dict(), **kwargs) if self.journal_enabled else None
+        with self._records_lock:
+            if record is not None:
+                self._pending_records.append(record)
+            yield
+
+    def _apply_record(self, record: dict):
+        """Apply a journal record to the task store and the task network."""
+        task = Task(**record["task"])
+        op = record["op"]
+        if op == "delete":
+            self.task_store.delete_task(task.id)
+            self.task_network.delete_task(task)
+            return
+
+        self.task_store.put_task(task)
+        if op in ("add", "add_under") and task.id in self.task_network.id_to_index:
+            # already part of the snapshot the journal is replayed onto
+            return
+        if op == "add":
+            self.task_network.insert(task)
+        elif op == "add_under":
+            self.task_network.insert_under_parent(task, record["parent_id"])
+        elif op == "update" and task.status == TaskStatus.ISSUE:
+            self.task_network.insert_under_issue(task)
+
+    async def apersist(self, persist_path: str = DEFAULT_PERSIST_PATH) -> None:
+        """Persist the task store without blocking the event loop."""
+        await asyncio.to_thread(self.persist, persist_path)
+
     def load_from_file(self, filepath: str = DEFAULT_PERSIST_PATH):
         """Load the task store from file."""
         if not os.path.exists(filepath):
@@ -70,6 +149,13 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
         self.task_network.load(data["task_network"])
         if data["project_board"] != "None":
             self.project_board = self._load_project_board(data["project_board"])
+        self.renderer.invalidate()
+
+        journal = self._get_journal(filepath)
+        with self._records_lock:
+            self._pending_records = []
+        for record in journal.replay(after_seq=data.get("journal_seq", 0)):
+            self._apply_record(record)
 
     def _load_project_board(self, data: dict):
         from taskchain.storage.utilities.project_board_loader import load_project_board
@@ -88,13 +174,15 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
     ):
         """Add a sequence of tasks with a parent task to the store."""
         if insert_parent:
-            self.task_store.put(parent.id, parent.dict())
-            self.task_network.insert(parent)
+            with self._record("add", parent):
+                self.task_store.put_task(parent)
+                self.task_network.insert(parent)
             if self.project_board is not None:
                 self.project_board.add_task(parent)
         for task in tasks:
-            self.task_store.put(task.id, task.dict())
-            self.task_network.insert_under_parent(task, parent)
+            with self._record("add_under", task, parent_id=parent.id):
+                self.task_store.put_task(task)
+                self.task_network.insert_under_parent(task, parent)
             if self.project_board is not None:
                 self.project_board.add_task(task)
 
@@ -102,29 +190,37 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
             self, task: Task
     ) -> None:
         """Add a task to the store."""
-        self.task_store.put(task.id, task.dict())
-        self.task_network.insert(task)
+        with self._record("add", task):
+            self.task_store.put_task(task)
+            self.task_network.insert(task)
         if self.project_board:
             self.project_board.add_task(task)
 
     # TODO: check if task relations have changed and update graph accordingly
     def update_task(self, task: Task) -> None:
         """update task in task_store and project_board."""
-        self.task_store.put(task.id, task.dict())
-
-        if task.status == TaskStatus.ISSUE:
-            self.task_network.insert_under_issue(task)
+        with self._record("update", task):
+            self.task_store.put_task(task)
+            if task.status == TaskStatus.ISSUE:
+                self.task_network.insert_under_issue(task)
 
+        self.renderer.set_name(task.id, task.name)
         if self.project_board is not None:
             self.project_board.update_task(task)
 
+    async def aupdate_task(self, task: Task) -> None:
+        """update task asynchronously, mirroring to the project board runs in a worker thread."""
+        if self.project_board is None:
+            return self.update_task(task)
+        await asyncio.to_thread(self.update_task, task)
+
     def get_task(self, task_id: str) -> Optional[Task]:
         """Get a task from the store."""
         return self.task_store.get_task(task_id)
 
     def get_tasks(self, task_ids: Sequence[str]) -> Sequence[Task]:
         """Get a sequence of tasks from the store."""
-        return [self.get_task(task_id) for task_id in task_ids]
+        return self.task_store.get_many(task_ids)
 
     def delete_task(self, task_id: str, raise_error: bool = True) -> None:
         """Delete a task from the store."""
@@ -136,7 +232,8 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
                 key=TaskRelations.NEXT,
                 value=task.next_id
             )
-            self.task_store.put(prev_task.id, prev_task.dict())
+            with self._record("update", prev_task):
+                self.task_store.put_task(prev_task)
         if task.next_id is not None:
             next_task = self.task_store.get_task(task.next_id)
             next_task = update_relation(
@@ -144,27 +241,32 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
                 key=TaskRelations.PREV,
                 value=task.prev_id
             )
-            self.task_store.put(next_task.id, next_task.dict())
+            with self._record("update", next_task):
+                self.task_store.put_task(next_task)
 
-        self.task_store.delete_task(task.id)
-        self.task_network.delete_task(task)
+        with self._record("delete", task):
+            self.task_store.delete_task(task.id)
+            self.task_network.delete_task(task)
         if self.project_board is not None:
             self.project_board.delete_task(task)
 
     def task_exists(self, task_id: str) -> bool:
-        return self.tasks.get(task_id) is not None
+        return self.task_store.exists(task_id)
 
-    def repr_current_context(self, task_id):
-        str_tree = self.task_network.print_list_tree_from(task_id)
-        for task_id in self.task_network.all_tasks.values():
-            str_tree = str_tree.replace(task_id, self.task_store.get_task(task_id).name)
-        return str_tree
+    def repr_current_context(self, task_id: str, depth: Optional[int] = None, neighborhood: bool = False):
+        """Render the task tree by task names with the given task marked.
+        With neighborhood=True only its ancestors, siblings and children up to depth are rendered.
+        """
+        if neighborhood:
+            return self.renderer.render_neighborhood(task_id, depth=depth)
+        return self.renderer.render(highlight=task_id)
 
     def repr_tree(self):
-        str_tree = self.task_network.print_list_tree()
-        for task_id in self.task_network.all_tasks.values():
-            str_tree = str_tree.replace(task_id, self.task_store.get_task(task_id).name)
-        return str_tree
+        return self.renderer.render()
+
+    def _task_name(self, task_id: str) -> str:
+        name = self.task_store.get_field(task_id, "name")
+        return name if name is not None else task_id
 
     @property
     def root_id(self) -> str:
@@ -180,8 +282,43 @@ class TaskContextStore(AbstractSingleton, BaseTaskStore):
     def get_children(self, task_id: str) -> list[Task]:
         return [self.get_task(child_id) for child_id in self.task_network.get_children(task_id)]
 
+    def export_subtree(self, task_id: str) -> dict:
+        """Export a task and all its children as serializable task store and task network data.
+        The exported data can be loaded into an empty TaskContextStore with load_subtree().
+        """
+        subtree_ids = [task_id] + [
+            child_id for child_id in self.task_network.get_all_children(task_id) if child_id != task_id
+        ]
+        subtree_ids = list(dict.fromkeys(subtree_ids))
+        subtree = set(subtree_ids)
+        return dict(
+            task_store={_id: self.task_store.get(_id) for _id in subtree_ids},
+            task_network=dict(
+                all_tasks={index: _id for index, _id in enumerate(subtree_ids)},
+                root_tasks={0: task_id},
+                id_to_children={
+                    _id: [child for child in self.task_network.id_to_children.get(_id, []) if child in subtree]
+                    for _id in subtree_ids
+                },
+                issue_to_id={
+                    issue_id: _id for issue_id, _id in self.task_network.issue_to_id.items() if _id in subtree
+                },
+            )
+        )
+
+    def load_subtree(self, data: dict):
+        """Replace the content of the store with a subtree exported by export_subtree().
+        The project board is detached, mirroring stays with the exporting store.
+        """
+        self.task_store.load(data["task_store"])
+        self.task_network.load(data["task_network"])
+        self.project_board = None
+        with self._records_lock:
+            self._pending_records = []
+        self.renderer.invalidate()
+
     @property
     def issue_tasks(self):
-        return [task for task in self.task_store.get_all().values() if task.type == TaskType.ISSUE]
+        return self.task_store.get_by_type(TaskType.ISSUE)
 
 
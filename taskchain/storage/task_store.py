@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, Sequence, Union
 
 from taskchain.agents.base import logger
 from taskchain.storage.base import BaseStore
@@ -32,12 +32,25 @@ class TaskStore(BaseStore):
     def put(self, key: str, value: dict):
         self._data[key] = value
 
+    def put_task(self, task: Task):
+        self.put(task.id, task.dict())
+
+    def exists(self, key: str) -> bool:
+        return key in self._data
+
     def get(self, key: str) -> Optional[dict]:
         data = self._data.get(key, None)
         if data is None:
             return None
         return data.copy()
 
+    def get_field(self, key: str, field: str) -> any:
+        """Get a single field of a stored task without building the task."""
+        data = self._data.get(key, None)
+        if data is None:
+            return None
+        return data.get(field, None)
+
     def get_task(self, key: str) -> Optional[Task]:
         if key is None:
             return None
@@ -54,6 +67,15 @@ class TaskStore(BaseStore):
         data = data.copy()
         return {key: Task(**value) for key, value in data.items()}
 
+    def get_many(self, keys: Sequence[str]) -> list[Optional[Task]]:
+        return [self.get_task(key) for key in keys]
+
+    def get_by_status(self, status: str) -> list[Task]:
+        return [Task(**value) for value in self._data.values() if value.get("status") == status]
+
+    def get_by_type(self, task_type: str) -> list[Task]:
+        return [Task(**value) for value in self._data.values() if value.get("type") == task_type]
+
     def delete_task(self, key: str) -> bool:
         if key in self._data:
             del self._data[key]
@@ -89,3 +111,119 @@ class TaskStore(BaseStore):
         """Load a SimpleKVStore from dict."""
         return cls(save_dict)
 
+
+class TypedTaskStore(TaskStore):
+    """Key-value store keeping validated Task instances.
+
+    Tasks are validated once when they are written instead of on every read. Reads return
+    copies of the stored instances whose fields and containers can be changed freely, the
+    stored instance is only replaced by writing the task back with put_task() (copy on write).
+    Copies are shallow per container, values nested deeper in results or details are shared.
+    Secondary indexes on status and type are maintained on write, so they always match the
+    stored instances.
+    """
+
+    def __init__(
+            self,
+            data: VALUE_TYPE = None
+    ):
+        self._tasks: Dict[str, Task] = {}
+        self._indexed: Dict[str, tuple] = {}
+        self._status_index: Dict[str, set] = {}
+        self._type_index: Dict[str, set] = {}
+        super().__init__()
+        if data:
+            self.load(data)
+
+    def load(self, data: dict) -> None:
+        self._tasks = {}
+        self._indexed = {}
+        self._status_index = {}
+        self._type_index = {}
+        for key, value in data.items():
+            self.put(key, value)
+
+    def put(self, key: str, value: Union[dict, Task]):
+        task = _copy_task(value) if isinstance(value, Task) else Task(**value)
+        self._unindex(key)
+        self._tasks[key] = task
+        self._index(key, task)
+
+    def put_task(self, task: Task):
+        self.put(task.id, task)
+
+    def exists(self, key: str) -> bool:
+        return key in self._tasks
+
+    def get(self, key: str) -> Optional[dict]:
+        task = self._tasks.get(key, None)
+        if task is None:
+            return None
+        return task.dict()
+
+    def get_field(self, key: str, field: str) -> any:
+        return getattr(self._tasks.get(key, None), field, None)
+
+    def get_task(self, key: str) -> Optional[Task]:
+        if key is None:
+            return None
+
+        task = self._tasks.get(key, None)
+        return _copy_task(task) if task is not None else None
+
+    def get_all(self) -> Dict[str, Task]:
+        return {key: _copy_task(task) for key, task in self._tasks.items()}
+
+    def get_many(self, keys: Sequence[str]) -> list[Optional[Task]]:
+        return [self.get_task(key) for key in keys]
+
+    def get_by_status(self, status: str) -> list[Task]:
+        return [_copy_task(self._tasks[key]) for key in self._status_index.get(_index_key(status), ())]
+
+    def get_by_type(self, task_type: str) -> list[Task]:
+        return [_copy_task(self._tasks[key]) for key in self._type_index.get(_index_key(task_type), ())]
+
+    def delete_task(self, key: str) -> bool:
+        if key in self._tasks:
+            self._unindex(key)
+            del self._tasks[key]
+            return True
+        return False
+
+    def persist(self, persist_path: str) -> None:
+        """Persist the store."""
+        dirpath = os.path.dirname(persist_path)
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        with open(persist_path, "w+") as f:
+            json.dump(self.to_dict(), f)
+
+    def to_dict(self) -> dict:
+        """Save the store as dict."""
+        return {key: task.dict() for key, task in self._tasks.items()}
+
+    def _index(self, key: str, task: Task):
+        status, task_type = _index_key(task.status), _index_key(task.type)
+        self._indexed[key] = (status, task_type)
+        self._status_index.setdefault(status, set()).add(key)
+        self._type_index.setdefault(task_type, set()).add(key)
+
+    def _unindex(self, key: str):
+        if key not in self._indexed:
+            return
+        status, task_type = self._indexed.pop(key)
+        self._status_index[status].discard(key)
+        self._type_index[task_type].discard(key)
+
+
+def _copy_task(task: Task) -> Task:
+    """Copy a task and its containers, e.g. relations and results, without validation."""
+    return task.copy(update={
+        field: value.copy() for field, value in task.__dict__.items() if isinstance(value, (dict, list, set))
+    })
+
+
+def _index_key(value) -> str:
+    return str(getattr(value, "value", value))
+
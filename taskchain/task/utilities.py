@@ -50,6 +50,30 @@ def filter_tasks_by_inputs(tasks: Sequence[Task], input_keys: Sequence[str]) ->
 
 
 
+def build_dependency_graph(tasks: Sequence[Task], available: Sequence[str] = None) -> dict[str, set[str]]:
+    """Build a dependency graph between tasks from their input and output keys.
+    Attributes:
+        tasks: The tasks to connect.
+        available: Resource keys that are already available and therefore create no dependency.
+    Returns:
+        dict[str, set[str]]: Mapping of task id to the ids of the tasks producing its inputs.
+    """
+    available = set(available or [])
+    producers: dict[str, set[str]] = {}
+    for task in tasks:
+        for output_key in task.outputs:
+            producers.setdefault(output_key, set()).add(task.id)
+
+    dependencies = {}
+    for task in tasks:
+        dependencies[task.id] = set()
+        for input_key in task.inputs:
+            if input_key in available:
+                continue
+            dependencies[task.id].update(producers.get(input_key, set()) - {task.id})
+    return dependencies
+
+
 def update_relations(tasks: Sequence[Task], **kwargs) -> Sequence[Task]:
     """Update relations for a sequence of tasks."""
     updated_tasks = []
@@ -1 +1,10 @@
-from taskchain.tools.research.tool import ResearchTool
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from taskchain.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from taskchain.tools.research.tool import ResearchTool
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "ResearchTool": "taskchain.tools.research.tool",
+})
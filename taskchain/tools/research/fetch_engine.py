@@ -0,0 +1,295 @@
+"""Concurrent loading of web pages with a plain HTTP fast path and a pool of browser contexts."""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import re
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, NamedTuple, Optional, TypeVar
+from urllib.parse import urlparse
+
+from taskchain.agents.base import logger
+from taskchain.llm.tokenizer import split_tokens
+from taskchain.tools.research.page_cache import CacheEntry, PageCache
+
+if TYPE_CHECKING:
+    import requests
+    from playwright.async_api import Browser, BrowserContext, Playwright
+
+T = TypeVar("T")
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+)
+
+# tags without readable content, removed before the text is extracted
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "head"]
+
+# pages with less text are assumed to be rendered by javascript
+MIN_TEXT_LENGTH = 200
+
+
+class FetchedPage(NamedTuple):
+    url: str
+    text: str
+    method: str
+    chunks: Optional[list[str]] = None
+
+
+def extract_text(html: str) -> str:
+    """Extract the readable text of a html page with a single parse."""
+    from bs4 import BeautifulSoup
+
+    try:
+        soup = BeautifulSoup(html, "lxml")
+    except Exception:
+        soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NON_CONTENT_TAGS):
+        tag.decompose()
+    lines = (line.strip() for line in soup.get_text(separator="\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def validate_text(text: str, snippet: Optional[str]) -> bool:
+    """Check that the text contains the longest alphanumeric sequence of the search snippet."""
+    sequences = re.findall(r'(?:[a-zA-Z0-9\s])+', snippet or "")
+    if not sequences:
+        return True
+    validator = max(sequences, key=len).strip()
+    return validator in " ".join(text.split())
+
+
+class DomainThrottle:
+    """Per domain politeness, bounds the parallel requests to a domain and spaces their starts."""
+
+    def __init__(self, max_concurrency: int = 2, delay: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.delay = delay
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._next_start: dict[str, float] = {}
+
+    def _domain(self, url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    async def __call__(self, url: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        domain = self._domain(url)
+        semaphore = self._semaphores.setdefault(domain, asyncio.Semaphore(self.max_concurrency))
+        async with semaphore:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start + self.delay
+            await asyncio.sleep(start - now)
+            return await fetch()
+
+
+class BrowserPool:
+    """Pool of reusable Playwright browser contexts of a single browser, started on first use."""
+
+    def __init__(self, size: int = 4, headless: bool = True):
+        self.size = size
+        self.headless = headless
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._contexts: asyncio.Queue[BrowserContext] = asyncio.Queue()
+        self._created = 0
+        self._start_lock = asyncio.Lock()
+
+    async def _start(self):
+        async with self._start_lock:
+            if self._browser is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _acquire(self) -> BrowserContext:
+        await self._start()
+        if self._contexts.empty() and self._created < self.size:
+            self._created += 1
+            return await self._browser.new_context(user_agent=USER_AGENT)
+        return await self._contexts.get()
+
+    async def fetch(self, url: str, timeout: float = 30.0) -> str:
+        """Render a page and return its html."""
+        context = await self._acquire()
+        page = await context.new_page()
+        try:
+            await page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
+            return await page.content()
+        finally:
+            await page.close()
+            self._contexts.put_nowait(context)
+
+    async def close(self):
+        while not self._contexts.empty():
+            await self._contexts.get_nowait().close()
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._playwright = None
+        self._created = 0
+
+
+class FetchEngine:
+    """Loads many pages concurrently.
+
+    Pages are requested over plain HTTP first. Only pages whose HTTP response is not html, has too
+    little text or does not contain the search snippet are rendered in a browser context of the pool.
+    Every page is parsed once, the text is extracted from the html with BeautifulSoup.
+
+    Attributes:
+        max_concurrency: Maximum number of pages loaded at the same time.
+        browser_contexts: Size of the browser context pool.
+        domain_concurrency: Maximum number of parallel requests to a domain.
+        domain_delay: Seconds between the starts of requests to the same domain.
+        timeout: Timeout of a single request in seconds.
+        use_browser: If False, pages that need javascript are skipped.
+        cache: Cache of the extracted texts and chunks, stale pages are revalidated with
+            conditional requests.
+        chunk_tokens: If set, the texts are split into chunks of this size, which are cached as well.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 8,
+            browser_contexts: int = 4,
+            domain_concurrency: int = 2,
+            domain_delay: float = 1.0,
+            timeout: float = 20.0,
+            headless: bool = True,
+            use_browser: bool = True,
+            cache: Optional[PageCache] = None,
+            chunk_tokens: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.browser_contexts = browser_contexts
+        self.domain_concurrency = domain_concurrency
+        self.domain_delay = domain_delay
+        self.timeout = timeout
+        self.headless = headless
+        self.use_browser = use_browser
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self._session: Optional[requests.Session] = None
+
+    @classmethod
+    def from_config(cls, **kwargs) -> FetchEngine:
+        from taskchain.config import Config
+        from taskchain.tools.research.page_cache import get_page_cache
+        config = Config()
+        params = {
+            "cache": get_page_cache(),
+            "max_concurrency": int(config.web_fetch_concurrency),
+            "browser_contexts": int(config.web_fetch_browser_contexts),
+            "domain_delay": float(config.web_fetch_domain_delay),
+        }
+        return cls(**{**params, **kwargs})
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            self._session = session
+        return self._session
+
+    def fetch_all(self, items: Iterable[tuple[str, Optional[str]]]) -> list[Optional[FetchedPage]]:
+        """Load (url, snippet) pairs, returns the pages in order with None for failed pages."""
+        coroutine = self.afetch_all(items)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # called from a running event loop, e.g. by an async agent
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    async def afetch_all(self, items: Iterable[tuple[str, Optional[str]]]) -> list[Optional[FetchedPage]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        throttle = DomainThrottle(self.domain_concurrency, self.domain_delay)
+        browser = BrowserPool(self.browser_contexts, self.headless)
+
+        async def bounded_fetch(url: str, snippet: Optional[str], entry: Optional[CacheEntry]) -> Optional[FetchedPage]:
+            async with semaphore:
+                return await self._fetch(url, snippet, browser, entry)
+
+        async def fetch(url: str, snippet: Optional[str]) -> Optional[FetchedPage]:
+            try:
+                entry = self.cache.get("page", url) if self.cache is not None else None
+                if entry is not None and entry.fresh:
+                    return self._cached_page(url, entry)
+                # the politeness delay of a domain does not hold one of the global slots
+                return await throttle(url, lambda: bounded_fetch(url, snippet, entry))
+            except Exception as e:
+                logger.warning(f"Could not load {url}: {e!r}")
+                return None
+
+        try:
+            return list(await asyncio.gather(*(fetch(url, snippet) for url, snippet in items)))
+        finally:
+            await browser.close()
+
+    async def _fetch(
+            self,
+            url: str,
+            snippet: Optional[str],
+            browser: BrowserPool,
+            entry: Optional[CacheEntry] = None,
+    ) -> Optional[FetchedPage]:
+        headers = entry.revalidation_headers if entry is not None else {}
+        response = await asyncio.to_thread(self._fetch_http, url, headers)
+        if response is not None and response.status_code == 304 and entry is not None:
+            return self._cached_page(url, self.cache.revalidated(entry))
+        if response is not None and "html" in response.headers.get("Content-Type", "html"):
+            text = extract_text(response.text)
+            if len(text) >= MIN_TEXT_LENGTH and validate_text(text, snippet):
+                return self._page(
+                    url, text, "http", response.headers.get("ETag"), response.headers.get("Last-Modified")
+                )
+        if not self.use_browser:
+            return None
+        text = extract_text(await browser.fetch(url, self.timeout))
+        return self._page(url, text, "browser") if text else None
+
+    def _fetch_http(self, url: str, headers: dict[str, str] = None) -> Optional[requests.Response]:
+        """Get a page, None if the request failed."""
+        import requests
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.debug(f"HTTP request to {url} failed: {e!r}")
+            return None
+        return response
+
+    def _chunks(self, text: str) -> Optional[list[str]]:
+        return split_tokens(text, self.chunk_tokens) if self.chunk_tokens else None
+
+    def _page(
+            self,
+            url: str,
+            text: str,
+            method: str,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+    ) -> FetchedPage:
+        page = FetchedPage(url, text, method, self._chunks(text))
+        if self.cache is not None:
+            value = {"text": text, "chunk_tokens": self.chunk_tokens, "chunks": page.chunks}
+            self.cache.put("page", url, value, etag=etag, last_modified=last_modified)
+        return page
+
+    def _cached_page(self, url: str, entry: CacheEntry) -> FetchedPage:
+        text = entry.value["text"]
+        if entry.value.get("chunk_tokens") == self.chunk_tokens:
+            return FetchedPage(url, text, "cache", entry.value.get("chunks"))
+        return FetchedPage(url, text, "cache", self._chunks(text))
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
@@ -0,0 +1,271 @@
+"""On disk cache of fetched web pages, documents and search results."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, NamedTuple, Optional
+
+from taskchain.agents.base import logger
+
+# bump to invalidate all cached entries, e.g. after changes of the text extraction
+PAGE_CACHE_VERSION = 1
+
+
+class CacheEntry(NamedTuple):
+    """A cached value with the HTTP validators of the response it was extracted from.
+
+    Attributes:
+        value: The cached JSON value, e.g. the extracted text and its chunks.
+        etag: ETag header of the response.
+        last_modified: Last-Modified header of the response.
+        fresh: False if the entry is past its TTL and has to be revalidated before use.
+    """
+    key: str
+    value: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    created_at: float
+    fresh: bool
+
+    @property
+    def revalidation_headers(self) -> dict[str, str]:
+        """Headers of a conditional request answered with 304 Not Modified if the entry is current."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def cache_key(kind: str, identifier: str) -> str:
+    payload = json.dumps([PAGE_CACHE_VERSION, kind, identifier.strip()])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """Cache of pages, documents and search results.
+
+    An SQLite index maps urls and queries to content addressed blobs, equal content is stored once.
+    Entries past their TTL are kept while they can be revalidated with their ETag or Last-Modified
+    header, otherwise they are dropped. Above max_bytes the least recently used entries are evicted.
+
+    Attributes:
+        directory: Directory of the index and the blobs.
+        ttl: Seconds until an entry has to be revalidated, None keeps entries fresh.
+        max_bytes: Maximum size of all blobs, None for no limit.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, kind TEXT, identifier TEXT, blob TEXT, size INTEGER, "
+            "etag TEXT, last_modified TEXT, created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_blob ON entries (blob)")
+        self._conn.commit()
+
+    def get(self, kind: str, identifier: str, ttl: Optional[float] = None) -> Optional[CacheEntry]:
+        """Look up an entry, stale entries are only returned if they can be revalidated.
+
+        Args:
+            kind: Kind of the entry, e.g. page, pdf or query.
+            identifier: The url or query.
+            ttl: Overrides the TTL of the cache for this lookup.
+        """
+        key = cache_key(kind, identifier)
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob, etag, last_modified, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            blob, etag, last_modified, created_at = row
+            fresh = ttl is None or now - created_at <= ttl
+            if not fresh and not (etag or last_modified):
+                self._delete(key)
+                self._conn.commit()
+                self._misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        value = self._read_blob(blob)
+        if value is None:
+            with self._lock:
+                self._delete(key)
+                self._conn.commit()
+                self._misses += 1
+            return None
+        if fresh:
+            self._hits += 1
+        return CacheEntry(key, value, etag, last_modified, created_at, fresh)
+
+    def put(
+            self,
+            kind: str,
+            identifier: str,
+            value: Any,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+    ) -> bool:
+        """Store a JSON serializable value. Returns False if the value is not serializable."""
+        try:
+            data = zlib.compress(json.dumps(value).encode("utf-8"))
+        except (TypeError, ValueError):
+            logger.warning(f"Value of {identifier} is not JSON serializable and is not cached")
+            return False
+        blob = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        key = cache_key(kind, identifier)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT blob FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, identifier, blob, len(data), etag, last_modified, now, now)
+            )
+            if previous is not None and previous[0] != blob:
+                self._remove_unreferenced_blob(previous[0])
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def revalidated(self, entry: CacheEntry) -> CacheEntry:
+        """Mark an entry as fresh after the server answered 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE entries SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, entry.key))
+            self._conn.commit()
+            self._revalidated += 1
+        return entry._replace(created_at=now, fresh=True)
+
+    def invalidate(self, kind: str, identifier: str) -> None:
+        with self._lock:
+            self._delete(cache_key(kind, identifier))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            for (blob,) in self._conn.execute("SELECT DISTINCT blob FROM entries").fetchall():
+                self._remove_blob(blob)
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def _delete(self, key: str):
+        row = self._conn.execute("SELECT blob FROM entries WHERE key = ?", (key,)).fetchone()
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if row is not None:
+            self._remove_unreferenced_blob(row[0])
+
+    def _evict(self):
+        """Remove the least recently used entries until the blobs fit into max_bytes."""
+        if self.max_bytes is None:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+            self._evictions += 1
+
+    def _remove_unreferenced_blob(self, blob: str):
+        if self._conn.execute("SELECT 1 FROM entries WHERE blob = ? LIMIT 1", (blob,)).fetchone() is None:
+            self._remove_blob(blob)
+
+    def _remove_blob(self, blob: str):
+        try:
+            os.remove(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+
+    def _read_blob(self, blob: str) -> Any:
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                return json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except (zlib.error, json.JSONDecodeError):
+            logger.warning(f"Removing corrupted page cache blob {blob}")
+            return None
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.directory, "blobs", blob[:2], blob)
+
+    @property
+    def size(self) -> int:
+        """The number of cached entries."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def stats(self) -> dict[str, any]:
+        """Hit/miss statistics of the current process."""
+        lookups = self._hits + self._misses + self._revalidated
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "revalidated": self._revalidated,
+            "evictions": self._evictions,
+            "hit_rate": (self._hits + self._revalidated) / lookups if lookups else 0.0,
+            "size": self.size,
+        }
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Get the page cache shared by the research tools, initialized from config on first call.
+    None if caching is disabled."""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            from taskchain.config import Config
+            config = Config()
+            if not config.web_cache:
+                return None
+            _page_cache = PageCache(
+                directory=os.path.join(config.local_storage_dir, "web_cache"),
+                ttl=float(config.web_cache_ttl) if config.web_cache_ttl else None,
+                max_bytes=int(config.web_cache_max_bytes) if config.web_cache_max_bytes else None,
+            )
+        return _page_cache
+
+
+def set_page_cache(cache: Optional[PageCache]):
+    """Replace the shared page cache, None re-initializes it from config on next use."""
+    global _page_cache
+    with _page_cache_lock:
+        _page_cache = cache
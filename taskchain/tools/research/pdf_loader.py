@@ -1,16 +1,27 @@
 from langchain.schema import Document
 
-def load_local(web_path, storage_dir = "C:\\Users\\Lukasz\\Documents\\aivault"):
-    import requests, time
+from taskchain.tools.research.page_cache import get_page_cache
+
+
+def load_local(web_path, storage_dir = None):
+    """Download a pdf into the local storage dir, the file is named by the hash of the url."""
+    import hashlib, requests
     from pathlib import Path
 
-    """Load documents."""
-    r = requests.get(web_path)
+    if storage_dir is None:
+        from taskchain.config import Config
+        storage_dir = Path(Config().local_storage_dir) / "downloads"
+    file_path = Path(storage_dir) / f"{hashlib.sha256(web_path.encode('utf-8')).hexdigest()}.pdf"
+    if file_path.exists():
+        return str(file_path)
 
-    file_path = Path(storage_dir) / f"{time.strftime('%Y%m%d-%H%M%S')}.pdf"
-    file = open(file_path, "wb")
-    file.write(r.content)
-    file.close()
+    r = requests.get(web_path)
+    r.raise_for_status()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as file:
+        file.write(r.content)
+    tmp_path.replace(file_path)
     return str(file_path)
 
 
@@ -38,6 +49,23 @@ def pdf_loader_wrapper(func):
     return inner
 
 
+def cached_pdf_loader(func):
+    """Serve the documents of a pdf url from the page cache, so a hit skips download and parsing."""
+    def inner(url, **kwargs):
+        cache = get_page_cache()
+        if cache is None or kwargs:
+            return func(url, **kwargs)
+        entry = cache.get("pdf", url)
+        if entry is not None and entry.fresh:
+            return [Document(**doc) for doc in entry.value]
+        docs = func(url)
+        cache.put("pdf", url, [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs])
+        return docs
+
+    return inner
+
+
+@cached_pdf_loader
 @pdf_loader_wrapper
 def load_pdf_documents_from_url(url, **kwargs) -> list[Document]:
     from langchain.document_loaders import PyMuPDFLoader
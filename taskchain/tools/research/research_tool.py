@@ -1,6 +1,6 @@
 from langchain import PromptTemplate
 from langchain.chains.summarize import load_summarize_chain
-from langchain.chat_models import ChatOpenAI
+from taskchain.llm import get_basic_llm
 from taskchain.memory_store.provider import memory_store
 
 from taskchain.tools.research.search_result_loader import SearchResultLoader
@@ -27,7 +27,7 @@ def search_tool(query: str, research_meta: dict):
 
     docs = memory_store.document.similarity_search(query, k=5)
     print([len(d.page_content) for d in docs])
-    chain = load_summarize_chain(ChatOpenAI(),
+    chain = load_summarize_chain(get_basic_llm(),
                                  chain_type="map_reduce",
                                  return_intermediate_steps=True,
                                  map_prompt=PROMPT,
@@ -1,7 +1,7 @@
-"""Loader that uses Selenium to load a page, then uses unstructured to load the html.
+"""Loader of search results, pages are loaded concurrently by the fetch engine.
+The sequential loader using Selenium and unstructured is kept as fallback.
 """
 import os
-import re
 from typing import TYPE_CHECKING, List, Literal, Optional, Union
 
 if TYPE_CHECKING:
@@ -13,17 +13,18 @@ from langchain.document_loaders.base import BaseLoader
 
 from bs4 import BeautifulSoup
 
+from taskchain.agents.base import logger
+from taskchain.llm.tokenizer import split_tokens
 from taskchain.utilities import google_organic_search, load_dotenv_from_parents
 from taskchain.schema.base import SearchResultItems
-
-
-# from task_chain.processing.documents import text_splitter_by_token, chunks_from_documents
+from taskchain.tools.research.fetch_engine import FetchEngine, validate_text
 
 
 
 class SearchResultLoader(BaseLoader):
-    """Loader that uses Selenium and to load a page and unstructured to load the html.
-    This is useful for loading pages that require javascript to render.
+    """Loader of the pages of search results.
+    load() fetches the pages concurrently over HTTP and renders only pages that require javascript
+    in pooled browser contexts. load_sequential() visits the pages one by one with Selenium.
 
     Attributes:
         search_results (List[dict]): List of Search Results containing links and snippets to load.
@@ -31,6 +32,7 @@ class SearchResultLoader(BaseLoader):
         browser (str): The browser to use, either 'chrome' or 'firefox'.
         executable_path (Optional[str]): The path to the browser executable.
         headless (bool): If True, the browser will run in headless mode.
+        fetch_engine (FetchEngine): The engine loading the pages, configured from Config by default.
     """
 
     MAX_TOKENS_PER_CHUNK = 400
@@ -47,9 +49,25 @@ class SearchResultLoader(BaseLoader):
             headless: bool = True,
             load_pdfs: bool = False,
             run_in_thread: bool = False,
+            fetch_engine: Optional[FetchEngine] = None,
             **kwargs,
     ):
-        """Load a list of URLs using Selenium and unstructured."""
+        """Load a list of URLs."""
+        self.search_results = search_results
+        self.continue_on_failure = continue_on_failure
+        self.browser = browser
+        self.executable_path = executable_path
+        self.headless = headless
+        self.load_pdfs = load_pdfs
+        self.run_in_thread = run_in_thread
+        self.fetch_engine = fetch_engine or FetchEngine.from_config(
+            headless=headless, chunk_tokens=self.MAX_TOKENS_PER_CHUNK
+        )
+        self.search_items = []
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    def _check_sequential_dependencies(self):
         try:
             import selenium  # noqa:F401
         except ImportError:
@@ -66,17 +84,6 @@ class SearchResultLoader(BaseLoader):
                 "`pip install unstructured`"
             )
 
-        self.search_results = search_results
-        self.continue_on_failure = continue_on_failure
-        self.browser = browser
-        self.executable_path = executable_path
-        self.headless = headless
-        self.load_pdfs = load_pdfs
-        self.run_in_thread = run_in_thread
-        self.search_items = []
-        for k, v in kwargs.items():
-            setattr(self, k, v)
-
     def _get_driver(self) -> Union["Chrome", "Firefox"]:
         """Create and return a WebDriver instance based on the specified browser.
 
@@ -156,8 +163,7 @@ class SearchResultLoader(BaseLoader):
             bool: True if the text is valid, False otherwise.
         """
 
-        validator = max(re.findall(r'(?:[a-zA-Z0-9\s])+', snippet), key=len)
-        return validator in text
+        return validate_text(text, snippet)
 
     def parse_page_content(self, page_content: str, snippet) -> str:
         """Parse and validate the page content."""
@@ -186,7 +192,13 @@ class SearchResultLoader(BaseLoader):
         self.search_items = search_results
         return self.load()
 
-    def load_url(self, url: str, docs: list=None, driver=Union["Chrome", "Firefox"], snippet: str=None):
+    def _chunk_documents(self, text: str, url: str) -> list[Document]:
+        return [
+            Document(page_content=chunk, metadata={"source": url})
+            for chunk in split_tokens(text, self.MAX_TOKENS_PER_CHUNK)
+        ]
+
+    def load_url(self, url: str, docs: list=None, driver: Union["Chrome", "Firefox"]=None, snippet: str=None):
         if driver is None:
             driver = self._get_driver()
 
@@ -203,17 +215,13 @@ class SearchResultLoader(BaseLoader):
                 driver.get(url)
                 page_content = driver.page_source
                 text = self.parse_page_content(page_content, snippet)
-                metadata = {"source": url}
-                chunks = text_splitter_by_token(text, self.MAX_TOKENS_PER_CHUNK)
-                for chunk in chunks:
-                    docs.append(Document(page_content=chunk, metadata=metadata))
+                docs.extend(self._chunk_documents(text, url))
 
 
         except Exception as e:
             try:
-                _docs = self.load_playwright(url)
-                _docs = chunks_from_documents(_docs, self.MAX_TOKENS_PER_CHUNK)
-                docs.extend(_docs)
+                for doc in self.load_playwright(url):
+                    docs.extend(self._chunk_documents(doc.page_content, doc.metadata.get("source", url)))
             except Exception as e:
                 if self.continue_on_failure:
                     pass
@@ -222,20 +230,50 @@ class SearchResultLoader(BaseLoader):
         return docs
 
     def load(self) -> List[Document]:
-        """Load the specified URLs using Selenium and create Document instances.
+        """Load the search items concurrently and split them into Document chunks.
 
         Returns:
             List[Document]: A list of Document instances with loaded content.
         """
+        return self.load_items(self.search_items or self.get_search_items())
 
+    def load_items(self, search_items: list[SearchResultItems]) -> List[Document]:
+        docs: List[Document] = list()
+        pages = []
+        for url, snippet in search_items:
+            if url.endswith(".pdf") and self.load_pdfs:
+                try:
+                    docs.extend(self._load_pdf(url))
+                except Exception as e:
+                    if not self.continue_on_failure:
+                        raise e
+                    logger.warning(f"Could not load pdf {url}: {e!r}")
+            else:
+                pages.append((url, snippet))
+
+        for (url, _), page in zip(pages, self.fetch_engine.fetch_all(pages)):
+            if page is None:
+                if not self.continue_on_failure:
+                    raise ValueError(f"Could not load {url}")
+                continue
+            if page.chunks is not None:
+                docs.extend(Document(page_content=chunk, metadata={"source": page.url}) for chunk in page.chunks)
+            else:
+                docs.extend(self._chunk_documents(page.text, page.url))
+        return docs
+
+    def load_sequential(self) -> List[Document]:
+        """Load the specified URLs one by one using Selenium and create Document instances.
+
+        Returns:
+            List[Document]: A list of Document instances with loaded content.
+        """
+        self._check_sequential_dependencies()
         docs: List[Document] = list()
         driver = self._get_driver()
 
         for url, snippet in self.search_items:
-            docs.extend(
-                self.load_url(url, docs, driver, snippet)
-            )
-
+            self.load_url(url, docs, driver, snippet)
 
         driver.quit()
-        return docs
\ No newline at end of file
+        return docs
@@ -1,11 +1,9 @@
 from typing import Type, Optional
 
-from langchain import PromptTemplate
 from langchain.callbacks.manager import CallbackManagerForToolRun, AsyncCallbackManagerForToolRun
-from langchain.chains.summarize import load_summarize_chain
-from langchain.chat_models import ChatOpenAI
 from langchain.tools import BaseTool
 from pydantic import BaseModel
+from taskchain.chains.summarize import MapReduceSummarizer, default_summary_store
 from taskchain.tools.vectorstore_tool import CollectionRetrieverTools
 
 from taskchain.tools.research.search_result_loader import SearchResultLoader
@@ -77,17 +75,12 @@ class ResearchTool(BaseTool):
             f" analyze the information and identify relevant insights related to the following research objective: {query}."
             " Return the analyzed information as a list of insights."
         )
-        PROMPT = PromptTemplate(template=prompt_template, input_variables=["text"])
 
         docs = memory_store.document.similarity_search(query, k=5)
-        chain = load_summarize_chain(ChatOpenAI(),
-                                     chain_type="map_reduce",
-                                     return_intermediate_steps=False,
-                                     map_prompt=PROMPT,
-                                     combine_prompt=PROMPT)
+        summarizer = MapReduceSummarizer(prompt_template, store=default_summary_store())
         if run_manager is not None:
             run_manager.on_text("Summarizing results", color="pink")
-        return chain.run({"input_documents":docs})
+        return summarizer.summarize(docs)
 
 
 
@@ -1,15 +1,14 @@
 from typing import Type
 
-from langchain import PromptTemplate
-from langchain.chains.summarize import load_summarize_chain
-from langchain.chat_models import ChatOpenAI
 from pydantic import BaseModel
+from taskchain.chains.summarize import MapReduceSummarizer, default_summary_store
 
 """Loader that uses Selenium to load a page, then uses unstructured to load the html.
 """
 from typing import List
 
 from langchain.docstore.document import Document
+from taskchain.schema.base import SearchResultItems
 from taskchain.tools.research.search_result_loader import SearchResultLoader
 
 class ToolArgs(BaseModel):
@@ -26,7 +25,7 @@ class UrlScraper(SearchResultLoader):
         pass
 
     def _run(self, input: str, **kwargs):
-        docs = self.load_url(input)
+        docs = self.load_items([SearchResultItems(input, "")])
         return self.summarize_results(docs)
 
     async def _arun(self, input: str, research_meta: dict, **kwargs):
@@ -38,14 +37,8 @@ class UrlScraper(SearchResultLoader):
             " Using the following chunk of input data: {text},"
             " Return the analyzed information as a list of insights."
         )
-        PROMPT = PromptTemplate(template=prompt_template, input_variables=["text"])
-
-        chain = load_summarize_chain(ChatOpenAI(),
-                                     chain_type="map_reduce",
-                                     return_intermediate_steps=False,
-                                     map_prompt=PROMPT,
-                                     combine_prompt=PROMPT)
-        return chain.run({"input_documents":results})
+        summarizer = MapReduceSummarizer(prompt_template, store=default_summary_store())
+        return summarizer.summarize(results)
 
 
 
@@ -103,10 +103,23 @@ def get_trello_client():
     )
 
 def google_organic_search(query: str) -> list[dict]:
+    """Organic google results of a query, cached for the query TTL of the page cache."""
     from langchain import SerpAPIWrapper
+    from taskchain.config import Config
+    from taskchain.tools.research.page_cache import get_page_cache
+
+    cache = get_page_cache()
+    query_ttl = Config().web_cache_query_ttl
+    ttl = float(query_ttl) if query_ttl else None
+    entry = cache.get("query", query, ttl=ttl) if cache is not None else None
+    if entry is not None and entry.fresh:
+        return entry.value
+
     load_dotenv_from_parents(["SERPAPI_API_KEY"])
     serp = SerpAPIWrapper()
     res = serp.results(query)
+    if cache is not None:
+        cache.put("query", query, res["organic_results"])
     return res["organic_results"]
 
 def parse_list_in_json(o: dict, key: str):
@@ -0,0 +1,55 @@
+from langchain.schema import AIMessage, ChatGeneration, ChatResult, HumanMessage
+
+from taskchain.llm import set_llm_cache
+from taskchain.llm.cache import SQLiteResponseCache
+from taskchain.llm.models import CachedChatOpenAI, LocalChatModel
+
+
+def test_second_identical_call_is_served_from_cache(tmp_path):
+    calls = []
+
+    def respond(messages):
+        calls.append(messages)
+        return "Final Answer: 42"
+
+    set_llm_cache(SQLiteResponseCache(str(tmp_path / "llm_cache.sqlite")))
+    try:
+        llm = LocalChatModel(respond=respond)
+        first = llm.predict("What is the answer?")
+        second = llm.predict("What is the answer?  \r\n")
+        assert first == second == "Final Answer: 42"
+        assert len(calls) == 1
+
+        LocalChatModel(respond=respond, cache=False).predict("What is the answer?")
+        assert len(calls) == 2
+    finally:
+        set_llm_cache(None)
+
+
+def test_openai_model_is_not_called_on_cache_hit(tmp_path, monkeypatch):
+    calls = []
+
+    def call_model(self, messages, stop=None, run_manager=None, **kwargs):
+        calls.append(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="cached"))])
+
+    monkeypatch.setattr(CachedChatOpenAI, "_call_model", call_model)
+    set_llm_cache(SQLiteResponseCache(str(tmp_path / "llm_cache.sqlite")))
+    try:
+        llm = CachedChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, openai_api_key="test")
+        messages = [HumanMessage(content="Hello")]
+        assert llm.predict_messages(messages).content == "cached"
+        assert llm.predict_messages(messages).content == "cached"
+        assert len(calls) == 1
+
+        # other parameters are cached separately
+        CachedChatOpenAI(model_name="gpt-3.5-turbo", temperature=1, openai_api_key="test").predict_messages(messages)
+        assert len(calls) == 2
+    finally:
+        set_llm_cache(None)
+
+
+def test_cache_flag_is_not_sent_to_the_api():
+    llm = CachedChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key="test", cache=False)
+    assert llm.cache is False
+    assert "cache" not in llm.model_kwargs
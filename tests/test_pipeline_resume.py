@@ -0,0 +1,97 @@
+import pytest
+
+from taskchain.executor.pipeline import PipelineManager
+from taskchain.schema import TaskStatus
+from taskchain.singleton import Singleton
+from taskchain.storage.storage_context import TaskContextStore
+from taskchain.task import Task
+
+
+class Interrupted(BaseException):
+    """Stands in for a process being killed, it is not handled by the managers."""
+
+
+class FakeSubtaskManager:
+
+    def __init__(self, task, task_storage, behaviour, executed):
+        self.task = task
+        self.task_storage = task_storage
+        self.behaviour = behaviour
+        self.executed = executed
+
+    def run(self, callbacks=None, **kwargs):
+        self.executed.append(self.task.id)
+        outcome = self.behaviour.pop(self.task.id, "close")
+        if outcome == "crash":
+            raise Interrupted()
+        if outcome == "issue":
+            self.task.status = TaskStatus.ISSUE
+        elif self.task.status == TaskStatus.APPROVED:
+            self.task.status = TaskStatus.CLOSED
+            self.task.results = {key: f"{key} of {self.task.name}" for key in self.task.outputs}
+        self.task_storage.update_task(self.task)
+        return self.task
+
+
+@pytest.fixture
+def task_storage():
+    Singleton._instances.pop(TaskContextStore, None)
+    yield TaskContextStore(journal=False)
+    Singleton._instances.pop(TaskContextStore, None)
+
+
+@pytest.fixture
+def pipeline(task_storage):
+    parent = Task(name="pipeline", description="pipeline", outputs=["b"], status=TaskStatus.APPROVED)
+    first = Task(name="first", description="first", outputs=["a"], status=TaskStatus.APPROVED)
+    second = Task(name="second", description="second", inputs=["a"], outputs=["b"], status=TaskStatus.APPROVED)
+    task_storage.add_tasks(parent, [first, second])
+    return parent, first, second
+
+
+def create_manager(task, task_storage, checkpoint_path, behaviour, executed, monkeypatch):
+    monkeypatch.setattr(
+        PipelineManager,
+        "_create_subtask_manager",
+        lambda self, subtask, isolate_resources=False: FakeSubtaskManager(
+            self.task_storage.get_task(subtask.id), self.task_storage, behaviour, executed
+        ),
+    )
+    return PipelineManager(
+        task=task,
+        task_storage=task_storage,
+        agent_registry=object(),
+        checkpoint_path=str(checkpoint_path),
+    )
+
+
+def test_resume_after_crash_skips_closed_subtasks(pipeline, task_storage, tmp_path, monkeypatch):
+    parent, first, second = pipeline
+    executed = []
+    manager = create_manager(parent, task_storage, tmp_path / "checkpoint.json", {second.id: "crash"}, executed, monkeypatch)
+    with pytest.raises(Interrupted):
+        manager.run()
+    assert executed == [first.id, second.id]
+
+    executed.clear()
+    manager = create_manager(parent, task_storage, tmp_path / "checkpoint.json", {}, executed, monkeypatch)
+    task = manager.resume()
+    assert executed == [second.id]
+    assert task.status == TaskStatus.CLOSED
+    assert task.results == {"b": "b of second"}
+
+
+def test_resume_after_blocked_run_retries_blocked_subtasks(pipeline, task_storage, tmp_path, monkeypatch):
+    parent, first, second = pipeline
+    executed = []
+    manager = create_manager(parent, task_storage, tmp_path / "checkpoint.json", {second.id: "issue"}, executed, monkeypatch)
+    task = manager.run()
+    assert task.status == TaskStatus.ISSUE
+    assert task_storage.get_task(second.id).status == TaskStatus.ISSUE
+
+    executed.clear()
+    manager = create_manager(task, task_storage, tmp_path / "checkpoint.json", {}, executed, monkeypatch)
+    task = manager.resume()
+    assert executed == [second.id]
+    assert task.status == TaskStatus.CLOSED
+    assert task.results == {"b": "b of second"}